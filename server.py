@@ -1,6 +1,40 @@
+import io
 import os
+import stat
 import argparse
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import functools
+import threading
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from http.server import HTTPServer, SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+LIVE_RELOAD_PATH = "/__livereload"
+LIVE_RELOAD_SCRIPT = (
+    b'<script>new EventSource("/__livereload").onmessage = () => location.reload();</script>'
+)
+KEEPALIVE_SECONDS = 15
+IDLE_TIMEOUT_SECONDS = 30
+REQUEST_QUEUE_SIZE = 128
+LOOPBACK_ADDRESSES = ("127.0.0.1", "::1")
+FILE_CACHE_FILE_FRACTION = 8
+CACHE_CONTROL_RULES = {
+    ".html": "no-cache",
+    ".css": "public, max-age=300",
+    ".js": "public, max-age=300",
+    ".png": "public, max-age=86400",
+    ".jpg": "public, max-age=86400",
+    ".jpeg": "public, max-age=86400",
+    ".gif": "public, max-age=86400",
+    ".svg": "public, max-age=86400",
+    ".webp": "public, max-age=86400",
+    ".ico": "public, max-age=86400",
+    ".woff": "public, max-age=86400",
+    ".woff2": "public, max-age=86400",
+}
+DEFAULT_CACHE_CONTROL = "public, max-age=300"
+# Encodings of the siblings written by `src/main.py --compress`, in order of preference
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+PRECOMPRESSED_EXTENSIONS = {".html", ".css", ".js", ".json", ".svg", ".txt", ".xml", ".map"}
 
 
 class CORSHTTPRequestHandler(SimpleHTTPRequestHandler):
@@ -12,19 +46,369 @@ class CORSHTTPRequestHandler(SimpleHTTPRequestHandler):
 
     def do_OPTIONS(self):
         self.send_response(200, "OK")
+        self.send_header("Content-Length", "0")
         self.end_headers()
 
+    def log_request(self, code="-", size="-"):
+        if not getattr(self.server, "quiet", False):
+            super().log_request(code, size)
 
-def run(
-    server_class=HTTPServer,
-    handler_class=CORSHTTPRequestHandler,
+
+class FileCache:
+    """
+    Thread-safe LRU cache of file contents bounded by their total size in
+    bytes. Entries are keyed on path and remember the mtime and size they were
+    read with, so a file that changes on disk is read again. Files larger than
+    1/FILE_CACHE_FILE_FRACTION of the cache are never cached.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_bytes // FILE_CACHE_FILE_FRACTION
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, path, file_stat):
+        signature = (file_stat.st_mtime_ns, file_stat.st_size)
+        if file_stat.st_size > self.max_file_bytes:
+            return None
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self.entries.move_to_end(path)
+                return entry[1]
+        with open(path, "rb") as f:
+            body = f.read()
+        if len(body) != file_stat.st_size:
+            return None
+        with self.lock:
+            previous = self.entries.pop(path, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            self.entries[path] = (signature, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+        return body
+
+
+class PreviewHTTPServer(ThreadingHTTPServer):
+    """
+    Serves each connection on its own thread, so a slow client or an idle
+    keep-alive connection does not hold up anyone else.
+    """
+    request_queue_size = REQUEST_QUEUE_SIZE
+    quiet = False
+    file_cache = None
+    live_reload = None
+
+
+class PreviewHTTPRequestHandler(CORSHTTPRequestHandler):
+    """
+    Keeps connections alive between requests (HTTP/1.1) and sends file bodies
+    with sendfile, so their bytes go from the page cache to the socket without
+    being copied through Python. Idle connections are closed after
+    IDLE_TIMEOUT_SECONDS. Nagle's algorithm is disabled because headers and
+    body are sent separately, which would otherwise stall every keep-alive
+    response on the client's delayed ACK.
+
+    Files are served with a strong ETag and Last-Modified so revalidations
+    get a 304, a Cache-Control header chosen by file type, and support for
+    single byte-range requests. When the server has a FileCache, small files
+    are served from memory instead of disk. Text files that have an up to
+    date compressed sibling (same mtime) are sent compressed, zero-copy like
+    any other file, to clients whose Accept-Encoding allows it.
+    """
+    protocol_version = "HTTP/1.1"
+    timeout = IDLE_TIMEOUT_SECONDS
+    disable_nagle_algorithm = True
+    range_length = None
+
+    def send_head(self):
+        request_path = self.path.split("?", 1)[0].split("#", 1)[0]
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and request_path.endswith("/"):
+            path = os.path.join(path, "index.html")
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            return super().send_head()
+        if not stat.S_ISREG(file_stat.st_mode):
+            return super().send_head()
+        encoding, file_stat = self.negotiate_encoding(path, file_stat)
+        return self.send_file(path, file_stat, encoding)
+
+    def negotiate_encoding(self, path, file_stat):
+        """
+        Returns the preferred encoding the client accepts that has an up to
+        date sibling, with the sibling's stat, or (None, file_stat)
+        """
+        if os.path.splitext(path)[1].lower() not in PRECOMPRESSED_EXTENSIONS:
+            return None, file_stat
+        accepted = self.accepted_encodings()
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if encoding not in accepted and "*" not in accepted:
+                continue
+            try:
+                encoded_stat = os.stat(path + suffix)
+            except OSError:
+                continue
+            if encoded_stat.st_mtime_ns == file_stat.st_mtime_ns:
+                return encoding, encoded_stat
+        return None, file_stat
+
+    def accepted_encodings(self):
+        """
+        Returns the encodings the request's Accept-Encoding allows
+        """
+        accepted = set()
+        for item in self.headers.get("Accept-Encoding", "").split(","):
+            name, _, params = item.partition(";")
+            quality = 1.0
+            for param in params.split(";"):
+                key, _, value = param.strip().partition("=")
+                if key == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            if name.strip() and quality > 0:
+                accepted.add(name.strip().lower())
+        return accepted
+
+    def send_file(self, path, file_stat, encoding=None):
+        size = file_stat.st_size
+        tag = f"{file_stat.st_mtime_ns:x}-{size:x}"
+        etag = f'"{tag}-{encoding}"' if encoding is not None else f'"{tag}"'
+        extension = os.path.splitext(path)[1].lower()
+        validators = {
+            "ETag": etag,
+            "Last-Modified": self.date_time_string(file_stat.st_mtime),
+            "Cache-Control": CACHE_CONTROL_RULES.get(extension, DEFAULT_CACHE_CONTROL),
+            "Vary": "Accept-Encoding",
+        }
+        content_path = path
+        if encoding is not None:
+            content_path = path + dict(PRECOMPRESSED_ENCODINGS)[encoding]
+        if self.not_modified(etag, file_stat.st_mtime):
+            self.send_response(304)
+            for name, value in validators.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return None
+
+        requested = self.requested_range(size, etag)
+        if requested is False:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        start, end = requested or (0, size)
+
+        file_cache = getattr(self.server, "file_cache", None)
+        body = file_cache.get(content_path, file_stat) if file_cache is not None else None
+        if body is not None:
+            source = io.BytesIO(body[start:end] if requested else body)
+        else:
+            source = open(content_path, "rb")
+            source.seek(start)
+        self.range_length = end - start
+
+        self.send_response(206 if requested else 200)
+        self.send_header("Content-Type", self.guess_type(path))
+        if encoding is not None:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("Accept-Ranges", "bytes")
+        if requested:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{size}")
+        for name, value in validators.items():
+            self.send_header(name, value)
+        self.end_headers()
+        return source
+
+    def not_modified(self, etag, mtime):
+        """
+        Checks the request's If-None-Match, or failing that its
+        If-Modified-Since, against the file's validators
+        """
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return since.tzinfo is not None and int(mtime) <= since.timestamp()
+
+    def requested_range(self, size, etag):
+        """
+        Returns the (start, end) byte range requested by a single-range Range
+        header, None to send the whole file, or False if the range cannot be
+        satisfied
+        """
+        header = self.headers.get("Range")
+        if header is None or not header.startswith("bytes=") or "," in header:
+            return None
+        if_range = self.headers.get("If-Range")
+        if if_range is not None and if_range.strip() != etag:
+            return None
+        first, _, last = header[len("bytes="):].strip().partition("-")
+        try:
+            if first == "":
+                suffix = int(last)
+                start, end = max(0, size - suffix), size
+                if suffix == 0:
+                    return False
+            else:
+                start = int(first)
+                end = min(int(last) + 1, size) if last else size
+        except ValueError:
+            return None
+        if start >= size or end <= start:
+            return False
+        return start, end
+
+    def copyfile(self, source, outputfile):
+        try:
+            source.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            super().copyfile(source, outputfile)
+            return
+        self.connection.sendfile(source, source.tell(), self.range_length)
+
+
+class LiveReload:
+    """
+    Counts rebuilds and wakes the threads streaming events to browsers when
+    a new one is announced.
+    """
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.version = 0
+
+    def notify(self):
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+
+    def wait(self, version, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+class LiveReloadHTTPRequestHandler(PreviewHTTPRequestHandler):
+    """
+    Serves HTML pages with a script that reloads them when the watcher posts to
+    /__livereload, by streaming server-sent events to each open page.
+    """
+    live_reload = LiveReload()
+
+    def do_GET(self):
+        if self.path == LIVE_RELOAD_PATH:
+            self.stream_events()
+        else:
+            super().do_GET()
+
+    def do_POST(self):
+        if self.path != LIVE_RELOAD_PATH or self.client_address[0] not in LOOPBACK_ADDRESSES:
+            self.send_error(404)
+            return
+        self.live_reload.notify()
+        self.send_response(204)
+        self.end_headers()
+
+    def stream_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        version = self.live_reload.version
+        try:
+            while True:
+                latest = self.live_reload.wait(version, KEEPALIVE_SECONDS)
+                if latest == version:
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    version = latest
+                    self.wfile.write(b"data: reload\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def negotiate_encoding(self, path, file_stat):
+        if path.endswith(".html"):
+            return None, file_stat
+        return super().negotiate_encoding(path, file_stat)
+
+    def send_file(self, path, file_stat, encoding=None):
+        if not path.endswith(".html"):
+            return super().send_file(path, file_stat, encoding)
+        with open(path, "rb") as f:
+            body = f.read()
+        position = body.rfind(b"</body>")
+        if position == -1:
+            position = len(body)
+        body = body[:position] + LIVE_RELOAD_SCRIPT + body[position:]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        return io.BytesIO(body)
+
+
+def create_server(
+    server_class=PreviewHTTPServer,
+    handler_class=PreviewHTTPRequestHandler,
     port=8000,
     directory=None,
+    live_reload=False,
+    single_threaded=False,
+    quiet=False,
+    cache_size=0,
 ):
-    if directory:  # Change the current working directory if directory is specified
-        os.chdir(directory)
+    """
+    Returns a server bound to the port that serves files from directory, or
+    the current working directory, without changing the working directory, so
+    `src/main.py` can serve its output from the process that builds it.
+    """
+    if single_threaded:
+        server_class = HTTPServer
+        handler_class = CORSHTTPRequestHandler
+    elif live_reload:
+        handler_class = LiveReloadHTTPRequestHandler
     server_address = ("", port)
-    httpd = server_class(server_address, handler_class)
+    httpd = server_class(server_address, functools.partial(handler_class, directory=directory))
+    httpd.quiet = quiet
+    httpd.live_reload = getattr(handler_class, "live_reload", None)
+    if cache_size > 0:
+        httpd.file_cache = FileCache(cache_size)
+    return httpd
+
+
+def run(
+    server_class=PreviewHTTPServer,
+    handler_class=PreviewHTTPRequestHandler,
+    port=8000,
+    directory=None,
+    live_reload=False,
+    single_threaded=False,
+    quiet=False,
+    cache_size=0,
+):
+    httpd = create_server(
+        server_class, handler_class, port, directory, live_reload, single_threaded, quiet, cache_size
+    )
     print(f"Serving HTTP on http://localhost:{port} from directory '{directory}'...")
     httpd.serve_forever()
 
@@ -35,6 +419,32 @@ if __name__ == "__main__":
         "--dir", type=str, help="Directory to serve files from", default="."
     )
     parser.add_argument("--port", type=int, help="Port to serve HTTP on", default=8888)
+    parser.add_argument(
+        "--live-reload",
+        action="store_true",
+        help="Reload open pages when `src/main.py --watch` finishes a rebuild",
+    )
+    parser.add_argument(
+        "--single-threaded",
+        action="store_true",
+        help="Serve one request at a time without keep-alive, as plain http.server does",
+    )
+    parser.add_argument(
+        "--quiet", action="store_true", help="Do not log each request"
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=0,
+        help="Keep up to this many MiB of recently served files in memory (0 disables the cache)",
+    )
     args = parser.parse_args()
 
-    run(port=args.port, directory=args.dir)
+    run(
+        port=args.port,
+        directory=args.dir,
+        live_reload=args.live_reload,
+        single_threaded=args.single_threaded,
+        quiet=args.quiet,
+        cache_size=args.cache_size * 1024 * 1024,
+    )
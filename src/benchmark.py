@@ -0,0 +1,766 @@
+import os
+import sys
+import json
+import time
+import random
+import itertools
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import timeit
+import compileall
+import tracemalloc
+import http.client
+
+from block_markdown import (
+    block_type_code,
+    block_type_paragraph,
+    block_lines_to_block_type,
+    block_lines_to_html_node,
+    iter_blocks,
+    markdown_to_blocks,
+    markdown_to_html_node
+)
+from generate_page import discover_pages, generate_pages, page_url
+from inline_markdown import (
+    extract_markdown_images,
+    extract_markdown_links,
+    split_nodes_delimiter,
+    split_nodes_image,
+    split_nodes_link,
+    text_to_textnodes
+)
+from textnode import (
+    TextNode,
+    text_node_to_html_node,
+    text_type_text,
+    text_type_bold,
+    text_type_italic,
+    text_type_code
+)
+
+SRC_PATH = os.path.dirname(os.path.abspath(__file__))
+SERVER_PATH = os.path.join(SRC_PATH, "..", "server.py")
+SITE_TEMPLATE = "<!DOCTYPE html><html><head><title>{{ Title }}</title></head><body>{{ Content }}</body></html>"
+DIRECTORY_FANOUT = 10
+IMPORT_BUDGET_MS = 50
+# Page shapes of synthetic sites (see shape_document) and the directory
+# depth of those not spread DEFAULT_SHAPE_DEPTH deep
+SITE_SHAPES = ("code", "links", "lists", "mixed", "nested")
+SHAPE_DEPTHS = {"nested": 8}
+DEFAULT_SHAPE_DEPTH = 2
+
+
+def best_time(func, repeat: int = 5, min_duration: float = 0.2) -> float:
+    """
+        Returns the best observed seconds per call of func
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_duration / 0.2))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def chained_text_to_textnodes(text: str) -> list[TextNode]:
+    """
+        The original five-pass implementation of text_to_textnodes, kept as a baseline
+    """
+    nodes = [TextNode(text, text_type_text)]
+    nodes = split_nodes_delimiter(nodes, "**", text_type_bold)
+    nodes = split_nodes_delimiter(nodes, "*", text_type_italic)
+    nodes = split_nodes_delimiter(nodes, "`", text_type_code)
+    nodes = split_nodes_image(nodes)
+    nodes = split_nodes_link(nodes)
+    return nodes
+
+
+def link_heavy_paragraph(links: int) -> str:
+    """
+        Returns a paragraph with the given number of links and a little formatting
+    """
+    parts = ["A **bold** start with `code` and an ![image](/images/rivendell.png), then"]
+    for i in range(links):
+        parts.append(f"see [link number {i}](https://example.com/pages/{i}) and")
+    return " ".join(parts)
+
+
+def bench_inline(args: argparse.Namespace) -> None:
+    """
+        Compares the chained splitters with the single-pass scanner on link-heavy paragraphs
+    """
+    print(f"{'links':>8} {'chained ms':>12} {'scanner ms':>12} {'speedup':>9}")
+    for links in args.links:
+        text = link_heavy_paragraph(links)
+        if chained_text_to_textnodes(text) != text_to_textnodes(text):
+            raise ValueError(f"Scanner output differs from the chained splitters for {links} links")
+        chained = best_time(lambda: chained_text_to_textnodes(text))
+        scanner = best_time(lambda: text_to_textnodes(text))
+        print(f"{links:>8} {chained * 1000:>12.3f} {scanner * 1000:>12.3f} {chained / scanner:>8.1f}x")
+
+
+class DictTextNode:
+    """
+        A dict-backed TextNode with string text types, as the nodes were before __slots__
+    """
+    def __init__(self, text: str, text_type: str, url: None | str = None) -> None:
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+class DictLeafNode:
+    """
+        A dict-backed LeafNode that assigns its attributes twice, as LeafNode used to
+    """
+    def __init__(self, value: str, tag: None | str = None, props: None | dict = None) -> None:
+        self.tag = tag
+        self.value = value
+        self.children = None
+        self.props = props
+        self.value = value
+        self.tag = tag
+        self.props = props
+
+
+def dict_nodes(text_nodes: list[TextNode]) -> list:
+    """
+        Rebuilds parsed nodes as dict-backed text and leaf nodes
+    """
+    nodes = []
+    for node in text_nodes:
+        leaf = text_node_to_html_node(node)
+        nodes.append(DictTextNode(node.text, str(node.text_type), node.url))
+        nodes.append(DictLeafNode(leaf.value, leaf.tag, leaf.props))
+    return nodes
+
+
+def slotted_nodes(text_nodes: list[TextNode]) -> list:
+    """
+        Rebuilds parsed nodes as the current slotted text and leaf nodes
+    """
+    nodes = []
+    for node in text_nodes:
+        nodes.append(TextNode(node.text, node.text_type, node.url))
+        nodes.append(text_node_to_html_node(node))
+    return nodes
+
+
+def measure_allocations(func, *args) -> tuple[int, float]:
+    """
+        Returns the bytes still allocated by func's result and the seconds it took
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        start = timeit.default_timer()
+        result = func(*args)
+        elapsed = timeit.default_timer() - start
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return allocated, elapsed
+
+
+def bench_memory(args: argparse.Namespace) -> None:
+    """
+        Compares memory held by dict-backed nodes and the slotted nodes
+    """
+    text_nodes = text_to_textnodes(link_heavy_paragraph(args.links))
+    text_nodes = text_nodes * max(1, args.nodes // len(text_nodes))
+    dict_bytes, dict_time = measure_allocations(dict_nodes, text_nodes)
+    slotted_bytes, slotted_time = measure_allocations(slotted_nodes, text_nodes)
+    count = len(text_nodes) * 2
+    print(f"{'nodes':>10} {'layout':>8} {'bytes/node':>11} {'total MiB':>10} {'build ms':>10}")
+    for layout, allocated, elapsed in (("dict", dict_bytes, dict_time), ("slots", slotted_bytes, slotted_time)):
+        print(f"{count:>10} {layout:>8} {allocated / count:>11.1f} {allocated / 2**20:>10.2f} {elapsed * 1000:>10.1f}")
+    print(f"slotted nodes use {100 * (1 - slotted_bytes / dict_bytes):.0f}% less memory")
+
+
+def sample_document(sections: int) -> str:
+    """
+        Returns a markdown document exercising every block and inline type
+    """
+    parts = []
+    for i in range(sections):
+        parts.append(f"## Section {i}")
+        parts.append(
+            f"A paragraph with **bold**, *italic* and `code`, a [link](/pages/{i}) and an\n"
+            f"![image](/images/{i}.png) spread over two lines."
+        )
+        parts.append("> A quote\n> over two lines")
+        parts.append("* first item\n* second [item](/x)\n- third item")
+        parts.append("\n".join(f"{n}. ordered item {n}" for n in range(1, 11)))
+        parts.append("```\ndef code():\n    return 42\n```")
+    return "# Title\n\n" + "\n\n".join(parts)
+
+
+def parser_benchmarks() -> dict:
+    """
+        Returns the hot-path functions tracked by the parsers suite, keyed by name
+    """
+    document = sample_document(20)
+    paragraph = link_heavy_paragraph(50)
+    blocks = list(iter_blocks(document.split("\n")))
+    text_nodes = text_to_textnodes(paragraph)
+    tree = markdown_to_html_node(document)
+    long_list = [f"{n}. ordered item {n}" for n in range(1, 501)]
+    return {
+        "extract_markdown_images": lambda: extract_markdown_images(paragraph),
+        "extract_markdown_links": lambda: extract_markdown_links(paragraph),
+        "text_to_textnodes": lambda: text_to_textnodes(paragraph),
+        "text_node_to_html_node": lambda: [text_node_to_html_node(node) for node in text_nodes],
+        "markdown_to_blocks": lambda: markdown_to_blocks(document),
+        "block_lines_to_block_type": lambda: [block_lines_to_block_type(lines) for _, lines in blocks],
+        "block_lines_to_block_type_long_list": lambda: block_lines_to_block_type(long_list),
+        "block_lines_to_html_node": lambda: [block_lines_to_html_node(block_type, lines) for block_type, lines in blocks],
+        "markdown_to_html_node": lambda: markdown_to_html_node(document),
+        "to_html": tree.to_html,
+    }
+
+
+def links_document(size: int) -> str:
+    """
+        Returns a document of paragraphs dense with links and images
+    """
+    paragraphs = [link_heavy_paragraph(50) for _ in range(size)]
+    images = " ".join(f"![figure {i}](/images/figure{i}.png)" for i in range(20 * size))
+    return "# Links\n\n" + "\n\n".join(paragraphs) + "\n\n" + images
+
+
+def code_document(size: int) -> str:
+    """
+        Returns a document made mostly of long code blocks
+    """
+    code = "\n".join(f"    value_{i} = compute({i}) * 2  # line {i}" for i in range(200 * size))
+    return f"# Code\n\nA short introduction.\n\n```\n{code}\n```\n\n```\n{code}\n```"
+
+
+def list_document(size: int) -> str:
+    """
+        Returns a document made of very long ordered and unordered lists
+    """
+    unordered = "\n".join(f"* item {i} with **bold** and a [link](/items/{i})" for i in range(500 * size))
+    ordered = "\n".join(f"{i}. step {i} with `code`" for i in range(1, 500 * size + 1))
+    return f"# Lists\n\n{unordered}\n\n{ordered}"
+
+
+def shape_document(shape: str, size: int) -> str:
+    """
+        Returns the markdown document of one of SITE_SHAPES
+    """
+    if shape == "links":
+        return links_document(size)
+    if shape == "code":
+        return code_document(size)
+    if shape == "lists":
+        return list_document(size)
+    return sample_document(5 * size)
+
+
+def synthesize_content(
+        dir_path: str,
+        pages: int,
+        shape: str = "mixed",
+        size: int = 1,
+        depth: None | int = None,
+        extra=None
+    ) -> None:
+    """
+        Writes a content tree of synthetic markdown pages of a given shape.
+        Pages are spread over directories DIRECTORY_FANOUT wide and depth deep
+        (deeper for the nested shape), and each page's title is unique. If
+        given, extra is called with each page's number and its result appended
+        to the page.
+    """
+    if depth is None:
+        depth = SHAPE_DEPTHS.get(shape, DEFAULT_SHAPE_DEPTH)
+    body = shape_document(shape, size).split("\n", 1)[1]
+    made_dirs = set()
+    for i in range(pages):
+        parts = [f"d{(i // DIRECTORY_FANOUT ** (level + 1)) % DIRECTORY_FANOUT}" for level in reversed(range(depth))]
+        page_dir = os.path.join(dir_path, *parts)
+        if page_dir not in made_dirs:
+            os.makedirs(page_dir, exist_ok=True)
+            made_dirs.add(page_dir)
+        with open(os.path.join(page_dir, f"page{i}.md"), "w", encoding="utf-8") as f:
+            f.write(f"# Page {i}\n{body}")
+            if extra is not None:
+                f.write(extra(i))
+
+
+def generate_site(dir_path: str, pages: int, sections: int = 5, asset_bytes: int = 256 * 1024) -> list[str]:
+    """
+        Builds a synthetic site of sample documents and one static asset into
+        dir_path/public and returns the URLs of its files
+    """
+    content = os.path.join(dir_path, "content")
+    public = os.path.join(dir_path, "public")
+    template_path = os.path.join(dir_path, "template.html")
+    with open(template_path, "w", encoding="utf-8") as f:
+        f.write(SITE_TEMPLATE)
+    synthesize_content(content, pages, size=max(1, sections // 5))
+    pages = discover_pages(content, public)
+    generate_pages(pages, template_path, dest_dir_path=public)
+    os.makedirs(os.path.join(public, "images"), exist_ok=True)
+    with open(os.path.join(public, "images", "large.png"), "wb") as f:
+        f.write(os.urandom(asset_bytes))
+    return [page_url(dest_path, public) for _, dest_path in pages] + ["/images/large.png"]
+
+
+def stage_benchmarks(documents: list[str]) -> dict:
+    """
+        Returns each parser stage run over a list of documents, keyed by stage
+    """
+    blocks = [list(iter_blocks(document.split("\n"))) for document in documents]
+    inline_texts = []
+    for page in blocks:
+        for block_type, lines in page:
+            if block_type == block_type_paragraph:
+                inline_texts.append(" ".join(lines))
+            elif block_type != block_type_code:
+                inline_texts.extend(line.lstrip("#>*-0123456789. ") for line in lines)
+    return {
+        "block_split": lambda: [list(iter_blocks(document.split("\n"))) for document in documents],
+        "inline_parse": lambda: [text_to_textnodes(text) for text in inline_texts],
+        "html_nodes": lambda: [
+            [block_lines_to_html_node(block_type, lines) for block_type, lines in page] for page in blocks
+        ],
+        "render": lambda: [markdown_to_html_node(document).to_html() for document in documents],
+    }
+
+
+def bench_site(args: argparse.Namespace) -> None:
+    """
+        Builds synthetic sites end to end and measures each parser stage on
+        their pages, reporting seconds per page
+    """
+    results = {}
+    print(f"{'shape':<8} {'pages':>8} {'stage':<14} {'ms/page':>10} {'pages/s':>10}")
+    for shape in args.shapes:
+        with tempfile.TemporaryDirectory() as tmp:
+            content = os.path.join(tmp, "content")
+            public = os.path.join(tmp, "public")
+            template_path = os.path.join(tmp, "template.html")
+            with open(template_path, "w", encoding="utf-8") as f:
+                f.write(SITE_TEMPLATE)
+            synthesize_content(content, args.pages, shape, args.size)
+            with open(os.devnull, "w") as devnull:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    start = time.perf_counter()
+                    pages = discover_pages(content, public)
+                    failures = generate_pages(pages, template_path, args.jobs, public)
+                    elapsed = time.perf_counter() - start
+                finally:
+                    sys.stdout = stdout
+            if failures:
+                raise ValueError(f"{len(failures)} synthetic page(s) failed to build: {failures[0]}")
+            timings = {"build": elapsed / len(pages)}
+            sample = []
+            for from_path, _ in pages[:args.sample]:
+                with open(from_path, "r", encoding="utf-8") as f:
+                    sample.append(f.read())
+        for stage, func in stage_benchmarks(sample).items():
+            timings[stage] = best_time(func, repeat=3) / len(sample)
+        for stage, seconds in timings.items():
+            results[f"{shape}_{stage}"] = seconds
+            print(f"{shape:<8} {len(pages):>8} {stage:<14} {seconds * 1000:>10.3f} {1 / seconds:>10.0f}")
+    report_results(args, "site", results)
+
+
+def random_words(rng: random.Random, vocabulary: list[str], cum_weights: list[float], words: int) -> str:
+    """
+        Returns a paragraph of words drawn from a vocabulary with the given
+        cumulative weights
+    """
+    return " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=words))
+
+
+def bench_search(args: argparse.Namespace) -> None:
+    """
+        Measures building a synthetic site with its search index, the number of
+        index files and their size, and updating both after a fraction of the
+        pages change. Terms are collected while pages render, so the index time
+        is only that of merging them into the shards.
+    """
+    # Imported here as only this benchmark needs the manifest and the search index
+    from build_manifest import BuildManifest
+    from generate_page import use_search_terms
+    from incremental import generate_pages_incremental
+    from search_index import SearchIndex
+
+    rng = random.Random(0)
+    vocabulary = list(dict.fromkeys(
+        "".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(3, 10))) for _ in range(args.vocabulary)
+    ))
+    # A Zipf-like distribution, so a few words are common and most are rare
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+    with tempfile.TemporaryDirectory() as tmp:
+        content = os.path.join(tmp, "content")
+        public = os.path.join(tmp, "public")
+        template_path = os.path.join(tmp, "template.html")
+        index_dir = os.path.join(public, "search")
+        state_path = os.path.join(tmp, "search.json")
+        manifest = BuildManifest(os.path.join(tmp, "manifest.json"))
+        with open(template_path, "w", encoding="utf-8") as f:
+            f.write(SITE_TEMPLATE)
+        synthesize_content(
+            content, args.pages, extra=lambda i: "\n\n" + random_words(rng, vocabulary, cum_weights, args.words) + "\n"
+        )
+        pages = discover_pages(content, public)
+
+        def build() -> tuple[float, float, dict]:
+            index = SearchIndex(state_path, index_dir)
+            records = {}
+            with open(os.devnull, "w") as devnull:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    start = time.perf_counter()
+                    generate_pages_incremental(
+                        content,
+                        template_path,
+                        public,
+                        manifest,
+                        args.jobs,
+                        rebuild=index.stale_pages(manifest.pages),
+                        records=records
+                    )
+                    rendered = time.perf_counter()
+                finally:
+                    sys.stdout = stdout
+            report = index.update(manifest.pages, records, public)
+            index.save()
+            return rendered - start, time.perf_counter() - rendered, report
+
+        use_search_terms(True)
+        try:
+            render, full, _ = build()
+            files = [entry for entry in os.scandir(index_dir)]
+            index_bytes = sum(entry.stat().st_size for entry in files)
+
+            changed = rng.sample(pages, max(1, int(len(pages) * args.changed)))
+            for from_path, _ in changed:
+                with open(from_path, "a", encoding="utf-8") as f:
+                    f.write("\n\n" + random_words(rng, vocabulary, cum_weights, args.words) + "\n")
+            update_render, update, report = build()
+        finally:
+            use_search_terms(False)
+
+    print(f"{'pages':>8} {'render s':>10} {'index s':>10} {'ms/page':>10} {'index MiB':>10} {'files':>8}")
+    print(f"{len(pages):>8} {render:>10.2f} {full:>10.2f} {full / len(pages) * 1000:>10.3f} "
+          f"{index_bytes / 2 ** 20:>10.1f} {len(files):>8}")
+    print(f"{'changed':>8} {'render s':>10} {'index s':>10} {'shards':>10}")
+    print(f"{len(changed):>8} {update_render:>10.2f} {update:>10.2f} {report['shards']:>10}")
+    report_results(args, "search", {
+        "search_build": full / len(pages),
+        "search_update": update / len(changed),
+        "search_bytes_per_page": index_bytes / len(pages),
+        "search_files": len(files),
+    })
+
+
+def free_port() -> int:
+    """
+        Returns a TCP port that is currently free on localhost
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(directory: str, port: int, extra_args: list[str]) -> subprocess.Popen:
+    """
+        Starts server.py on a port and waits until it accepts connections
+    """
+    process = subprocess.Popen(
+        [sys.executable, SERVER_PATH, "--dir", directory, "--port", str(port), "--quiet", *extra_args],
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("server.py did not start")
+
+
+def load_test(port: int, urls: list[str], clients: int, duration: float, keep_alive: bool) -> list[float]:
+    """
+        Requests random URLs from concurrent clients for duration seconds and
+        returns the latency of every completed request
+    """
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(seed: int) -> None:
+        rng = random.Random(seed)
+        local = []
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            connection.request("GET", rng.choice(urls))
+            response = connection.getresponse()
+            response.read()
+            local.append(time.perf_counter() - start)
+            if not keep_alive or response.will_close:
+                connection.close()
+        connection.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def bench_serve(args: argparse.Namespace) -> None:
+    """
+        Measures requests per second and tail latency of server.py under
+        concurrent load
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        urls = generate_site(tmp, args.pages)
+        port = free_port()
+        extra_args = ["--single-threaded"] if args.single_threaded else []
+        server = start_server(os.path.join(tmp, "public"), port, extra_args)
+        try:
+            latencies = sorted(load_test(port, urls, args.clients, args.duration, not args.no_keep_alive))
+        finally:
+            server.terminate()
+            server.wait()
+    requests = len(latencies)
+    if not requests:
+        print(f"No requests completed in {args.duration:g} s")
+        sys.exit(1)
+    p50 = latencies[requests // 2]
+    p99 = latencies[min(requests - 1, int(requests * 0.99))]
+    print(f"{'requests':>10} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    print(f"{requests:>10} {requests / args.duration:>10.0f} {p50 * 1000:>10.2f} {p99 * 1000:>10.2f}")
+    report_results(args, "serve", {"serve_request": args.duration / requests, "serve_p99": p99})
+
+
+def import_times(module: str) -> dict:
+    """
+        Imports a module in a fresh interpreter with -X importtime and returns
+        the cumulative import time of it and of each module it loaded, in
+        seconds
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_PATH,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def bench_imports(args: argparse.Namespace) -> None:
+    """
+        Measures how long the build's modules take to import, and exits with
+        an error if importing main exceeds the budget
+    """
+    # Time imports from bytecode, as they are once the modules have been run
+    compileall.compile_dir(SRC_PATH, quiet=1)
+    results = {}
+    print(f"{'module':<28} {'best ms':>10} {'median ms':>10}")
+    for module in args.modules:
+        runs = [import_times(module) for _ in range(args.repeat)]
+        totals = sorted(run[module] for run in runs)
+        results[f"import_{module}"] = totals[0]
+        print(f"{module:<28} {totals[0] * 1000:>10.2f} {totals[len(totals) // 2] * 1000:>10.2f}")
+        if args.top:
+            best = min(runs, key=lambda run: run[module])
+            slowest = sorted(((seconds, name) for name, seconds in best.items() if name != module), reverse=True)
+            for seconds, name in slowest[:args.top]:
+                print(f"  {name:<26} {seconds * 1000:>10.2f}")
+    over_budget = "main" in args.modules and results["import_main"] * 1000 > args.budget_ms
+    if over_budget:
+        print(f"Importing main took {results['import_main'] * 1000:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+    report_results(args, "imports", results)
+    if over_budget:
+        sys.exit(1)
+
+
+def write_results(path: str, suite: str, results: dict) -> None:
+    """
+        Writes benchmark results, in seconds per operation, to a JSON file
+    """
+    data = {
+        "suite": suite,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def compare_results(results: dict, baseline_path: str, threshold: float) -> list[str]:
+    """
+        Compares results with a baseline file and returns the names of the
+        benchmarks that got slower by more than threshold (e.g. 0.1 for 10%)
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+        change = seconds / baseline[name] - 1
+        status = "REGRESSION" if change > threshold else "ok"
+        print(f"{name:<28} {change * 100:>+8.1f}% {status}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def report_results(args: argparse.Namespace, suite: str, results: dict) -> None:
+    """
+        Saves results and exits with an error if they regressed against the baseline
+    """
+    if args.output:
+        write_results(args.output, suite, results)
+    if args.baseline:
+        regressions = compare_results(results, args.baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+def bench_parsers(args: argparse.Namespace) -> None:
+    """
+        Measures the throughput of each parser hot path
+    """
+    results = {}
+    print(f"{'function':<36} {'us/op':>12} {'ops/s':>12}")
+    for name, func in parser_benchmarks().items():
+        if args.only and name not in args.only:
+            continue
+        seconds = best_time(func)
+        results[name] = seconds
+        print(f"{name:<36} {seconds * 1e6:>12.2f} {1 / seconds:>12.0f}")
+    report_results(args, "parsers", results)
+
+
+def add_result_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+        Adds the options for saving results and comparing them with a baseline
+    """
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare results with this JSON file")
+    parser.add_argument(
+        "--threshold", type=float, default=0.10,
+        help="Slowdown relative to the baseline that counts as a regression",
+    )
+
+
+def main(argv: None | list = None) -> None:
+    parser = argparse.ArgumentParser(description="Static site generator benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    inline_parser = subparsers.add_parser("inline", help="Inline markdown tokenizer")
+    inline_parser.add_argument(
+        "--links", type=int, nargs="+", default=[10, 100, 500, 1000, 5000, 10000],
+        help="Paragraph sizes to benchmark, in links per paragraph",
+    )
+    inline_parser.set_defaults(func=bench_inline)
+
+    memory_parser = subparsers.add_parser("memory", help="Node memory footprint")
+    memory_parser.add_argument(
+        "--nodes", type=int, default=200_000,
+        help="Approximate number of text nodes to allocate",
+    )
+    memory_parser.add_argument(
+        "--links", type=int, default=1000,
+        help="Links per generated paragraph",
+    )
+    memory_parser.set_defaults(func=bench_memory)
+
+    parsers_parser = subparsers.add_parser("parsers", help="Per-function parser throughput")
+    parsers_parser.add_argument("--only", nargs="+", help="Only run these benchmarks")
+    add_result_arguments(parsers_parser)
+    parsers_parser.set_defaults(func=bench_parsers)
+
+    site_parser = subparsers.add_parser("site", help="End-to-end builds of synthetic sites")
+    site_parser.add_argument("--pages", type=int, default=1000, help="Pages per synthetic site")
+    site_parser.add_argument(
+        "--shapes", nargs="+", choices=SITE_SHAPES, default=list(SITE_SHAPES),
+        help="Kinds of site to generate",
+    )
+    site_parser.add_argument("--size", type=int, default=1, help="Multiplier for the length of each page")
+    site_parser.add_argument("--jobs", "-j", type=int, default=1, help="Worker processes for the build")
+    site_parser.add_argument(
+        "--sample", type=int, default=100,
+        help="Pages used to time the individual parser stages",
+    )
+    add_result_arguments(site_parser)
+    site_parser.set_defaults(func=bench_site)
+
+    serve_parser = subparsers.add_parser("serve", help="server.py throughput and latency")
+    serve_parser.add_argument("--pages", type=int, default=1000, help="Pages in the generated site")
+    serve_parser.add_argument("--clients", type=int, default=16, help="Concurrent client connections")
+    serve_parser.add_argument("--duration", type=float, default=5.0, help="Seconds to run the load for")
+    serve_parser.add_argument(
+        "--single-threaded", action="store_true",
+        help="Benchmark server.py's single-threaded mode",
+    )
+    serve_parser.add_argument(
+        "--no-keep-alive", action="store_true",
+        help="Open a new connection for every request",
+    )
+    add_result_arguments(serve_parser)
+    serve_parser.set_defaults(func=bench_serve)
+
+    search_parser = subparsers.add_parser("search", help="Search index build time and size")
+    search_parser.add_argument("--pages", type=int, default=50_000, help="Pages in the synthetic site")
+    search_parser.add_argument("--words", type=int, default=200, help="Random words added to each page")
+    search_parser.add_argument("--vocabulary", type=int, default=20_000, help="Distinct random words")
+    search_parser.add_argument(
+        "--changed", type=float, default=0.01,
+        help="Fraction of pages edited before timing an incremental update",
+    )
+    search_parser.add_argument("--jobs", "-j", type=int, default=1, help="Worker processes for rendering pages")
+    add_result_arguments(search_parser)
+    search_parser.set_defaults(func=bench_search)
+
+    imports_parser = subparsers.add_parser("imports", help="Module import time (-X importtime)")
+    imports_parser.add_argument(
+        "--modules", nargs="+", default=["main"],
+        help="Modules to import, each in a fresh interpreter",
+    )
+    imports_parser.add_argument("--repeat", type=int, default=5, help="Imports timed per module")
+    imports_parser.add_argument("--top", type=int, default=10, help="Slowest dependencies to list")
+    imports_parser.add_argument(
+        "--budget-ms", type=float, default=IMPORT_BUDGET_MS,
+        help="Fail if importing main takes longer than this many milliseconds",
+    )
+    add_result_arguments(imports_parser)
+    imports_parser.set_defaults(func=bench_imports)
+
+    args = parser.parse_args(argv)
+    if args.func is bench_serve and (args.clients < 1 or args.duration <= 0):
+        serve_parser.error("--clients must be at least 1 and --duration positive")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,16 @@
+from collections.abc import Iterable, Iterator
+
 from htmlnode import ParentNode
 from inline_markdown import text_to_textnodes
+from parser_tables import (
+    HEADING_PATTERN,
+    CODE_FENCE,
+    QUOTE_PREFIX,
+    UNORDERED_LIST_PREFIXES,
+    ORDERED_LIST_PREFIXES,
+    MAX_TERM_LENGTH,
+    TERM_PATTERN
+)
 from textnode import text_node_to_html_node
 
 block_type_paragraph = "paragraph"
@@ -9,53 +20,99 @@ block_type_quote = "quote"
 block_type_unordered_list = "unordered_list"
 block_type_ordered_list = "ordered_list"
 
+def iter_lines(lines: Iterable[str]) -> Iterator[str]:
+    """
+        Strips the trailing newline from each line read from a file object
+    """
+    for line in lines:
+        if line.endswith("\n"):
+            line = line[:-1]
+        yield line
+
+
+def iter_block_lines(lines: Iterable[str]) -> Iterator[list[str]]:
+    """
+        Groups lines into blocks separated by empty lines, yielding the lines of
+        each block with surrounding whitespace stripped from the block
+    """
+    block = []
+    for line in lines:
+        if line != "":
+            block.append(line)
+        elif block:
+            yield _strip_block(block)
+            block = []
+    if block:
+        yield _strip_block(block)
+
+
+def _strip_block(lines: list[str]) -> list[str]:
+    """
+        Strips leading and trailing whitespace from a block given as lines
+    """
+    start = 0
+    end = len(lines)
+    while start < end and lines[start].strip() == "":
+        start += 1
+    while end > start and lines[end - 1].strip() == "":
+        end -= 1
+    if start == end:
+        return [""]
+    lines = lines[start:end]
+    lines[0] = lines[0].lstrip()
+    lines[-1] = lines[-1].rstrip()
+    return lines
+
+
+def iter_blocks(lines: Iterable[str]) -> Iterator[tuple[str, list[str]]]:
+    """
+        Yields the type and lines of each block read from an iterable of lines,
+        holding at most one block in memory
+    """
+    for block_lines in iter_block_lines(lines):
+        yield block_lines_to_block_type(block_lines), block_lines
+
+
 def markdown_to_blocks(markdown: str) -> list:
     """
     Converts a markdown string to a list of blocks
     """
-    split_md = markdown.split("\n\n")
-    filtered = []
-    for split in split_md:
-        if split == '':
-            continue
-        split = split.strip()
-        filtered.append(split)
-    return filtered
+    return ["\n".join(lines) for lines in iter_block_lines(markdown.split("\n"))]
 
 
 def block_to_block_type(block: str) -> str:
     """
         Returns the type of block based on the input
     """
-    lines = block.split("\n")
-    
-    if (
-        block.startswith("# ")
-        or block.startswith("## ")
-        or block.startswith("### ")
-        or block.startswith("#### ")
-        or block.startswith("##### ")
-        or block.startswith("###### ")
-    ):
+    return block_lines_to_block_type(block.split("\n"))
+
+
+def block_lines_to_block_type(lines: list[str]) -> str:
+    """
+        Returns the type of a block given as lines
+    """
+    first = lines[0]
+    if HEADING_PATTERN.match(first):
         return block_type_heading
-    if len(lines) > 1 and lines[0].startswith("```") and lines[-1].startswith("```"):
+    if len(lines) > 1 and first.startswith(CODE_FENCE) and lines[-1].startswith(CODE_FENCE):
         return block_type_code
-    if block.startswith("> "):
+    if first.startswith(QUOTE_PREFIX):
         for line in lines:
             if not line.startswith(">"):
                 return block_type_paragraph
         return block_type_quote
-    if block.startswith("* ") or block.startswith("- "):
+    if first.startswith(UNORDERED_LIST_PREFIXES):
         for line in lines:
-            if not line.startswith("* ") and not line.startswith("- "):
+            if not line.startswith(UNORDERED_LIST_PREFIXES):
                 return block_type_paragraph
         return block_type_unordered_list
-    if block.startswith("1. "):
-        i = 1
-        for line in lines:
-            if not line.startswith(f"{i}. "):
+    if first.startswith("1. "):
+        for line, prefix in zip(lines, ORDERED_LIST_PREFIXES):
+            if not line.startswith(prefix):
+                return block_type_paragraph
+        for i in range(len(ORDERED_LIST_PREFIXES), len(lines)):
+            if not lines[i].startswith(f"{i + 1}. "):
                 return block_type_paragraph
-            i += 1
         return block_type_ordered_list
     return block_type_paragraph
 
@@ -64,32 +121,121 @@ def block_to_html_node(block):
     """
         Converts a block type to a html node
     """
-    block_type = block_to_block_type(block)
-    if block_type == block_type_paragraph:
-        return paragraph_to_html_node(block)
-    if block_type == block_type_heading:
-        return heading_to_html_node(block)
-    if block_type == block_type_code:
-        return code_to_html_node(block)
-    if block_type == block_type_ordered_list:
-        return ordered_list_to_html_node(block)
-    if block_type == block_type_unordered_list:
-        return unordered_list_to_html_node(block)
-    if block_type == block_type_quote:
-        return quote_to_html_node(block)
-    raise ValueError("Invalid block type")
+    lines = block.split("\n")
+    return block_lines_to_html_node(block_lines_to_block_type(lines), lines)
+
+
+def block_lines_to_html_node(block_type: str, lines: list[str]) -> ParentNode:
+    """
+        Converts a block given as its type and lines to a html node
+    """
+    handler = BLOCK_TYPE_HANDLERS.get(block_type)
+    if handler is None:
+        raise ValueError("Invalid block type")
+    return handler(lines)
+
+
+def iter_html_nodes(lines: Iterable[str]) -> Iterator[ParentNode]:
+    """
+        Yields the html node for each block read from an iterable of lines
+    """
+    for block_type, block_lines in iter_blocks(lines):
+        yield block_lines_to_html_node(block_type, block_lines)
 
 
 def markdown_to_html_node(markdown: str) -> ParentNode:
     """
         Converts a markdown string to a html node
     """
-    blocks = markdown_to_blocks(markdown)
-    children = []
-    for block in blocks:
-        html_node = block_to_html_node(block)
-        children.append(html_node)
-    return ParentNode(children, "div")
+    return ParentNode(list(iter_html_nodes(markdown.split("\n"))), "div")
+
+
+def render_markdown_to(
+        lines: Iterable[str],
+        write,
+        images: None | list = None,
+        block_cache=None,
+        links: None | list = None,
+        texts: None | list = None
+    ) -> None:
+    """
+        Streams the html for markdown read from an iterable of lines to a write
+        callable, one block at a time. If given, the URL of every image is
+        appended to images, the target of every link to links and the text of
+        every block (see html_node_text) to texts. With a block cache, blocks
+        whose text has been rendered before are taken from it instead of being
+        parsed.
+    """
+    write("<div>")
+    for block_type, block_lines in iter_blocks(lines):
+        if block_cache is not None:
+            html, block_images, block_links, block_text = block_cache.render(block_type, block_lines)
+            write(html)
+        else:
+            node = block_lines_to_html_node(block_type, block_lines)
+            block_images = html_node_images(node) if images is not None else ()
+            block_links = html_node_links(node) if links is not None else ()
+            block_text = html_node_text(node) if texts is not None else ""
+            node.render_to(write)
+        if images is not None:
+            images.extend(block_images)
+        if links is not None:
+            links.extend(block_links)
+        if texts is not None:
+            texts.append(block_text)
+    write("</div>")
+
+
+def html_node_images(node) -> list[str]:
+    """
+        Returns the URLs of the images in a html node
+    """
+    return [child.props["src"] for child in node.iter_nodes() if child.tag == "img" and child.props]
+
+
+def html_node_links(node) -> list[str]:
+    """
+        Returns the targets of the links in a html node
+    """
+    return [child.props["href"] for child in node.iter_nodes() if child.tag == "a" and child.props]
+
+
+def html_node_text(node) -> str:
+    """
+        Returns the text a reader sees in a html node, one line per text node,
+        including image alt text but not markup or URLs
+    """
+    texts = []
+    for child in node.iter_nodes():
+        if child.tag == "img":
+            text = child.props.get("alt", "") if child.props else ""
+        else:
+            text = child.value
+        if text:
+            texts.append(text)
+    return "\n".join(texts)
+
+
+def tokenize(text: str) -> list[str]:
+    """
+        Splits text into lowercase search terms
+    """
+    return [term for term in TERM_PATTERN.findall(text.lower()) if len(term) <= MAX_TERM_LENGTH]
+
+
+def term_positions(texts: Iterable[str]) -> dict[str, list[int]]:
+    """
+        Returns the positions of each search term in a page's block texts,
+        counted in terms from the start of the page
+    """
+    positions = {}
+    position = 0
+    for text in texts:
+        for term in tokenize(text):
+            positions.setdefault(term, []).append(position)
+            position += 1
+    return positions
+
 
 def text_to_children(text: str) -> list:
     """
@@ -103,20 +249,20 @@ def text_to_children(text: str) -> list:
     return children
 
 
-def paragraph_to_html_node(block: str) -> ParentNode:
+def paragraph_to_html_node(lines: list[str]) -> ParentNode:
     """
         Converts a paragraph block to a html node
     """
-    lines = block.split("\n")
     paragraph = " ".join(lines)
     children = text_to_children(paragraph)
     return ParentNode(children, "p")
 
 
-def heading_to_html_node(block: str) -> ParentNode:
+def heading_to_html_node(lines: list[str]) -> ParentNode:
     """
         Converts a heading block to a html node
     """
+    block = "\n".join(lines)
     level = 0
     for char in block:
         if char == "#":
@@ -130,11 +276,12 @@ def heading_to_html_node(block: str) -> ParentNode:
     return ParentNode(children, f"h{level}")
 
 
-def code_to_html_node(block: str) -> ParentNode:
+def code_to_html_node(lines: list[str]) -> ParentNode:
     """
         Converts a code block to a html node
     """
-    if not block.startswith("```") or not block.endswith("```"):
+    block = "\n".join(lines)
+    if not block.startswith(CODE_FENCE) or not block.endswith(CODE_FENCE):
         raise ValueError(f"Invalid code block: {block}")
     text = block[4:-3]
     children = text_to_children(text)
@@ -142,42 +289,50 @@ def code_to_html_node(block: str) -> ParentNode:
     return ParentNode([code], "pre")
 
 
-def ordered_list_to_html_node(block: str) -> ParentNode:
+def ordered_list_to_html_node(lines: list[str]) -> ParentNode:
     """
         Converts an ordered list block to a html node
     """
-    items = block.split("\n")
     html_items = []
-    for item in items:
+    for item in lines:
         text = item[3:]
         children = text_to_children(text)
         html_items.append(ParentNode(children, "li"))
     return ParentNode(html_items, "ol")
 
 
-def unordered_list_to_html_node(block: str) -> ParentNode:
+def unordered_list_to_html_node(lines: list[str]) -> ParentNode:
     """
         Converts an unordered list block to a html node
     """
-    items = block.split("\n")
     html_items = []
-    for item in items:
+    for item in lines:
         text = item[2:]
         children = text_to_children(text)
         html_items.append(ParentNode(children, "li"))
     return ParentNode(html_items, "ul")
 
 
-def quote_to_html_node(block: str) -> ParentNode:
+def quote_to_html_node(lines: list[str]) -> ParentNode:
     """
         Converts a quote block to a html node
     """
-    lines = block.split("\n")
     new_lines = []
     for line in lines:
         if not line.startswith(">"):
+            block = "\n".join(lines)
             raise ValueError(f"Invalid quote block: {block}")
         new_lines.append(line.lstrip(">").strip())
     text = " ".join(new_lines)
     children = text_to_children(text)
     return ParentNode(children, "blockquote")
+
+
+BLOCK_TYPE_HANDLERS = {
+    block_type_paragraph: paragraph_to_html_node,
+    block_type_heading: heading_to_html_node,
+    block_type_code: code_to_html_node,
+    block_type_ordered_list: ordered_list_to_html_node,
+    block_type_unordered_list: unordered_list_to_html_node,
+    block_type_quote: quote_to_html_node,
+}
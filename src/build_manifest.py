@@ -0,0 +1,204 @@
+import os
+import json
+import hashlib
+
+MANIFEST_VERSION = 4
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """
+        Returns the sha256 hex digest of a file's contents
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(path: str) -> list:
+    """
+        Returns the cheap (mtime, size) signature of a file from a single stat call
+    """
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class BuildManifest:
+    """
+        Persistent record of what the last build produced, and the dependency
+        graph between its inputs and outputs.
+
+        Each page entry maps a source file to the content hash it had when it
+        was built, its stat signature (so unchanged files are detected without
+        reading them), the output path it was written to, its title and
+        description, and the static assets and site paths it references. The
+        template is tracked the same way, and every static asset copied to the
+        output is recorded so copies of deleted assets can be removed.
+    """
+    def __init__(
+            self,
+            path: str,
+            template: None | dict = None,
+            pages: None | dict = None,
+            assets: None | dict = None
+        ) -> None:
+        self.path = path
+        self.template = template or {}
+        self.pages = pages or {}
+        self.assets = assets or {}
+
+    @classmethod
+    def load(cls, path: str) -> "BuildManifest":
+        """
+            Loads a manifest from disk, returning an empty one if it is missing or unreadable
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(path)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, data.get("template"), data.get("pages"), data.get("assets"))
+
+    def save(self) -> None:
+        """
+            Atomically writes the manifest to disk
+        """
+        dir_path = os.path.dirname(self.path)
+        if dir_path != "":
+            os.makedirs(dir_path, exist_ok=True)
+        data = {
+            "version": MANIFEST_VERSION,
+            "template": self.template,
+            "pages": self.pages,
+            "assets": self.assets,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def file_hash(self, entry: None | dict, path: str) -> tuple[str, list]:
+        """
+            Returns the hash and signature of a file, reusing the hash recorded in
+            the entry when the stat signature has not changed
+        """
+        signature = file_signature(path)
+        if entry is not None and entry.get("signature") == signature:
+            return entry["hash"], signature
+        return hash_file(path), signature
+
+    def template_changed(self, template_path: str, asset_urls: None | list = None) -> bool:
+        """
+            Checks the template against the manifest and records its current state
+            and the asset URLs it references
+        """
+        content_hash, signature = self.file_hash(self.template, template_path)
+        changed = self.template.get("hash") != content_hash
+        self.template = {"hash": content_hash, "signature": signature, "assets": asset_urls or []}
+        return changed
+
+    def page_changed(self, from_path: str, dest_path: str) -> list[str]:
+        """
+            Checks whether a page needs regenerating, records its current state and
+            returns the reasons it changed (empty when it did not)
+        """
+        entry = self.pages.get(from_path)
+        content_hash, signature = self.file_hash(entry, from_path)
+        if entry is None:
+            reasons = ["new page"]
+            entry = self.pages[from_path] = {}
+        else:
+            reasons = []
+            if entry.get("hash") != content_hash:
+                reasons.append("markdown changed")
+            if entry.get("dest") != dest_path:
+                reasons.append("output path changed")
+            elif not os.path.exists(dest_path):
+                reasons.append("output missing")
+        entry.update({"hash": content_hash, "signature": signature, "dest": dest_path})
+        return reasons
+
+    def record_page(self, from_path: str, record: dict) -> None:
+        """
+            Stores the metadata and dependencies produced by rendering a page
+        """
+        self.pages[from_path].update(record)
+
+    def forget_page(self, from_path: str) -> None:
+        """
+            Drops a page from the manifest so the next build regenerates it
+        """
+        self.pages.pop(from_path, None)
+
+    def remove_stale_pages(self, from_paths: set) -> list:
+        """
+            Deletes outputs whose sources no longer exist and returns their paths
+        """
+        return self.remove_pages(set(self.pages) - from_paths)
+
+    def remove_pages(self, from_paths: set) -> list:
+        """
+            Deletes the outputs of the given recorded pages and returns their paths
+        """
+        removed = []
+        for from_path in sorted(from_paths & set(self.pages)):
+            dest_path = self.pages.pop(from_path)["dest"]
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+            removed.append(dest_path)
+        return removed
+
+    def record_asset(self, asset: str, signature: list) -> None:
+        """
+            Records a static asset copied to the output directory
+        """
+        self.assets[asset] = {"signature": signature}
+
+    def remove_stale_assets(self, assets: set, dest_dir_path: str) -> list:
+        """
+            Deletes copies of assets that no longer exist and returns their paths
+        """
+        removed = []
+        for asset in sorted(set(self.assets) - assets):
+            del self.assets[asset]
+            dest_path = os.path.join(dest_dir_path, asset)
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+            removed.append(dest_path)
+        return removed
+
+    def dependents(self, asset: str) -> list[str]:
+        """
+            Returns the pages that reference a static asset, or ["template"] when
+            every page references it through the template
+        """
+        if asset in self.template.get("assets", []):
+            return ["template"]
+        return sorted(
+            from_path for from_path, entry in self.pages.items()
+            if asset in entry.get("assets", [])
+        )
+
+    def referenced_assets(self) -> set:
+        """
+            Returns the static assets referenced by the template or any page
+        """
+        assets = set(self.template.get("assets", []))
+        for entry in self.pages.values():
+            assets.update(entry.get("assets", []))
+        return assets
+
+    def describe_dependents(self, asset: str) -> str:
+        """
+            Describes which pages depend on an asset, for --explain output
+        """
+        dependents = self.dependents(asset)
+        if dependents == ["template"]:
+            return "used by every page through the template"
+        if not dependents:
+            return "not referenced by any page"
+        return f"used by {len(dependents)} page(s): {', '.join(dependents)}"
@@ -0,0 +1,115 @@
+import os
+import gzip
+import logging
+
+from io_pool import IOPool, scan_tree
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".json", ".svg", ".txt", ".xml", ".map"}
+MIN_COMPRESS_SIZE = 256
+GZIP_LEVEL = 9
+
+
+def encodings() -> list[tuple[str, str, object]]:
+    """
+        Returns (name, file suffix, compress function) for each available
+        encoding; brotli is used only if the brotli package is installed
+    """
+    available = [("gzip", ".gz", lambda data: gzip.compress(data, GZIP_LEVEL, mtime=0))]
+    if brotli is not None:
+        available.append(("br", ".br", brotli.compress))
+    return available
+
+
+def compress_file(path: str, file_stat: os.stat_result) -> tuple[int, dict, bool]:
+    """
+        Writes a compressed sibling of a file for each encoding unless an up to
+        date one exists, and returns the file's size, the size of each sibling
+        and whether any sibling was written. Siblings carry the source's mtime,
+        which is how they are recognised as up to date; a sibling that would
+        not be smaller than the file is not kept.
+    """
+    sizes = {}
+    written = False
+    data = None
+    for name, suffix, compress in encodings():
+        sibling = path + suffix
+        try:
+            sibling_stat = os.stat(sibling)
+        except FileNotFoundError:
+            sibling_stat = None
+        if sibling_stat is not None and sibling_stat.st_mtime_ns == file_stat.st_mtime_ns:
+            sizes[name] = sibling_stat.st_size
+            continue
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        compressed = compress(data)
+        if len(compressed) >= len(data):
+            if sibling_stat is not None:
+                os.remove(sibling)
+            sizes[name] = len(data)
+            continue
+        tmp_path = sibling + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.utime(tmp_path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns))
+        os.replace(tmp_path, sibling)
+        sizes[name] = len(compressed)
+        written = True
+    return file_stat.st_size, sizes, written
+
+
+def compress_tree(dir_path: str, io_pool: None | IOPool = None) -> dict:
+    """
+        Writes compressed siblings for the text files in the output directory
+        that changed since they were last compressed, on the I/O pool if given,
+        removes siblings of deleted text files and returns a report of the
+        files compressed and the bytes each encoding saves
+    """
+    suffixes = {suffix for _, suffix, _ in encodings()}
+    files = []
+    siblings = []
+    for _, entry in scan_tree(dir_path):
+        base, extension = os.path.splitext(entry.path)
+        if extension in suffixes:
+            siblings.append((entry.path, base))
+        elif extension.lower() in COMPRESSIBLE_EXTENSIONS:
+            files.append(entry)
+    paths = {entry.path for entry in files}
+    for sibling, base in siblings:
+        if os.path.splitext(base)[1].lower() in COMPRESSIBLE_EXTENSIONS and base not in paths:
+            os.remove(sibling)
+
+    def compress(entry):
+        file_stat = entry.stat()
+        if file_stat.st_size < MIN_COMPRESS_SIZE:
+            return None
+        return compress_file(entry.path, file_stat)
+
+    report = {"files": 0, "compressed": 0, "bytes": 0, "encoded_bytes": {name: 0 for name, _, _ in encodings()}}
+    for result in (io_pool or IOPool(1)).map(compress, files):
+        if result is None:
+            continue
+        size, sizes, written = result
+        report["files"] += 1
+        report["compressed"] += written
+        report["bytes"] += size
+        for name, encoded_size in sizes.items():
+            report["encoded_bytes"][name] += encoded_size
+    return report
+
+
+def log_compression_report(report: dict) -> None:
+    """
+        Logs how many files were compressed and the bytes each encoding saves
+    """
+    logging.info("%d of %d compressible file(s) compressed", report["compressed"], report["files"])
+    for name, encoded_bytes in report["encoded_bytes"].items():
+        saved = report["bytes"] - encoded_bytes
+        percent = 100 * saved / report["bytes"] if report["bytes"] else 0
+        logging.info("%s: %d -> %d bytes (%d saved, %.0f%%)", name, report["bytes"], encoded_bytes, saved, percent)
@@ -0,0 +1,151 @@
+import os
+import json
+import argparse
+
+DIR_PATH_STATIC = "./static"
+DIR_PATH_PUBLIC = "./public"
+DIR_PATH_CONTENT = "./content"
+DIR_PATH_CACHE = "./.cache"
+TEMPLATE_PATH = "./template.html"
+DEFAULT_RELOAD_URL = "http://localhost:8888/__livereload"
+DEFAULT_TOP_PAGES = 10
+PATH_SETTINGS = ("content", "static", "output", "template", "cache_dir", "profile", "profile_trace")
+
+
+class SitePaths:
+    """
+        Where a build reads its content, static files and template, and where
+        it writes the site and keeps its manifest and page cache. Builds with
+        different output and cache directories can run side by side.
+    """
+    def __init__(
+            self,
+            content: str = DIR_PATH_CONTENT,
+            static: str = DIR_PATH_STATIC,
+            public: str = DIR_PATH_PUBLIC,
+            template: str = TEMPLATE_PATH,
+            cache: str = DIR_PATH_CACHE
+        ) -> None:
+        self.content = content
+        self.static = static
+        self.public = public
+        self.template = template
+        self.cache = cache
+
+    @property
+    def manifest(self) -> str:
+        return os.path.join(self.cache, "manifest.json")
+
+    @property
+    def page_cache(self) -> str:
+        return os.path.join(self.cache, "pages")
+
+    @property
+    def block_cache(self) -> str:
+        return os.path.join(self.cache, "blocks.json")
+
+    @property
+    def search_state(self) -> str:
+        return os.path.join(self.cache, "search.json")
+
+    @property
+    def search_index(self) -> str:
+        return os.path.join(self.public, "search")
+
+    @property
+    def link_graph(self) -> str:
+        return os.path.join(self.cache, "links.json")
+
+    @property
+    def image_state(self) -> str:
+        return os.path.join(self.cache, "images.json")
+
+    @property
+    def image_variants(self) -> str:
+        return os.path.join(self.cache, "images")
+
+
+class BuildSettings:
+    """
+        The options of a build or watch taken from the parsed command line,
+        with sizes converted from MiB to bytes, so they are passed around as
+        one object rather than one argument each
+    """
+    def __init__(self, args: argparse.Namespace) -> None:
+        mib = 1024 * 1024
+        self.paths = SitePaths(args.content, args.static, args.output, args.template, args.cache_dir)
+        self.incremental = args.incremental
+        self.watch = args.watch
+        self.jobs = args.jobs
+        self.io_workers = args.io_workers
+        self.max_in_flight = args.max_in_flight
+        self.explain = args.explain
+        self.use_cache = not args.no_cache
+        self.clear_cache = args.clear_cache
+        self.cache_size = args.cache_size * mib
+        self.block_cache_size = args.block_cache_size * mib
+        self.persist_block_cache = args.persist_block_cache
+        self.max_memory = args.max_memory * mib
+        self.sync_mode = args.link_mode
+        self.checksum = args.checksum
+        self.reload_url = args.reload_url
+        self.compress = args.compress
+        self.search_index = args.search_index
+        self.images = args.images
+        self.site_url = args.site_url
+        self.check_links = args.check_links
+        self.profile = args.profile
+        self.profile_trace = args.profile_trace
+        self.profile_top = args.profile_top
+        self.profile_memory = args.profile_memory
+        self.serve = args.serve
+        self.port = args.port
+        self.file_cache_size = args.file_cache_size * mib
+        self.quiet = args.quiet
+
+
+class ConfigError(Exception):
+    pass
+
+
+def load_config(path: str) -> dict:
+    """
+        Reads a JSON config file mapping option names (e.g. "jobs" or
+        "io-workers") to values and returns them keyed like the parsed command
+        line. Relative paths in the file are taken relative to the file, so the
+        build does not depend on the working directory it is started from.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"Cannot read config file {path}: {e}") from e
+    if not isinstance(data, dict):
+        raise ConfigError(f"Config file {path} must contain a JSON object")
+    base = os.path.dirname(os.path.abspath(path))
+    config = {}
+    for key, value in data.items():
+        name = key.replace("-", "_")
+        if name in PATH_SETTINGS and isinstance(value, str):
+            value = os.path.join(base, value)
+        config[name] = value
+    return config
+
+
+def check_config(config: dict, defaults: dict) -> None:
+    """
+        Raises ConfigError for settings that are not options of any command or
+        whose values have the wrong type, given each option's default value
+    """
+    for name, value in config.items():
+        if name not in defaults:
+            raise ConfigError(f"Unknown setting in config file: {name}")
+        default = defaults[name]
+        if default is None:
+            valid = isinstance(value, str)
+        elif isinstance(default, bool):
+            valid = isinstance(value, bool)
+        else:
+            valid = isinstance(value, type(default)) and not isinstance(value, bool)
+        if not valid:
+            raise ConfigError(f"Setting {name} in config file has the wrong type: {value!r}")
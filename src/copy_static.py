@@ -2,19 +2,130 @@ import os
 import shutil
 import logging
 
+from build_manifest import hash_file
+from io_pool import IOPool, make_dirs, scan_tree
+
+SYNC_MODE_COPY = "copy"
+SYNC_MODE_HARDLINK = "hardlink"
+SYNC_MODE_REFLINK = "reflink"
+SYNC_MODES = (SYNC_MODE_COPY, SYNC_MODE_HARDLINK, SYNC_MODE_REFLINK)
+
 def copy_files_recursive(source, dest):
     """
-    Recursively copy all files and directories from the source directory to the
-    destination directory.
-    """
-    if not os.path.exists(dest):
-        os.mkdir(dest)
-        
-    for item in os.listdir(source):
-        s = os.path.join(source, item)
-        d = os.path.join(dest, item)
-        logging.info("Copying %s to %s", s, d)
-        if os.path.isdir(s):
-            copy_files_recursive(s, d)
-        else:
-            shutil.copy(s, d)
+    Copy all files and directories from the source directory to the destination
+    directory. Directories are walked from a stack rather than by recursion, so
+    deeply nested trees cannot hit the recursion limit.
+    """
+    stack = [(source, dest)]
+    while stack:
+        source, dest = stack.pop()
+        if not os.path.exists(dest):
+            os.mkdir(dest)
+
+        for item in os.listdir(source):
+            s = os.path.join(source, item)
+            d = os.path.join(dest, item)
+            logging.info("Copying %s to %s", s, d)
+            if os.path.isdir(s):
+                stack.append((s, d))
+            else:
+                shutil.copy(s, d)
+
+
+def sync_files(source, dest, manifest, mode=SYNC_MODE_COPY, checksum=False, explain=False, io_pool=None):
+    """
+    Synchronise the destination directory with the source directory like rsync:
+    only files whose size or modification time differ (or, with checksum, whose
+    content differs) are copied, and copies of files deleted from the source
+    since the build recorded in the manifest are removed. When nothing changed
+    this only stats each file. Files are checked and copied on the I/O pool
+    when one is given. Returns the number of files copied.
+    """
+    made_dirs = set()
+
+    def sync(item):
+        asset, entry = item
+        d = os.path.join(dest, asset)
+        source_stat = entry.stat()
+        reason = sync_reason(entry.path, source_stat, d, checksum)
+        if reason is not None:
+            dest_dir = os.path.dirname(d)
+            if dest_dir not in made_dirs:
+                make_dirs(dest_dir)
+                made_dirs.add(dest_dir)
+            logging.info("Copying %s to %s", entry.path, d)
+            sync_file(entry.path, d, mode)
+        return asset, d, [source_stat.st_mtime_ns, source_stat.st_size], reason
+
+    io_pool = io_pool or IOPool(1)
+    assets = set()
+    copied = 0
+    for asset, d, signature, reason in io_pool.map(sync, scan_tree(source)):
+        assets.add(asset)
+        manifest.record_asset(asset, signature)
+        if reason is None:
+            continue
+        copied += 1
+        if explain:
+            print(f"{d}: {reason}; copied ({manifest.describe_dependents(asset)})")
+    for d in manifest.remove_stale_assets(assets, dest):
+        logging.info("Removed %s", d)
+        if explain:
+            print(f"{d}: source deleted; removed")
+    return copied
+
+
+def sync_reason(s, source_stat, d, checksum=False):
+    """
+    Return why the destination file is out of date with the source file, or None
+    if it is up to date.
+    """
+    try:
+        dest_stat = os.stat(d)
+    except FileNotFoundError:
+        return "new file"
+    if dest_stat.st_size != source_stat.st_size:
+        return "size changed"
+    if checksum:
+        if os.path.samefile(s, d) or hash_file(s) == hash_file(d):
+            return None
+        return "content changed"
+    if dest_stat.st_mtime_ns != source_stat.st_mtime_ns:
+        return "modification time changed"
+    return None
+
+
+def sync_file(s, d, mode=SYNC_MODE_COPY):
+    """
+    Copy a file preserving its modification time, as a hardlink or with
+    copy_file_range (which lets the filesystem share extents, i.e. reflink)
+    when requested and possible, falling back to a regular copy.
+    """
+    if mode == SYNC_MODE_HARDLINK:
+        tmp = d + ".tmp"
+        try:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            os.link(s, tmp)
+            os.replace(tmp, d)
+            return
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    if os.path.exists(d) and os.path.samefile(s, d):
+        os.remove(d)
+    if mode == SYNC_MODE_REFLINK and hasattr(os, "copy_file_range"):
+        try:
+            with open(s, "rb") as fsrc, open(d, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    written = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if written == 0:
+                        break
+                    remaining -= written
+            if remaining == 0:
+                shutil.copystat(s, d)
+                return
+        except OSError:
+            pass
+    shutil.copy2(s, d)
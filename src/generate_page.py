@@ -1,54 +1,467 @@
 import os
+import html
+import json
+import logging
+import threading
 from pathlib import Path
 
+from collections.abc import Iterable
+
 from block_markdown import (
-     markdown_to_html_node
+     iter_blocks,
+     iter_lines,
+     render_markdown_to,
+     term_positions,
+     block_type_paragraph
 )
+from build_manifest import hash_file
+from image_tags import ImageTagWriter
+from inline_markdown import text_to_textnodes
+from io_pool import IOPool, make_dirs, scan_tree
+from memory_budget import WORKER_BASE_BYTES, plan_pages
+from page_cache import BlockCache, PageCache, terms_path
+from template import load_template
+
+CHUNKS_PER_JOB = 4
+BODY_CHUNK_SIZE = 64 * 1024
+DESCRIPTION_MAX_LENGTH = 160
+
+_block_cache = None
+_image_attributes = None
+_search_terms = False
+_max_memory = 0
+
 
-def extract_title(markdown: str) -> str:
+class PageGenerationError(Exception):
     """
-        Extracts the title from a markdown string
+        Raised after a build in which one or more pages failed to generate
+    """
+    def __init__(self, failures: list[tuple[str, str]]) -> None:
+        self.failures = failures
+        details = "\n".join(f"  {from_path}: {error}" for from_path, error in failures)
+        super().__init__(f"{len(failures)} page(s) failed to generate:\n{details}")
+
+
+def extract_title(markdown: str | Iterable[str]) -> str:
     """
-    lines = markdown.split("\n")
+        Extracts the title from a markdown string or an iterable of its lines
+    """
+    lines = markdown.split("\n") if isinstance(markdown, str) else markdown
     for line in lines:
         if line.startswith("# "):
             return line.strip("# ")
     raise ValueError("No title found. Please add a title to your markdown document.")
-    
-    
-def generate_page(from_path: str, template_path: str, dest_path: Path) -> None:
+
+
+def extract_description(markdown: str | Iterable[str]) -> str:
+    """
+        Extracts a plain-text description from the first paragraph of a markdown
+        string or an iterable of its lines, escaped for use in an HTML attribute
+    """
+    lines = markdown.split("\n") if isinstance(markdown, str) else markdown
+    for block_type, block_lines in iter_blocks(lines):
+        if block_type != block_type_paragraph:
+            continue
+        text = "".join(node.text for node in text_to_textnodes(" ".join(block_lines)))
+        if len(text) > DESCRIPTION_MAX_LENGTH:
+            text = text[:DESCRIPTION_MAX_LENGTH - 3].rstrip() + "..."
+        return html.escape(text)
+    return ""
+
+
+def page_url(dest_path: str, dest_dir_path: str) -> str:
+    """
+        Returns the site-relative URL of a generated page
+    """
+    url = "/" + Path(os.path.relpath(dest_path, dest_dir_path)).as_posix()
+    if url.endswith("/index.html"):
+        return url[:-len("index.html")]
+    return url
+
+
+def write_atomically(dest_path: str, render) -> None:
+    """
+        Streams render(write) into a temporary file that replaces dest_path only
+        once rendering succeeds. The destination directory is created the first
+        time a file is written into it rather than checked for every file. The
+        temporary file is named after the writing process and thread, so
+        concurrent writes of the same file, such as the shared cached body of
+        pages with identical markdown, do not replace each other's.
+    """
+    tmp_path = f"{dest_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        try:
+            f = open(tmp_path, "w", encoding="utf-8")
+        except FileNotFoundError:
+            make_dirs(os.path.dirname(dest_path))
+            f = open(tmp_path, "w", encoding="utf-8")
+        with f:
+            render(f.write)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def use_block_cache(cache: None | BlockCache) -> None:
+    """
+        Sets the block cache that pages generated by this process render their
+        markdown through, or disables block caching if cache is None
+    """
+    global _block_cache
+    _block_cache = cache
+
+
+def use_image_attributes(attributes: None | dict[str, str]) -> None:
     """
-        Generates a page from a markdown document and a template
+        Sets the attributes added to the img tags of generated pages, keyed by
+        each image's site path (see ImageTagWriter), or stops adding them if
+        attributes is None
+    """
+    global _image_attributes
+    _image_attributes = attributes
+
+
+def use_search_terms(enabled: bool) -> None:
+    """
+        Sets whether the records of generated pages include the positions of
+        their search terms, collected while the markdown is rendered
+    """
+    global _search_terms
+    _search_terms = enabled
+
+
+def _init_worker(
+        block_cache: None | BlockCache,
+        image_attributes: None | dict[str, str],
+        search_terms: bool
+    ) -> None:
+    """
+        Gives a worker process the block cache, image attributes and search
+        term setting of the build
+    """
+    if block_cache is not None:
+        block_cache.track_changes()
+    use_block_cache(block_cache)
+    use_image_attributes(image_attributes)
+    use_search_terms(search_terms)
+
+
+def render_page_to(write, template, values: dict) -> None:
+    """
+        Streams a page rendered from a template to a write callable, adding
+        the image attributes set by use_image_attributes to its img tags
+    """
+    if not _image_attributes:
+        template.render_to(write, values)
+        return
+    tags = ImageTagWriter(write, _image_attributes, values.get("Path", "/"))
+    template.render_to(tags.write, values)
+    tags.flush()
+
+
+def use_memory_budget(max_memory: int) -> None:
+    """
+        Sets the memory budget in bytes that run_page_tasks fits its worker
+        processes and pages into, or disables it if max_memory is 0
+    """
+    global _max_memory
+    _max_memory = max_memory
+
+
+def generate_page(
+        from_path: str,
+        template_path: str,
+        dest_path: Path,
+        slots: None | dict = None,
+        body_path: None | str = None
+    ) -> dict:
+    """
+        Generates a page from a markdown document and a template. If body_path is
+        given, the rendered markdown is also saved there so the page can later be
+        re-rendered with render_cached_page. Returns the page's title, description
+        and the image URLs and link targets it references, and with search terms
+        enabled (see use_search_terms) their positions, which are also saved next
+        to body_path.
     """
     print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    with open(from_path, "r", encoding="utf-8") as f:
-        markdown = f.read()
-    with open(template_path, "r", encoding="utf-8") as f:
-        template = f.read()
-    
-    node = markdown_to_html_node(markdown)
-    html = node.to_html()
-    title = extract_title(markdown)
+    template = load_template(template_path)
+    images = []
+    links = []
+    texts = [] if _search_terms else None
 
-    
-    template = template.replace("{{ Title }}", title).replace("{{ Content }}", html)
+    with open(from_path, "r", encoding="utf-8") as markdown_file:
+        title = extract_title(iter_lines(markdown_file))
+        markdown_file.seek(0)
+        description = extract_description(iter_lines(markdown_file))
 
-    dest_dir_path = os.path.dirname(dest_path)
-    if dest_dir_path != "":
-        os.makedirs(dest_dir_path, exist_ok=True)
-    with open(dest_path, "w", encoding="utf-8") as f:
-        f.write(template)
+        def render_content(write) -> None:
+            markdown_file.seek(0)
+            render_markdown_to(iter_lines(markdown_file), write, images, _block_cache, links, texts)
+
+        if body_path is not None:
+            write_atomically(body_path, render_content)
+            content = lambda write: _copy_body(body_path, write)
+        else:
+            content = render_content
+        values = {
+            "Title": title,
+            "Content": content,
+            "Description": description,
+        }
+        if slots:
+            values.update(slots)
+        write_atomically(dest_path, lambda write: render_page_to(write, template, values))
+    record = {"title": title, "description": description, "images": images, "links": links}
+    if texts is not None:
+        record["terms"] = term_positions(texts)
+        if body_path is not None:
+            # json.dumps uses the C encoder, which json.dump does not
+            data = json.dumps(record["terms"], separators=(",", ":"))
+            write_atomically(terms_path(body_path), lambda write: write(data))
+    return record
+
+
+def _copy_body(body_path: str, write) -> None:
+    """
+        Streams a cached body to a write callable
+    """
+    with open(body_path, "r", encoding="utf-8") as f:
+        for chunk in iter(lambda: f.read(BODY_CHUNK_SIZE), ""):
+            write(chunk)
+
+
+def render_cached_page(body_path: str, template_path: str, dest_path: str, slots: dict) -> None:
+    """
+        Re-renders a page from its cached body without parsing the markdown again.
+        The slots must include the page's Title and Description.
+    """
+    print(f"Rendering page from cached body {body_path} to {dest_path} using {template_path}")
+    template = load_template(template_path)
+    values = dict(slots)
+    values["Content"] = lambda write: _copy_body(body_path, write)
+    write_atomically(dest_path, lambda write: render_page_to(write, template, values))
 
 
 def generate_pages_recursive(dir_path_content: str, template_path: str, dest_dir_path: str) -> None:
     """
-        Generates pages in a directory recursively
+        Generates pages for every file under a directory. The tree is walked
+        without recursion, so deeply nested directories cannot hit the
+        recursion limit.
     """
-    for item in os.listdir(dir_path_content):
-        from_path = os.path.join(dir_path_content, item)
-        dest_path = os.path.join(dest_dir_path, item)
-        if os.path.isfile(from_path):
-            dest_path = Path(dest_path).with_suffix(".html")
-            generate_page(from_path, template_path, dest_path)
-        else:
-            generate_pages_recursive(from_path, template_path, dest_path)
+    for from_path, dest_path in discover_pages(dir_path_content, dest_dir_path):
+        generate_page(from_path, template_path, dest_path)
+
+
+def page_dest_path(from_path: str, dir_path_content: str, dest_dir_path: str) -> str:
+    """
+        Returns the output path of a page under the content directory
+    """
+    return str(Path(dest_dir_path, os.path.relpath(from_path, dir_path_content)).with_suffix(".html"))
+
+
+def discover_pages(dir_path_content: str, dest_dir_path: str) -> list[tuple[str, str]]:
+    """
+        Walks the content directory and returns (source, destination) pairs for every page
+    """
+    return [
+        (entry.path, str(Path(dest_dir_path, relative).with_suffix(".html")))
+        for relative, entry in scan_tree(dir_path_content)
+    ]
+
+
+def _load_terms(body_path: str) -> None | dict[str, list[int]]:
+    """
+        Returns the search terms saved next to a cached body, or None if the body
+        was cached without them
+    """
+    try:
+        with open(terms_path(body_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _generate_page_task(task: tuple) -> tuple[None | str, None | dict]:
+    """
+        Generates a single page inside a worker and returns the error message on
+        failure or the page's record on success. A page re-rendered from its
+        cached body has no record, or one holding only its search terms; it is
+        parsed again if they are needed but were not cached.
+    """
+    from_path, template_path, dest_path, slots, body_path, reuse_body = task
+    try:
+        if reuse_body:
+            terms = _load_terms(body_path) if _search_terms else None
+            if terms is not None or not _search_terms:
+                render_cached_page(body_path, template_path, dest_path, slots)
+                return None, None if terms is None else {"terms": terms}
+        return None, generate_page(from_path, template_path, dest_path, slots, body_path)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}", None
+
+
+def _worker_page_task(task: tuple) -> tuple[None | str, None | dict, None | tuple]:
+    """
+        Generates a single page inside a worker process and returns the changes
+        to its copy of the block cache along with the error and record
+    """
+    error, record = _generate_page_task(task)
+    return error, record, _block_cache.take_changes() if _block_cache is not None else None
+
+
+def _stream_page_task(task: tuple) -> tuple[None | str, None | dict]:
+    """
+        Generates a single page without the block cache, so none of its blocks
+        are kept in memory once they have been written
+    """
+    global _block_cache
+    block_cache, _block_cache = _block_cache, None
+    try:
+        return _generate_page_task(task)
+    finally:
+        _block_cache = block_cache
+
+
+def run_page_tasks(
+        tasks: list[tuple],
+        jobs: int = 1,
+        io_pool: None | IOPool = None
+    ) -> list[tuple[None | str, None | dict]]:
+    """
+        Runs page tasks of the form (source, template, destination, slots,
+        body path, reuse body), on a process pool when jobs > 1 or otherwise on
+        the I/O pool if one is given, and returns an (error, record) pair for
+        each task in order.
+
+        With a memory budget (see use_memory_budget), the number of worker
+        processes is reduced to what the budget allows, and pages too large to
+        render alongside others are streamed one at a time in this process
+        after the rest.
+    """
+    if _max_memory <= 0:
+        return _run_page_tasks(tasks, jobs, io_pool)
+    worker_bytes = WORKER_BASE_BYTES + (_block_cache.max_bytes if _block_cache is not None else 0)
+    probes = [_page_size(task) for task in tasks]
+    runnable = [(task, size) for task, (error, size) in zip(tasks, probes) if error is None]
+    threads = io_pool.workers if io_pool is not None else 1
+    jobs, oversized = plan_pages([size for _, size in runnable], _max_memory, jobs, threads, worker_bytes)
+    if any(oversized):
+        logging.info("Streaming %d page(s) too large for the memory budget one at a time", sum(oversized))
+    results = iter(_run_page_tasks(
+        [task for (task, _), large in zip(runnable, oversized) if not large], jobs, io_pool
+    ))
+    streamed = iter(oversized)
+    return [
+        (error, None) if error is not None else _stream_page_task(task) if next(streamed) else next(results)
+        for task, (error, _) in zip(tasks, probes)
+    ]
+
+
+def _page_size(task: tuple) -> tuple[None | str, int]:
+    """
+        Returns the size of a page task's markdown source, or 0 when its body
+        is reused, with the error message if the source can no longer be read
+    """
+    from_path, *_, reuse_body = task
+    if reuse_body:
+        return None, 0
+    try:
+        return None, os.path.getsize(from_path)
+    except OSError as e:
+        return f"{type(e).__name__}: {e}", 0
+
+
+def _run_page_tasks(
+        tasks: list[tuple],
+        jobs: int = 1,
+        io_pool: None | IOPool = None
+    ) -> list[tuple[None | str, None | dict]]:
+    """
+        Runs page tasks on a process pool when jobs > 1, or otherwise on the
+        I/O pool if one is given. Blocks rendered by worker processes are merged
+        into the block cache as their pages complete.
+    """
+    if jobs > 1 and len(tasks) > 1:
+        # Imported here as multiprocessing is slow to import and serial builds never need it
+        from concurrent.futures import ProcessPoolExecutor
+        chunk_size = max(1, len(tasks) // (jobs * CHUNKS_PER_JOB))
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_worker, initargs=(_block_cache, _image_attributes, _search_terms)
+        ) as executor:
+            results = []
+            for error, record, changes in executor.map(_worker_page_task, tasks, chunksize=chunk_size):
+                if changes is not None:
+                    _block_cache.merge(changes)
+                results.append((error, record))
+            return results
+    if io_pool is not None:
+        return list(io_pool.map(_generate_page_task, tasks))
+    return [_generate_page_task(task) for task in tasks]
+
+
+def page_task(
+        from_path: str,
+        template_path: str,
+        dest_path: str,
+        slots: dict,
+        cache: None | PageCache = None,
+        content_hash: None | str = None
+    ) -> tuple[tuple, None | str, None | dict]:
+    """
+        Builds the task for rendering a page and returns it with the page's cache
+        key and cached record. With a cache, a page whose body is cached is
+        re-rendered from it without parsing the markdown, and any other page's
+        body is saved to it.
+    """
+    if cache is None:
+        return (from_path, template_path, dest_path, slots, None, False), None, None
+    key = cache.key(content_hash if content_hash is not None else hash_file(from_path))
+    record = cache.get(key)
+    if record is None:
+        return (from_path, template_path, dest_path, slots, cache.body_path(key), False), key, None
+    slots = dict(slots, Title=record["title"], Description=record["description"])
+    return (from_path, template_path, dest_path, slots, cache.body_path(key), True), key, record
+
+
+def generate_pages(
+        pages: list[tuple[str, str]],
+        template_path: str,
+        jobs: int = 1,
+        dest_dir_path: None | str = None,
+        cache: None | PageCache = None,
+        io_pool: None | IOPool = None
+    ) -> list[tuple[str, str]]:
+    """
+        Generates the given (source, destination) pages, on a process pool when
+        jobs > 1, and returns a (source, error) pair for every page that failed.
+        Failures are reported in the order the pages were given. When the output
+        root is given, each page's URL is available to the template as {{ Path }}.
+        With a cache, pages whose markdown has been rendered before are
+        re-rendered from the cached body. Without worker processes, pages are
+        read and written concurrently on the I/O pool if one is given.
+    """
+    tasks = []
+    keys = []
+    for from_path, dest_path in pages:
+        slots = {}
+        if dest_dir_path is not None:
+            slots["Path"] = page_url(dest_path, dest_dir_path)
+        task, key, _ = page_task(from_path, template_path, dest_path, slots, cache)
+        tasks.append(task)
+        keys.append(key)
+
+    failures = []
+    results = run_page_tasks(tasks, jobs, io_pool)
+    for (from_path, _), key, (error, record) in zip(pages, keys, results):
+        if error is not None:
+            logging.error("Failed to generate %s: %s", from_path, error)
+            failures.append((from_path, error))
+            continue
+        # Pages re-rendered from their cached body have no record, or only their search terms
+        if cache is not None and record is not None and "title" in record:
+            cache.put(key, record)
+    if cache is not None:
+        cache.save()
+    return failures
@@ -2,6 +2,8 @@ class HTMLNode:
     """
         Represents an HTML node.
     """
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(
             self,
             tag: None | str = None,
@@ -19,7 +21,24 @@ class HTMLNode:
             Converts the HTMLNode to a string of HTML
         """
         raise NotImplementedError
+
+    def render_to(self, write) -> None:
+        """
+            Streams the HTML for the node to a write callable, e.g. a file's write method
+        """
+        write(self.to_html())
     
+    def iter_nodes(self):
+        """
+            Yields the node and all of its descendants in document order
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            if node.children:
+                stack.extend(reversed(node.children))
+
     def props_to_html(self) -> str:
         """
             Converts the props dictionary to a string of HTML attributes
@@ -45,10 +64,12 @@ class LeafNode(HTMLNode):
     """
         Represents a leaf node in the HTML tree.
     """
+    __slots__ = ()
+
     def __init__(self, value: str, tag: None | str = None, props: None | dict = None) -> None:
-        super().__init__(tag=tag, value=value, props=props)
-        self.value = value
         self.tag = tag
+        self.value = value
+        self.children = None
         self.props = props
 
     def to_html(self):
@@ -66,18 +87,28 @@ class ParentNode(HTMLNode):
     """
         Represents a parent node in the HTML tree.
     """
+    __slots__ = ()
+
     def __init__(self,  children: list, tag: None | str = None, props: None | dict = None) -> None:
-        super().__init__(children=children, tag=tag, props=props)
+        self.tag = tag
+        self.value = None
+        self.children = children
+        self.props = props
 
     def to_html(self):
+        parts = []
+        self.render_to(parts.append)
+        return "".join(parts)
+
+    def render_to(self, write) -> None:
         if self.tag is None:
             raise ValueError("Invalid HTML: no tag")
         if self.children is None:
             raise ValueError("Invalid HTML: no children")
-        children_html = ""
+        write(f"<{self.tag}{self.props_to_html()}>")
         for child in self.children:
-            children_html += child.to_html()
-        return f"<{self.tag}{self.props_to_html()}>{children_html}</{self.tag}>"
+            child.render_to(write)
+        write(f"</{self.tag}>")
 
     def __repr__(self):
         return f"ParentNode({self.tag}, children: {self.children}, {self.props})"
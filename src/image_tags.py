@@ -0,0 +1,66 @@
+import re
+import html
+from urllib.parse import unquote, urljoin, urlsplit
+
+IMG_TAG_PATTERN = re.compile(r"<img\b[^>]*>")
+SRC_PATTERN = re.compile(r"""\ssrc=["']([^"']*)["']""")
+WIDTH_PATTERN = re.compile(r"\swidth=")
+
+
+class ImageTagWriter:
+    """
+        Wraps a write callable, adding attributes to the img tags streamed
+        through it. attributes maps an image's site path (e.g.
+        "/images/a.png") to the attribute text to insert into tags whose src
+        resolves to it from the page at base_url; tags that already have a
+        width, or whose image is not known, are written unchanged.
+
+        A tag split across writes, as by the fixed-size chunks of a cached
+        body, is held back until the rest of it arrives, so flush() must be
+        called once the page is written.
+    """
+    def __init__(self, write, attributes: dict[str, str], base_url: str = "/") -> None:
+        self._write = write
+        self.attributes = attributes
+        self.base_url = base_url
+        self.pending = ""
+        self.resolved = {}
+
+    def write(self, chunk: str) -> None:
+        if self.pending:
+            chunk = self.pending + chunk
+            self.pending = ""
+        start = chunk.rfind("<")
+        if start != -1 and chunk.find(">", start) == -1:
+            self.pending = chunk[start:]
+            chunk = chunk[:start]
+        if "<img" in chunk:
+            chunk = IMG_TAG_PATTERN.sub(self.replace, chunk)
+        if chunk:
+            self._write(chunk)
+
+    def flush(self) -> None:
+        """
+            Writes anything held back by the last write
+        """
+        if self.pending:
+            self._write(self.pending)
+            self.pending = ""
+
+    def replace(self, match: re.Match) -> str:
+        """
+            Returns an img tag with the attributes of its image inserted
+        """
+        tag = match.group(0)
+        src = SRC_PATTERN.search(tag)
+        if src is None or WIDTH_PATTERN.search(tag):
+            return tag
+        url = src.group(1)
+        path = self.resolved.get(url)
+        if path is None:
+            parts = urlsplit(urljoin(self.base_url, html.unescape(url)))
+            path = self.resolved[url] = "" if parts.scheme or parts.netloc else unquote(parts.path)
+        attributes = self.attributes.get(path)
+        if attributes is None:
+            return tag
+        return tag[:4] + attributes + tag[4:]
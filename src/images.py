@@ -0,0 +1,312 @@
+import os
+import json
+import struct
+import logging
+from urllib.parse import quote
+
+from build_manifest import file_signature, hash_file
+from copy_static import sync_file
+from io_pool import make_dirs
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+IMAGE_STATE_VERSION = 1
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+# GIFs are not downscaled, as resizing would drop their animation
+VARIANT_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp"}
+VARIANT_WIDTHS = (480, 960, 1600)
+# Variants are written to their own output directory, named by content hash,
+# so they cannot overwrite the site's static files
+VARIANTS_DIR = "_variants"
+HEADER_SIZE = 32
+
+
+def image_size(path: str) -> None | tuple[int, int]:
+    """
+        Returns the width and height of a PNG, GIF, JPEG or WebP image read
+        from its header, or None if the file is not one of them
+    """
+    with open(path, "rb") as f:
+        head = f.read(HEADER_SIZE)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR" and len(head) >= 24:
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a") and len(head) >= 10:
+            return struct.unpack("<HH", head[6:10])
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return _webp_size(head)
+        if head[:2] == b"\xff\xd8":
+            f.seek(2)
+            return _jpeg_size(f)
+    return None
+
+
+def _webp_size(head: bytes) -> None | tuple[int, int]:
+    """
+        Returns the size of a WebP image from the first chunk of its header,
+        or None if the header is cut short
+    """
+    chunk = head[12:16]
+    if chunk == b"VP8X" and len(head) >= 30:
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    if chunk == b"VP8L" and len(head) >= 25 and head[20] == 0x2f:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a" and len(head) >= 30:
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3fff, height & 0x3fff
+    return None
+
+
+def _jpeg_size(f) -> None | tuple[int, int]:
+    """
+        Returns the size of a JPEG image from its start of frame segment,
+        skipping the segments before it, or None if the file ends or a
+        segment is malformed before one is found
+    """
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xff:
+            return None
+        code = marker[1]
+        while code == 0xff:
+            fill = f.read(1)
+            if not fill:
+                return None
+            code = fill[0]
+        if code == 0x01 or 0xd0 <= code <= 0xd8:
+            continue
+        data = f.read(2)
+        if len(data) < 2:
+            return None
+        length = int.from_bytes(data, "big")
+        if length < 2:
+            return None
+        if 0xc0 <= code <= 0xcf and code not in (0xc4, 0xc8, 0xcc):
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack(">HH", data[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def variant_name(content_hash: str, width: int, extension: str) -> str:
+    """
+        Returns the file name of an image's downscaled variant, in both the
+        variants cache and VARIANTS_DIR of the output directory
+    """
+    return f"{content_hash}-{width}{extension.lower()}"
+
+
+def write_variants(path: str, content_hash: str, size: tuple[int, int], variants_dir: str) -> list[int]:
+    """
+        Writes the downscaled variants of an image that are narrower than it
+        to the variants directory, named by the image's content hash so each
+        is only produced once, and returns their widths. Nothing is written
+        if Pillow is not installed.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if Image is None or extension not in VARIANT_EXTENSIONS:
+        return []
+    widths = [width for width in VARIANT_WIDTHS if width < size[0]]
+    image = None
+    for width in widths:
+        variant_path = os.path.join(variants_dir, variant_name(content_hash, width, extension))
+        if os.path.exists(variant_path):
+            continue
+        if image is None:
+            image = Image.open(path)
+            image.load()
+        height = max(1, round(size[1] * width / size[0]))
+        tmp_path = f"{variant_path}.{os.getpid()}.tmp"
+        image.resize((width, height), Image.LANCZOS).save(tmp_path, format=image.format)
+        os.replace(tmp_path, variant_path)
+    return widths
+
+
+def _process_image_task(task: tuple) -> tuple[None | str, None | tuple]:
+    """
+        Reads an image's size and writes its variants inside a worker, returning
+        an (error, (size, variant widths)) pair instead of raising
+    """
+    path, content_hash, variants_dir = task
+    try:
+        size = image_size(path)
+        if size is None:
+            return "not a PNG, GIF, JPEG or WebP image", None
+        return None, (size, write_variants(path, content_hash, size, variants_dir))
+    except (OSError, ValueError) as e:
+        return f"{type(e).__name__}: {e}", None
+
+
+class ImageCatalog:
+    """
+        The dimensions and downscaled variants of the images the site's pages
+        reference, kept in a state file between builds.
+
+        An update only probes referenced images whose stat signature and then
+        content hash changed; the variants of the others are at most copied
+        back into the output directory if it was rebuilt. Variants are
+        generated into the cache directory, named by content hash, and synced
+        to VARIANTS_DIR in the output directory.
+    """
+    def __init__(self, state_path: str, variants_dir: str, dir_path_static: str, dest_dir_path: str) -> None:
+        self.state_path = state_path
+        self.variants_dir = variants_dir
+        self.dir_path_static = dir_path_static
+        self.dest_dir_path = dest_dir_path
+        self.images = {}
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == IMAGE_STATE_VERSION:
+            self.images = data["images"]
+
+    def update(self, referenced: set, jobs: int = 1) -> dict:
+        """
+            Brings the catalog up to date with the referenced static assets,
+            processing changed images on a process pool when jobs > 1 and
+            dropping images no longer referenced, and returns a report whose
+            "changed" entry holds the assets of images that were added, changed
+            or removed
+        """
+        current = {}
+        changed = []
+        for asset in sorted(referenced):
+            if os.path.splitext(asset)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            path = os.path.join(self.dir_path_static, asset)
+            try:
+                signature = file_signature(path)
+            except FileNotFoundError:
+                continue
+            current[asset] = path
+            image = self.images.get(asset)
+            if image is not None and image["signature"] == signature:
+                continue
+            content_hash = hash_file(path)
+            if image is not None and image["hash"] == content_hash:
+                image["signature"] = signature
+                continue
+            changed.append((asset, signature, content_hash))
+        removed = [asset for asset in self.images if asset not in current]
+
+        make_dirs(self.variants_dir)
+        tasks = [(current[asset], content_hash, self.variants_dir) for asset, _, content_hash in changed]
+        if jobs > 1 and len(tasks) > 1:
+            # Imported here as multiprocessing is slow to import and serial builds never need it
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = list(executor.map(_process_image_task, tasks))
+        else:
+            results = [_process_image_task(task) for task in tasks]
+
+        for asset in removed:
+            del self.images[asset]
+        processed = 0
+        for (asset, signature, content_hash), (error, result) in zip(changed, results):
+            self.images.pop(asset, None)
+            if error is not None:
+                logging.error("Failed to process image %s: %s", asset, error)
+                continue
+            processed += 1
+            (width, height), variants = result
+            self.images[asset] = {
+                "signature": signature,
+                "hash": content_hash,
+                "width": width,
+                "height": height,
+                "variants": variants,
+            }
+        copied = self.sync_variants()
+        if changed or removed:
+            self.remove_unused_variants()
+        return {
+            "images": len(self.images),
+            "processed": processed,
+            "removed": len(removed),
+            "variants": copied,
+            "changed": {asset for asset, _, _ in changed} | set(removed),
+        }
+
+    def sync_variants(self) -> int:
+        """
+            Copies variants missing from the output directory and returns how
+            many were copied
+        """
+        copied = 0
+        dest_dir = os.path.join(self.dest_dir_path, VARIANTS_DIR)
+        for asset, image in self.images.items():
+            extension = os.path.splitext(asset)[1]
+            for width in image["variants"]:
+                name = variant_name(image["hash"], width, extension)
+                dest_path = os.path.join(dest_dir, name)
+                if os.path.exists(dest_path):
+                    continue
+                make_dirs(dest_dir)
+                sync_file(os.path.join(self.variants_dir, name), dest_path)
+                copied += 1
+        return copied
+
+    def remove_unused_variants(self) -> None:
+        """
+            Deletes generated variants, and their copies in the output
+            directory, that no current image uses
+        """
+        hashes = {image["hash"] for image in self.images.values()}
+        for dir_path in (self.variants_dir, os.path.join(self.dest_dir_path, VARIANTS_DIR)):
+            if not os.path.isdir(dir_path):
+                continue
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.name.split("-", 1)[0] not in hashes:
+                        os.remove(entry.path)
+
+    def attributes(self) -> dict[str, str]:
+        """
+            Returns the attributes to add to img tags, keyed by each image's
+            site path: its dimensions, so the browser reserves its space before
+            it loads, lazy loading and asynchronous decoding, and with
+            variants, a srcset to choose among them
+        """
+        attributes = {}
+        for asset, image in self.images.items():
+            width = image["width"]
+            text = f' width="{width}" height="{image["height"]}" loading="lazy" decoding="async"'
+            if image["variants"]:
+                extension = os.path.splitext(asset)[1]
+                candidates = [
+                    f"/{VARIANTS_DIR}/{variant_name(image['hash'], variant, extension)} {variant}w"
+                    for variant in image["variants"]
+                ]
+                candidates.append(f"/{quote(asset)} {width}w")
+                text += f' srcset="{", ".join(candidates)}" sizes="(max-width: {width}px) 100vw, {width}px"'
+            attributes["/" + asset] = text
+        return attributes
+
+    def save(self) -> None:
+        """
+            Atomically writes the state that later updates start from
+        """
+        make_dirs(os.path.dirname(self.state_path) or ".")
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"version": IMAGE_STATE_VERSION, "images": self.images}))
+        os.replace(tmp_path, self.state_path)
+
+
+def log_image_report(report: dict) -> None:
+    """
+        Logs how many images were processed and variants copied
+    """
+    logging.info(
+        "Images: %d of %d processed, %d removed, %d variant(s) copied%s",
+        report["processed"], report["images"], report["removed"], report["variants"],
+        "" if Image is not None else " (install Pillow to generate variants)"
+    )
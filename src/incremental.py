@@ -0,0 +1,199 @@
+import os
+import logging
+import posixpath
+from urllib.parse import unquote, urljoin, urlsplit
+
+from build_manifest import BuildManifest
+from generate_page import (
+    PageGenerationError,
+    discover_pages,
+    page_dest_path,
+    page_task,
+    page_url,
+    run_page_tasks
+)
+from io_pool import IOPool
+from page_cache import PageCache
+from template import load_template
+
+
+def resolve_asset(url: str, base_url: str, dir_path_static: None | str) -> None | str:
+    """
+        Maps a URL referenced from the page at base_url to the path of a file under
+        the static directory, relative to it, or None if it is not a static asset
+    """
+    if dir_path_static is None:
+        return None
+    parts = urlsplit(urljoin(base_url, url))
+    if parts.scheme or parts.netloc:
+        return None
+    asset = posixpath.normpath(unquote(parts.path)).lstrip("/")
+    if asset in ("", ".") or asset.startswith("../"):
+        return None
+    if not os.path.isfile(os.path.join(dir_path_static, asset)):
+        return None
+    return asset
+
+
+def resolve_assets(urls: list[str], base_url: str, dir_path_static: None | str) -> list[str]:
+    """
+        Returns the sorted static assets referenced by a list of URLs
+    """
+    assets = {resolve_asset(url, base_url, dir_path_static) for url in urls}
+    assets.discard(None)
+    return sorted(assets)
+
+
+def resolve_link(url: str, base_url: str) -> None | str:
+    """
+        Returns the site path a link on the page at base_url points to, without
+        its query or fragment, or None if the link leaves the site
+    """
+    parts = urlsplit(urljoin(base_url, url))
+    if parts.scheme or parts.netloc:
+        return None
+    path = posixpath.normpath("/" + unquote(parts.path).lstrip("/"))
+    if parts.path.endswith("/") and path != "/":
+        path += "/"
+    return path
+
+
+def resolve_links(urls: list[str], base_url: str) -> list[str]:
+    """
+        Returns the sorted site paths a list of link targets point to
+    """
+    links = {resolve_link(url, base_url) for url in urls}
+    links.discard(None)
+    return sorted(links)
+
+
+def generate_pages_incremental(
+        dir_path_content: str,
+        template_path: str,
+        dest_dir_path: str,
+        manifest: BuildManifest,
+        jobs: int = 1,
+        dir_path_static: None | str = None,
+        explain: bool = False,
+        cache: None | PageCache = None,
+        io_pool: None | IOPool = None,
+        changed_paths: None | set = None,
+        save: bool = True,
+        changed_assets: None | set = None,
+        rebuild: None | dict[str, str] = None,
+        records: None | dict = None
+    ) -> None:
+    """
+        Regenerates only the pages affected by changes since the build recorded in
+        the manifest and removes outputs of deleted pages.
+
+        Affected pages are parsed and rendered again unless the cache holds a
+        body for their markdown, so a template change re-renders pages from
+        their cached HTML bodies without parsing the markdown. The static assets
+        each page references are recorded in the manifest's dependency graph,
+        and the site paths it links to are recorded with the page.
+
+        When the caller already knows which content files changed (as the watcher
+        does), passing them as changed_paths checks only those files instead of
+        walking the whole content tree; a template change still checks every page.
+        With save=False the manifest and cache are left for the caller to save.
+
+        Pages that reference one of changed_assets, static assets whose
+        rendering changed (such as images whose dimensions are added to their
+        tags), are written again, re-rendered from their cached bodies when
+        possible. So are the pages in rebuild, which maps each page a later
+        build stage needs the records of to the reason given by explain. If
+        records is given, the record of every page generated is stored in it
+        by source.
+    """
+    template = load_template(template_path)
+    template_assets = resolve_assets(template.asset_urls, "/", dir_path_static)
+    template_changed = manifest.template_changed(template_path, template_assets)
+    asset_dependents = set()
+    if changed_assets:
+        if not changed_assets.isdisjoint(template_assets):
+            template_changed = True
+        asset_dependents = {
+            from_path for from_path, entry in manifest.pages.items()
+            if not changed_assets.isdisjoint(entry.get("assets", ()))
+        }
+        if changed_paths is not None:
+            changed_paths = changed_paths | asset_dependents
+    rebuild = rebuild or {}
+    if rebuild and changed_paths is not None:
+        changed_paths = changed_paths | rebuild.keys()
+    if changed_paths is None or template_changed:
+        pages = discover_pages(dir_path_content, dest_dir_path)
+        removed = manifest.remove_stale_pages({from_path for from_path, _ in pages})
+    else:
+        pages = [
+            (from_path, page_dest_path(from_path, dir_path_content, dest_dir_path))
+            for from_path in sorted(changed_paths) if os.path.isfile(from_path)
+        ]
+        removed = manifest.remove_pages({path for path in changed_paths if not os.path.isfile(path)})
+
+    tasks = []
+    keys = []
+    cached_records = []
+    explanations = []
+    for from_path, dest_path in pages:
+        reasons = manifest.page_changed(from_path, dest_path)
+        if not reasons:
+            if template_changed:
+                reasons = ["template changed"]
+            elif from_path in asset_dependents:
+                reasons = ["referenced asset changed"]
+            elif from_path in rebuild:
+                reasons = [rebuild[from_path]]
+            else:
+                continue
+        slots = {"Path": page_url(dest_path, dest_dir_path)}
+        content_hash = manifest.pages[from_path]["hash"]
+        task, key, record = page_task(from_path, template_path, dest_path, slots, cache, content_hash)
+        tasks.append(task)
+        keys.append(key)
+        cached_records.append(record)
+        explanations.append(reasons)
+
+    failures = []
+    results = run_page_tasks(tasks, jobs, io_pool)
+    for task, key, cached, reasons, (error, record) in zip(tasks, keys, cached_records, explanations, results):
+        from_path, _, dest_path, slots, _, reuse_body = task
+        if error is not None:
+            logging.error("Failed to generate %s: %s", from_path, error)
+            manifest.forget_page(from_path)
+            failures.append((from_path, error))
+            continue
+        if record is None or "title" not in record:
+            # Re-rendered from its cached body, with at most its search terms
+            record = dict(cached, **record) if record is not None else cached
+        elif cache is not None:
+            cache.put(key, record)
+        if records is not None:
+            records[from_path] = record
+        if record is not None:
+            manifest.record_page(from_path, {
+                "title": record["title"],
+                "description": record["description"],
+                "assets": resolve_assets(record["images"], slots["Path"], dir_path_static),
+                "links": resolve_links(record["links"], slots["Path"]),
+            })
+        if explain:
+            action = "re-rendered from cached body" if reuse_body else "parsed and rendered"
+            print(f"{dest_path}: {', '.join(reasons)}; {action}")
+    for dest_path in removed:
+        logging.info("Removed %s", dest_path)
+        if explain:
+            print(f"{dest_path}: source deleted; removed")
+
+    total = len(manifest.pages) + len(failures)
+    logging.info("%d of %d pages regenerated", len(tasks) - len(failures), total)
+    if cache is not None:
+        logging.info("Page cache: %d hits, %d misses", cache.hits, cache.misses)
+        if save:
+            cache.save()
+    if save:
+        manifest.save()
+    if failures:
+        raise PageGenerationError(failures)
+
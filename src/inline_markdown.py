@@ -1,5 +1,8 @@
-import re
-
+from parser_tables import (
+    IMAGE_PATTERN,
+    LINK_PATTERN,
+    INLINE_DELIMITER_PATTERN
+)
 from textnode import (
     TextNode,
     text_type_text,
@@ -10,6 +13,14 @@ from textnode import (
     text_type_link
 )
 
+# Delimiters in the order the chained splitters apply them. Inside a formatted
+# section, a delimiter with a lower rank is an error and a higher one is literal.
+INLINE_DELIMITERS = {
+    "**": (0, text_type_bold),
+    "*": (1, text_type_italic),
+    "`": (2, text_type_code),
+}
+
 def split_nodes_delimiter(
         old_nodes: list[TextNode],
         delimiter: str,
@@ -103,27 +114,70 @@ def extract_markdown_images(text: str) -> list:
     Extracts markdown formatted images from a string and returns a list of tuples
     containing the image source and alt text.
     """
-    image_regex = r"!\[(.*?)\]\((.*?)\)"
-    images = re.findall(image_regex, text)
-    return images
+    return IMAGE_PATTERN.findall(text)
 
 def extract_markdown_links(text: str) -> list:
     """
     Extracts markdown formatted links from a string and returns a list of tuples
     containing the link source and alt text.
     """
-    link_regex = r"\[(.*?)\]\((.*?)\)"
-    links = re.findall(link_regex, text)
-    return links
+    return LINK_PATTERN.findall(text)
+
+def _append_text_section(nodes: list[TextNode], text: str) -> None:
+    """
+        Appends the nodes for an unformatted section of text, splitting out images
+        and then links in the gaps between images
+    """
+    pieces = IMAGE_PATTERN.split(text)
+    for i in range(0, len(pieces) - 1, 3):
+        _append_links(nodes, pieces[i])
+        nodes.append(TextNode(pieces[i + 1], text_type_image, pieces[i + 2]))
+    _append_links(nodes, pieces[-1])
+
+
+def _append_links(nodes: list[TextNode], text: str) -> None:
+    """
+        Appends the nodes for a section of text that contains no images
+    """
+    pieces = LINK_PATTERN.split(text)
+    for i in range(0, len(pieces) - 1, 3):
+        if pieces[i] != "":
+            nodes.append(TextNode(pieces[i], text_type_text))
+        nodes.append(TextNode(pieces[i + 1], text_type_link, pieces[i + 2]))
+    if pieces[-1] != "":
+        nodes.append(TextNode(pieces[-1], text_type_text))
+
 
 def text_to_textnodes(text: str) -> list[TextNode]:
     """
-        Converts a string to a list of TextNodes based on the text type
+        Converts a string to a list of TextNodes based on the text type.
+
+        Scans the text once, producing the same nodes as applying
+        split_nodes_delimiter for **, * and `, then split_nodes_image and
+        split_nodes_link, without building the intermediate lists.
     """
-    nodes = [TextNode(text, text_type_text)]
-    nodes = split_nodes_delimiter(nodes, "**", text_type_bold)
-    nodes = split_nodes_delimiter(nodes, "*", text_type_italic)
-    nodes = split_nodes_delimiter(nodes, "`", text_type_code)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
-    return nodes
\ No newline at end of file
+    nodes = []
+    open_delimiter = None
+    open_rank = 0
+    open_type = None
+    position = 0
+    for match in INLINE_DELIMITER_PATTERN.finditer(text):
+        delimiter = match.group()
+        if open_delimiter is None:
+            if match.start() > position:
+                _append_text_section(nodes, text[position:match.start()])
+            open_delimiter = delimiter
+            open_rank, open_type = INLINE_DELIMITERS[delimiter]
+            position = match.end()
+        elif delimiter == open_delimiter:
+            if match.start() > position:
+                nodes.append(TextNode(text[position:match.start()], open_type))
+            open_delimiter = None
+            position = match.end()
+        elif INLINE_DELIMITERS[delimiter][0] < open_rank:
+            raise ValueError("Invalid delimiter usage. Formatted section not closed.")
+    if open_delimiter is not None:
+        raise ValueError("Invalid delimiter usage. Formatted section not closed.")
+    if len(text) > position:
+        _append_text_section(nodes, text[position:])
+    return nodes
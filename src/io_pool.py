@@ -0,0 +1,100 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_IO_WORKERS = 8
+DEFAULT_MAX_IN_FLIGHT = 64
+
+
+def scan_tree(root: str):
+    """
+        Walks a directory tree with os.scandir, without recursion, yielding a
+        (relative posix path, DirEntry) pair for every file in sorted order.
+        A missing root yields nothing.
+    """
+    if not os.path.isdir(root):
+        return
+    stack = [("", iter(_sorted_entries(root)))]
+    while stack:
+        prefix, entries = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+        relative = prefix + entry.name
+        if entry.is_dir():
+            stack.append((relative + "/", iter(_sorted_entries(entry.path))))
+        else:
+            yield relative, entry
+
+
+def make_dirs(path: str) -> None:
+    """
+        Creates a directory and any missing parents like os.makedirs with
+        exist_ok=True, but without recursion, so a path nested deeper than the
+        recursion limit can be created
+    """
+    missing = []
+    while path and not os.path.isdir(path):
+        missing.append(path)
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    for path in reversed(missing):
+        try:
+            os.mkdir(path)
+        except FileExistsError:
+            if not os.path.isdir(path):
+                raise
+
+
+def _sorted_entries(path: str) -> list:
+    """
+        Returns the entries of a directory sorted by name
+    """
+    with os.scandir(path) as entries:
+        return sorted(entries, key=lambda entry: entry.name)
+
+
+class IOPool:
+    """
+        Thread pool for blocking file operations.
+
+        map() runs an operation over many items concurrently while keeping at
+        most max_in_flight of them queued or running, so a large tree never
+        queues every operation at once. With a single worker the operations run
+        inline on the calling thread.
+    """
+    def __init__(self, workers: int = DEFAULT_IO_WORKERS, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT) -> None:
+        self.workers = workers
+        self.max_in_flight = max(1, max_in_flight)
+        self.executor = None
+        if workers > 1:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="io")
+
+    def map(self, func, items):
+        """
+            Yields func(item) for each item, in order, re-raising any exception
+        """
+        if self.executor is None:
+            for item in items:
+                yield func(item)
+            return
+        in_flight = deque()
+        for item in items:
+            if len(in_flight) >= self.max_in_flight:
+                yield in_flight.popleft().result()
+            in_flight.append(self.executor.submit(func, item))
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    def __enter__(self) -> "IOPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
@@ -1,30 +1,590 @@
 import os
+import sys
 import shutil
+import signal
 import logging
+import argparse
+import threading
+from contextlib import nullcontext
 
-from copy_static import copy_files_recursive
-from generate_page import generate_pages_recursive
+from build_manifest import BuildManifest
+from config import (
+    DEFAULT_RELOAD_URL,
+    DEFAULT_TOP_PAGES,
+    DIR_PATH_CACHE,
+    DIR_PATH_CONTENT,
+    DIR_PATH_PUBLIC,
+    DIR_PATH_STATIC,
+    TEMPLATE_PATH,
+    BuildSettings,
+    ConfigError,
+    SitePaths,
+    check_config,
+    load_config
+)
+from copy_static import SYNC_MODE_COPY, SYNC_MODES, sync_files
+from generate_page import (
+    PageGenerationError,
+    discover_pages,
+    use_block_cache,
+    use_image_attributes,
+    use_search_terms,
+    use_memory_budget
+)
+from incremental import generate_pages_incremental
+from io_pool import DEFAULT_IO_WORKERS, DEFAULT_MAX_IN_FLIGHT, IOPool
+from memory_budget import BLOCK_CACHE_BUDGET_SHARE, log_peak_memory
+from page_cache import DEFAULT_BLOCK_CACHE_BYTES, DEFAULT_MAX_BYTES, BlockCache, PageCache
 
-DIR_PATH_STATIC = "./static"
-DIR_PATH_PUBLIC = "./public"
-DIR_PATH_CONTENT = "./content"
-TEMPLATE_PATH = "./template.html"
+DIR_PATH_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PORT = 8888
+COMMANDS = ("build", "watch", "serve")
 
-def main() -> None:
-    if os.path.exists(DIR_PATH_PUBLIC):
-        logging.info("Deleting public directory...")
-        shutil.rmtree(DIR_PATH_PUBLIC)
-    
-    logging.info("Copying static files to public directory...")
-    copy_files_recursive(DIR_PATH_STATIC, DIR_PATH_PUBLIC)
+def main(settings: BuildSettings) -> None:
+    """
+        Builds the site and, with watch, keeps rebuilding it as its sources
+        change. With serve, the public directory is also served from this
+        process: while watching, on a background thread with browsers reloaded
+        directly after each rebuild, otherwise once the build finishes. With a
+        memory budget in bytes, the block cache is capped to a share of it and
+        page rendering is fitted into it (see run_page_tasks).
+    """
+    paths = settings.paths
+    httpd = None
+    if settings.serve:
+        httpd = create_server(
+            paths.public, settings.port, settings.watch, settings.quiet, settings.file_cache_size
+        )
+        if settings.watch:
+            threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    profiler = None
+    if settings.profile is not None:
+        # Imported here as only --profile needs the profiler and the modules it instruments
+        from profiler import Profiler, log_profile, write_report
 
-    logging.info("Generating index.html...")
-    generate_pages_recursive(
-        DIR_PATH_CONTENT,
-        TEMPLATE_PATH,
-        DIR_PATH_PUBLIC
+        if settings.jobs > 1:
+            logging.info("Profiling builds serially, ignoring --jobs")
+        if settings.use_cache:
+            logging.info("Profiling without the page cache, so every page is parsed")
+        settings.jobs = settings.io_workers = 1
+        settings.use_cache = False
+        profiler = Profiler(settings.profile_memory)
+    max_memory = settings.max_memory
+    block_cache_size = settings.block_cache_size
+    if max_memory > 0 and block_cache_size > max_memory // BLOCK_CACHE_BUDGET_SHARE:
+        block_cache_size = max_memory // BLOCK_CACHE_BUDGET_SHARE
+        logging.info("Capping the block cache at %d MiB to fit --max-memory", block_cache_size // (1024 * 1024))
+    use_memory_budget(max_memory)
+    block_cache = None
+    if block_cache_size > 0:
+        block_cache = BlockCache(block_cache_size, paths.block_cache if settings.persist_block_cache else None)
+    use_block_cache(block_cache)
+    with (
+        IOPool(settings.io_workers, settings.max_in_flight) as io_pool,
+        profiler.instrument() if profiler is not None else nullcontext()
+    ):
+        try:
+            build(
+                settings,
+                io_pool,
+                profiler,
+                httpd.live_reload.notify if httpd is not None and settings.watch else None,
+                block_cache
+            )
+        finally:
+            if block_cache is not None:
+                logging.info("Block cache: %d hits, %d misses", block_cache.hits, block_cache.misses)
+                block_cache.save()
+            log_peak_memory(settings.jobs > 1)
+            if profiler is not None:
+                report = profiler.report(settings.profile_top)
+                log_profile(report, settings.profile_top)
+                write_report(settings.profile, report)
+                if settings.profile_trace is not None:
+                    profiler.write_trace(settings.profile_trace)
+    if httpd is not None:
+        if settings.watch:
+            httpd.shutdown()
+        else:
+            serve_forever(httpd)
+
+def build(
+        settings: BuildSettings,
+        io_pool: IOPool,
+        profiler=None,
+        on_rebuild=None,
+        block_cache: None | BlockCache = None
+    ) -> None:
+    paths = settings.paths
+    jobs = settings.jobs
+    phase = profiler.phase if profiler is not None else lambda name: nullcontext()
+    cache = PageCache(paths.page_cache, settings.cache_size)
+    if settings.clear_cache:
+        logging.info("Clearing page cache...")
+        cache.clear()
+        if block_cache is not None:
+            block_cache.clear()
+    if not settings.use_cache:
+        cache = None
+
+    if settings.incremental or settings.watch:
+        manifest = BuildManifest.load(paths.manifest)
+        logging.info("Syncing static files to public directory...")
+    else:
+        if os.path.exists(paths.public):
+            logging.info("Deleting public directory...")
+            shutil.rmtree(paths.public)
+        if os.path.exists(paths.manifest):
+            os.remove(paths.manifest)
+        # A full build is an incremental one from an empty manifest, so it
+        # records every page and asset for the incremental builds after it
+        manifest = BuildManifest(paths.manifest)
+        logging.info("Copying static files to public directory...")
+
+    with phase("asset copy"):
+        copied = sync_files(
+            paths.static, paths.public, manifest, settings.sync_mode, settings.checksum, settings.explain, io_pool
+        )
+    logging.info("%d static file(s) copied", copied)
+
+    update_images = image_processor(paths, manifest, jobs) if settings.images else None
+    changed_assets = None
+    if update_images is not None:
+        with phase("images"):
+            changed_assets = update_images()
+
+    rebuild = records = update_search_index = None
+    if settings.search_index:
+        rebuild, records, update_search_index = search_indexer(paths, manifest)
+
+    def update_page_images() -> None:
+        # Pages rendered for the first time may reference images the catalog
+        # has not seen, so the images are brought up to date again from the
+        # recorded references and the pages that use changed ones rewritten
+        with phase("images"):
+            changed = update_images()
+        if changed:
+            generate_pages_incremental(
+                paths.content,
+                paths.template,
+                paths.public,
+                manifest,
+                jobs,
+                paths.static,
+                settings.explain,
+                cache,
+                io_pool,
+                set(),
+                save=not settings.watch,
+                changed_assets=changed,
+                records=records
+            )
+
+    def after_rebuild() -> None:
+        if update_images is not None:
+            try:
+                update_page_images()
+            except PageGenerationError as e:
+                logging.error("%s", e)
+        update_outputs()
+
+    def update_outputs() -> None:
+        if update_search_index is not None:
+            with phase("search index"):
+                update_search_index()
+        if settings.site_url is not None or settings.check_links:
+            with phase("site outputs"):
+                write_site_outputs(paths, manifest.pages, settings.site_url, settings.check_links)
+
+    logging.info("Generating changed pages...")
+    try:
+        generate_pages_incremental(
+            paths.content,
+            paths.template,
+            paths.public,
+            manifest,
+            jobs,
+            paths.static,
+            settings.explain,
+            cache,
+            io_pool,
+            changed_assets=changed_assets,
+            rebuild=rebuild,
+            records=records
+        )
+        if update_images is not None:
+            update_page_images()
+    except PageGenerationError as e:
+        if not settings.watch:
+            raise
+        logging.error("%s", e)
+    finally:
+        update_outputs()
+        if settings.compress:
+            logging.info("Compressing changed files...")
+            with phase("compression"):
+                compress_public(paths.public, io_pool)
+    if settings.watch:
+        # Imported here as only watching needs the file watcher
+        from watch import watch_site
+
+        watch_site(
+            paths.content,
+            paths.template,
+            paths.static,
+            paths.public,
+            manifest,
+            jobs,
+            settings.explain,
+            cache,
+            io_pool,
+            settings.sync_mode,
+            settings.checksum,
+            settings.reload_url,
+            on_rebuild=on_rebuild,
+            after_rebuild=after_rebuild,
+            update_assets=update_images,
+            records=records
+        )
+
+def image_processor(paths: SitePaths, manifest: BuildManifest, jobs: int):
+    """
+        Returns a function that brings the dimensions and variants of the
+        images referenced by the template and pages recorded in the manifest
+        up to date, has generated pages add them to their img tags and returns
+        the assets of the images that changed. Until a page is recorded, as
+        before the first pages of a full build, the images already in the
+        catalog are kept. images is imported here as only builds with --images
+        need it, and Pillow with it.
+    """
+    from images import ImageCatalog, log_image_report
+
+    catalog = ImageCatalog(paths.image_state, paths.image_variants, paths.static, paths.public)
+
+    def update() -> set:
+        logging.info("Processing images...")
+        referenced = manifest.referenced_assets() if manifest.pages else set(catalog.images)
+        report = catalog.update(referenced, jobs)
+        log_image_report(report)
+        catalog.save()
+        use_image_attributes(catalog.attributes())
+        return report["changed"]
+    return update
+
+def search_indexer(paths: SitePaths, manifest: BuildManifest):
+    """
+        Has generated pages collect their search terms and returns the pages
+        the site's search index needs rendered again, a dict for the records
+        of generated pages, and a function that brings the index up to date
+        from the records collected since it last ran. search_index is imported
+        here as only builds with --search-index need it.
+    """
+    from search_index import SearchIndex, log_search_report
+
+    index = SearchIndex(paths.search_state, paths.search_index)
+    use_search_terms(True)
+    records = {}
+
+    def update() -> None:
+        logging.info("Updating search index...")
+        log_search_report(index.update(manifest.pages, records, paths.public))
+        records.clear()
+        index.save()
+    return index.stale_pages(manifest.pages), records, update
+
+def write_site_outputs(paths: SitePaths, pages: dict, site_url: None | str, check_links: bool) -> None:
+    """
+        Writes the sitemap and feed, and with check_links the link graph, from
+        the manifest's page entries. site_outputs is imported here as only
+        builds with --site-url or --check-links need it.
+    """
+    import site_outputs
+
+    logging.info("Writing site outputs...")
+    site_outputs.log_site_report(site_outputs.write_site_outputs(
+        pages, paths.public, paths.static, site_url, paths.link_graph if check_links else None
+    ))
+
+def compress_public(dir_path: str, io_pool: IOPool) -> None:
+    # Imported here as gzip and brotli are only needed with --compress
+    from compress import compress_tree, log_compression_report
+
+    log_compression_report(compress_tree(dir_path, io_pool))
+
+def create_server(
+        directory: str,
+        port: int = DEFAULT_PORT,
+        live_reload: bool = False,
+        quiet: bool = False,
+        file_cache_size: int = 0
+    ):
+    """
+        Returns a server.py server for the directory. server.py is imported
+        here, so builds that do not serve never load http.server.
+    """
+    if DIR_PATH_ROOT not in sys.path:
+        sys.path.append(DIR_PATH_ROOT)
+    import server
+
+    httpd = server.create_server(
+        port=port, directory=directory, live_reload=live_reload, quiet=quiet, cache_size=file_cache_size
+    )
+    logging.info("Serving %s on http://localhost:%d", directory, port)
+    return httpd
+
+def serve_forever(httpd) -> None:
+    """
+        Serves until interrupted
+    """
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Stopped serving")
+    finally:
+        httpd.server_close()
+
+def add_serve_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+        Adds the options of the server run by the serve command and --serve
+    """
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to serve HTTP on")
+    parser.add_argument(
+        "--file-cache-size",
+        type=int,
+        default=0,
+        help="Keep up to this many MiB of recently served files in memory (0 disables the cache)",
+    )
+    parser.add_argument("--quiet", action="store_true", help="Do not log each request")
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    """
+        Parses the command line. Without a command, the arguments are those of
+        build, so `main.py --incremental` keeps working. Settings from a
+        --config file replace the defaults, and options given on the command
+        line override them.
+    """
+    if not argv or argv[0] not in COMMANDS and argv[0] not in ("-h", "--help"):
+        argv = ["build", *argv]
+    parser = argparse.ArgumentParser(description="Static site generator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--config",
+        help="JSON file of settings keyed by option name, e.g. {\"jobs\": 4, \"output\": \"public\"}; "
+             "relative paths in it are relative to the file",
+    )
+    common.add_argument(
+        "--output",
+        "--dir",
+        default=DIR_PATH_PUBLIC,
+        help="Directory the site is written to and served from",
+    )
+
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument("--content", default=DIR_PATH_CONTENT, help="Directory of markdown content")
+    options.add_argument("--static", default=DIR_PATH_STATIC, help="Directory of static files")
+    options.add_argument("--template", default=TEMPLATE_PATH, help="HTML template for every page")
+    options.add_argument(
+        "--cache-dir",
+        default=DIR_PATH_CACHE,
+        help="Directory of the build manifest and page cache; concurrent builds need one each",
     )
+    options.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only rebuild pages and static files affected by changes since the last build",
+    )
+    options.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of worker processes used to render pages",
+    )
+    options.add_argument(
+        "--explain",
+        action="store_true",
+        help="With --incremental, print why each page or static file was rebuilt",
+    )
+    options.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Parse every page instead of reusing rendered bodies from the page cache",
+    )
+    options.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Delete the page cache before building",
+    )
+    options.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help="Maximum size of the page cache in MiB",
+    )
+    options.add_argument(
+        "--max-memory",
+        type=int,
+        default=0,
+        help="Memory budget in MiB for rendering pages: limits the number of worker processes "
+             "and the block cache, and renders pages too large to share it one at a time "
+             "(0 means no limit)",
+    )
+    options.add_argument(
+        "--block-cache-size",
+        type=int,
+        default=DEFAULT_BLOCK_CACHE_BYTES // (1024 * 1024),
+        help="Maximum size in MiB of the in-memory cache of rendered blocks, which skips parsing "
+             "unchanged and repeated paragraphs (0 disables it)",
+    )
+    options.add_argument(
+        "--persist-block-cache",
+        action="store_true",
+        help="Keep the block cache in the cache directory between builds",
+    )
+    options.add_argument(
+        "--link-mode",
+        choices=SYNC_MODES,
+        default=SYNC_MODE_COPY,
+        help="How static files are placed in the public directory: copied, hardlinked, "
+             "or reflinked with copy_file_range where the filesystem supports it",
+    )
+    options.add_argument(
+        "--checksum",
+        action="store_true",
+        help="With --incremental, compare static file contents instead of size and modification time",
+    )
+    options.add_argument(
+        "--io-workers",
+        type=int,
+        default=DEFAULT_IO_WORKERS,
+        help="Number of threads used to copy static files, and to read and write pages "
+             "when rendering without worker processes",
+    )
+    options.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=DEFAULT_MAX_IN_FLIGHT,
+        help="Maximum number of file operations queued or running on the I/O threads at once",
+    )
+    options.add_argument(
+        "--reload-url",
+        default=DEFAULT_RELOAD_URL,
+        help="When watching without --serve, the live-reload endpoint of server.py to notify after each rebuild",
+    )
+    options.add_argument(
+        "--compress",
+        action="store_true",
+        help="Write gzip (and, if the brotli package is installed, brotli) copies of changed "
+             "text files next to them for server.py to serve",
+    )
+    options.add_argument(
+        "--search-index",
+        action="store_true",
+        help="Write an inverted index of the pages' text, collected while they are rendered, to "
+             "search/ in the public directory, updating it for changed pages only",
+    )
+    options.add_argument(
+        "--images",
+        action="store_true",
+        help="Add width, height, lazy loading and async decoding attributes to images, and "
+             "generate downscaled variants for srcset when Pillow is installed",
+    )
+    options.add_argument(
+        "--site-url",
+        help="Absolute URL the site is published at, e.g. https://example.com; "
+             "writes sitemap.xml and an RSS feed.xml to the public directory",
+    )
+    options.add_argument(
+        "--check-links",
+        action="store_true",
+        help="Report links to pages or files that do not exist and write the internal "
+             "link graph to links.json in the cache directory",
+    )
+    options.add_argument(
+        "--profile",
+        metavar="REPORT",
+        help="Build serially and without the page cache while timing each phase and page, "
+             "and write a JSON report to this file",
+    )
+    options.add_argument(
+        "--profile-trace",
+        metavar="TRACE",
+        help="With --profile, also write a Chrome trace-event file",
+    )
+    options.add_argument(
+        "--profile-top",
+        type=int,
+        default=DEFAULT_TOP_PAGES,
+        help="With --profile, how many of the slowest pages to log",
+    )
+    options.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="With --profile, trace each page's peak memory allocation (much slower)",
+    )
+    options.add_argument(
+        "--serve",
+        action="store_true",
+        help="Serve the public directory from this process: after building, or while watching "
+             "with browsers reloaded after each rebuild",
+    )
+    add_serve_arguments(options)
+
+    build_parser = commands.add_parser("build", parents=[common, options], help="Build the site (the default)")
+    build_parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Build incrementally, then rebuild affected pages whenever content, "
+             "static files or the template change (the same as the watch command)",
+    )
+    watch_parser = commands.add_parser(
+        "watch", parents=[common, options], help="Build incrementally, then rebuild whenever the sources change"
+    )
+    watch_parser.set_defaults(watch=True)
+    serve_parser = commands.add_parser("serve", parents=[common], help="Serve the public directory with server.py")
+    serve_parser.add_argument(
+        "--live-reload",
+        action="store_true",
+        help="Reload open pages when a separate `main.py watch` finishes a rebuild",
+    )
+    add_serve_arguments(serve_parser)
+
+    subparsers = (build_parser, watch_parser, serve_parser)
+    config_path = common.parse_known_args(argv[1:])[0].config
+    if config_path is not None:
+        try:
+            config = load_config(config_path)
+            check_config(config, {
+                name: value for subparser in subparsers for name, value in vars(subparser.parse_args([])).items()
+            })
+        except ConfigError as e:
+            parser.error(str(e))
+        if config.get("link_mode", SYNC_MODE_COPY) not in SYNC_MODES:
+            parser.error(f"Setting link_mode in config file must be one of {', '.join(SYNC_MODES)}")
+        for subparser in subparsers:
+            known = vars(subparser.parse_args([]))
+            subparser.set_defaults(**{name: value for name, value in config.items() if name in known})
+
+    args = parser.parse_args(argv)
+    if args.command != "serve" and args.profile and args.watch:
+        parser.error("--profile cannot be combined with watching")
+    return args
 
 if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
     logging.basicConfig(level=logging.INFO)
-    main()
\ No newline at end of file
+    if args.command == "serve":
+        serve_forever(
+            create_server(args.output, args.port, args.live_reload, args.quiet, args.file_cache_size * 1024 * 1024)
+        )
+        raise SystemExit(0)
+    if args.watch or args.serve:
+        # Stop cleanly on SIGTERM so the manifest and cache are saved
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        main(BuildSettings(args))
+    except PageGenerationError as e:
+        logging.error("%s", e)
+        raise SystemExit(1)
@@ -0,0 +1,85 @@
+import os
+import sys
+import logging
+
+WORKER_BASE_BYTES = 48 * 1024 * 1024
+PAGE_MEMORY_FACTOR = 16
+BLOCK_CACHE_BUDGET_SHARE = 8
+
+
+def peak_rss() -> tuple[int, int]:
+    """
+        Returns the peak resident set size in bytes of this process and of the
+        largest of its finished child processes, or zeros where the platform
+        does not report them
+    """
+    try:
+        # Imported here as the resource module only exists on Unix
+        import resource
+    except ImportError:
+        return 0, 0
+    # ru_maxrss is in kilobytes, except on macOS where it is in bytes
+    scale = 1 if sys.platform == "darwin" else 1024
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    )
+
+
+def current_rss() -> int:
+    """
+        Returns the resident set size in bytes of this process, falling back to
+        its peak where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss()[0]
+
+
+def plan_pages(
+        sizes: list[int],
+        max_memory: int,
+        jobs: int,
+        threads: int,
+        worker_bytes: int = WORKER_BASE_BYTES
+    ) -> tuple[int, list[bool]]:
+    """
+        Fits the rendering of pages whose markdown has the given sizes into a
+        memory budget. A page is estimated to need PAGE_MEMORY_FACTOR times its
+        size while it renders, and each worker process worker_bytes on top.
+        Returns the number of worker processes the budget allows, at most jobs
+        and each left at least worker_bytes again for its pages, and for each
+        page whether it is too large to render alongside others and should be
+        streamed on its own once the rest are done.
+    """
+    available = max(0, max_memory - current_rss())
+    if jobs > 1:
+        jobs = max(1, min(jobs, available // (2 * worker_bytes)))
+    if jobs > 1:
+        share = available // jobs - worker_bytes
+    else:
+        share = available // max(1, threads)
+    oversized = [size * PAGE_MEMORY_FACTOR > share for size in sizes]
+    too_large = sum(size * PAGE_MEMORY_FACTOR > available for size in sizes)
+    if too_large:
+        logging.warning("%d page(s) may not fit in the memory budget even when rendered alone", too_large)
+    return jobs, oversized
+
+
+def log_peak_memory(used_workers: bool = False) -> None:
+    """
+        Logs the peak resident set size of the build and, if it ran a pool of
+        worker processes, of the largest of them
+    """
+    build, workers = peak_rss()
+    if build == 0:
+        return
+    if used_workers and workers:
+        logging.info(
+            "Peak memory: %.1f MiB in the build process, %.1f MiB in the largest worker",
+            build / (1024 * 1024), workers / (1024 * 1024)
+        )
+    else:
+        logging.info("Peak memory: %.1f MiB", build / (1024 * 1024))
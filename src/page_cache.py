@@ -0,0 +1,300 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+
+import block_markdown
+import htmlnode
+import inline_markdown
+import parser_tables
+import textnode
+
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_BLOCK_CACHE_BYTES = 64 * 1024 * 1024
+PARSER_MODULES = (block_markdown, htmlnode, inline_markdown, parser_tables, textnode)
+
+_parser_version = None
+
+
+def parser_version() -> str:
+    """
+        Returns a fingerprint of the parser's source code, so cached output is
+        invalidated whenever the markdown parser or renderer changes
+    """
+    global _parser_version
+    if _parser_version is None:
+        digest = hashlib.sha256(str(CACHE_VERSION).encode())
+        for module in PARSER_MODULES:
+            with open(module.__file__, "rb") as f:
+                digest.update(f.read())
+        _parser_version = digest.hexdigest()[:16]
+    return _parser_version
+
+
+def terms_path(body_path: str) -> str:
+    """
+        Returns the path of the search terms file kept next to a cached body
+    """
+    return os.path.splitext(body_path)[0] + ".terms.json"
+
+
+class PageCache:
+    """
+        Persistent, size-bounded cache of rendered page bodies.
+
+        Entries are keyed by the markdown's content hash plus the parser version
+        and hold the rendered HTML body (as a file under bodies/) and the page's
+        title, description, image URLs and link targets. The positions of the
+        page's search terms, which are as large as its text, are kept out of
+        the index in a file next to the body (see terms_path). When the bodies
+        exceed max_bytes the least recently used entries are evicted.
+    """
+    def __init__(self, dir_path: str, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.dir_path = dir_path
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(dir_path, "index.json")
+        self.entries = {}
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == CACHE_VERSION:
+            self.entries = data["entries"]
+            self.clock = data["clock"]
+
+    def key(self, content_hash: str) -> str:
+        """
+            Returns the cache key for markdown with the given content hash
+        """
+        return f"{parser_version()}-{content_hash}"
+
+    def body_path(self, key: str) -> str:
+        """
+            Returns the path of the cached body for a key
+        """
+        return os.path.join(self.dir_path, "bodies", f"{key}.html")
+
+    def get(self, key: str) -> None | dict:
+        """
+            Returns the cached record for a key, marking it as recently used, or
+            None if the page is not cached
+        """
+        entry = self.entries.get(key)
+        if entry is None or not os.path.exists(self.body_path(key)):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.clock += 1
+        entry["accessed"] = self.clock
+        return entry["record"]
+
+    def put(self, key: str, record: dict) -> None:
+        """
+            Records the metadata for a body that has been written to body_path(key),
+            leaving out its search terms
+        """
+        self.clock += 1
+        self.entries[key] = {
+            "record": {name: value for name, value in record.items() if name != "terms"},
+            "size": os.path.getsize(self.body_path(key)),
+            "accessed": self.clock,
+        }
+
+    def evict(self) -> list[str]:
+        """
+            Removes least recently used entries until the cache fits in max_bytes
+            and returns the evicted keys
+        """
+        total = sum(entry["size"] for entry in self.entries.values())
+        evicted = []
+        for key in sorted(self.entries, key=lambda key: self.entries[key]["accessed"]):
+            if total <= self.max_bytes:
+                break
+            total -= self.entries.pop(key)["size"]
+            for path in (self.body_path(key), terms_path(self.body_path(key))):
+                if os.path.exists(path):
+                    os.remove(path)
+            evicted.append(key)
+        return evicted
+
+    def save(self) -> None:
+        """
+            Evicts entries over the size limit and atomically writes the index
+        """
+        self.evict()
+        os.makedirs(self.dir_path, exist_ok=True)
+        data = {"version": CACHE_VERSION, "clock": self.clock, "entries": self.entries}
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.index_path)
+
+    def clear(self) -> None:
+        """
+            Deletes every cached entry
+        """
+        if os.path.exists(self.dir_path):
+            shutil.rmtree(self.dir_path)
+        self.entries = {}
+        self.clock = 0
+
+
+class BlockCache:
+    """
+        Size-bounded LRU cache of rendered blocks keyed on each block's markdown
+        text, so a block that was rendered before, such as an unchanged
+        paragraph of an edited page or a footer repeated across pages, is not
+        parsed again. Entries hold the block's HTML, the image URLs and link
+        targets it references and its text for the search index. With a path, the cache is loaded from and saved to a file,
+        which is ignored once the parser changes.
+
+        The cache may be shared by threads; worker processes each get a copy
+        that tracks its changes, which are merged back into the build's cache.
+    """
+    def __init__(self, max_bytes: int = DEFAULT_BLOCK_CACHE_BYTES, path: None | str = None) -> None:
+        self.max_bytes = max_bytes
+        self.path = path
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.added = None
+        self.lock = threading.Lock()
+        if path is None:
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == parser_version():
+            for text, html, images, links, block_text in data["entries"]:
+                self.put(text, (html, images, links, block_text))
+
+    def __getstate__(self) -> dict:
+        state = dict(self.__dict__)
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def render(self, block_type: str, lines: list[str]) -> tuple[str, list[str], list[str], str]:
+        """
+            Returns the HTML of a block, the image URLs and link targets it
+            references and its text, rendering the block only if it is not cached
+        """
+        text = "\n".join(lines)
+        with self.lock:
+            entry = self.entries.get(text)
+            if entry is not None:
+                self.entries.move_to_end(text)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        node = block_markdown.block_lines_to_html_node(block_type, lines)
+        chunks = []
+        node.render_to(chunks.append)
+        entry = (
+            "".join(chunks),
+            block_markdown.html_node_images(node),
+            block_markdown.html_node_links(node),
+            block_markdown.html_node_text(node)
+        )
+        self.put(text, entry)
+        if self.added is not None:
+            with self.lock:
+                self.added.append(text)
+        return entry
+
+    def put(self, text: str, entry: tuple[str, list[str], list[str], str]) -> None:
+        """
+            Caches a block's HTML, images, links and text, evicting the least recently used
+            blocks while the cache is over max_bytes
+        """
+        size = _block_entry_size(text, entry)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(text, None)
+            if previous is not None:
+                self.size -= _block_entry_size(text, previous)
+            self.entries[text] = entry
+            self.size += size
+            while self.size > self.max_bytes:
+                evicted_text, evicted = self.entries.popitem(last=False)
+                self.size -= _block_entry_size(evicted_text, evicted)
+
+    def track_changes(self) -> None:
+        """
+            Starts counting hits and misses from zero and recording the blocks
+            rendered, for take_changes
+        """
+        with self.lock:
+            self.added = []
+            self.hits = self.misses = 0
+
+    def take_changes(self) -> tuple[list, int, int]:
+        """
+            Returns the blocks rendered and still cached, and the hits and misses
+            counted, since tracking started or the last call
+        """
+        with self.lock:
+            added = [(text, self.entries[text]) for text in self.added if text in self.entries]
+            changes = added, self.hits, self.misses
+            self.added = []
+            self.hits = self.misses = 0
+        return changes
+
+    def merge(self, changes: tuple[list, int, int]) -> None:
+        """
+            Adds the blocks and counters taken from another copy of the cache
+        """
+        added, hits, misses = changes
+        for text, entry in added:
+            self.put(text, entry)
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+
+    def save(self) -> None:
+        """
+            Atomically writes the cache to its file, if it has one
+        """
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self.lock:
+            entries = [[text, *entry] for text, entry in self.entries.items()]
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": parser_version(), "entries": entries}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        """
+            Deletes every cached block, and the cache's file if it has one
+        """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _block_entry_size(text: str, entry: tuple[str, list[str], list[str], str]) -> int:
+    """
+        Returns the approximate size of a block cache entry in characters
+    """
+    html, images, links, block_text = entry
+    return (
+        len(text) + len(html) + len(block_text) + sum(len(src) for src in images) + sum(len(href) for href in links)
+    )
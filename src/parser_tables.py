@@ -0,0 +1,19 @@
+import re
+
+# Inline markdown
+IMAGE_PATTERN = re.compile(r"!\[(.*?)\]\((.*?)\)")
+LINK_PATTERN = re.compile(r"\[(.*?)\]\((.*?)\)")
+INLINE_DELIMITER_PATTERN = re.compile(r"\*\*|\*|`")
+
+# Block markdown
+HEADING_PATTERN = re.compile(r"#{1,6} ")
+CODE_FENCE = "```"
+QUOTE_PREFIX = "> "
+UNORDERED_LIST_PREFIXES = ("* ", "- ")
+# The "N. " prefixes of the first ordered list items, formatted once at import
+# and never changed, so threads parsing pages can share them
+ORDERED_LIST_PREFIXES = tuple(f"{number}. " for number in range(1, 1001))
+
+# Search terms
+TERM_PATTERN = re.compile(r"\w+")
+MAX_TERM_LENGTH = 32
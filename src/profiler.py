@@ -0,0 +1,280 @@
+import sys
+import json
+import time
+import logging
+import tracemalloc
+from contextlib import contextmanager
+
+import block_markdown
+import generate_page
+import incremental
+import template
+from config import DEFAULT_TOP_PAGES
+
+OTHER_PHASE = "other"
+
+
+class Profiler:
+    """
+        Records the wall and CPU time spent in each build phase, per page and in
+        total, along with the memory blocks each page leaves allocated and, with
+        trace_memory (which slows the build down a lot), its peak allocation.
+
+        Phases nest and are timed exclusively: while a phase runs inside another
+        (e.g. inline parsing during HTML rendering), only the inner phase is
+        charged. Time outside any phase is charged to "other". instrument()
+        wraps the parser, renderer and writer functions so a build can be
+        profiled without changing them; the build must run serially.
+    """
+    def __init__(self, trace_memory: bool = False) -> None:
+        self.trace_memory = trace_memory
+        self.phases = {}
+        self.pages = []
+        self.events = []
+        self.stack = []
+        self.page = None
+        self.started = time.perf_counter()
+        self.started_cpu = time.process_time()
+        self.mark = (self.started, self.started_cpu)
+
+    def charge(self, name: str, now: tuple[float, float]) -> None:
+        """
+            Charges the time since the last phase change to a phase
+        """
+        wall = now[0] - self.mark[0]
+        cpu = now[1] - self.mark[1]
+        totals = self.phases.setdefault(name, [0.0, 0.0, 0])
+        totals[0] += wall
+        totals[1] += cpu
+        if self.page is not None:
+            self.page["phases"][name] = self.page["phases"].get(name, 0.0) + wall
+        self.mark = now
+
+    def enter(self, name: str) -> None:
+        now = (time.perf_counter(), time.process_time())
+        self.charge(self.stack[-1][0] if self.stack else OTHER_PHASE, now)
+        self.stack.append((name, now[0]))
+
+    def exit(self) -> None:
+        now = (time.perf_counter(), time.process_time())
+        name, started = self.stack.pop()
+        self.charge(name, now)
+        self.phases[name][2] += 1
+        if not self.stack and self.page is None:
+            self.trace_event(name, started, now[0])
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+            Times the body of a with statement as a phase
+        """
+        self.enter(name)
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def wrap(self, name: str, func):
+        """
+            Returns func timed as a phase
+        """
+        def timed(*args, **kwargs):
+            self.enter(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.exit()
+        return timed
+
+    def wrap_iterator(self, name: str, func):
+        """
+            Returns a generator function timed as a phase each time it is advanced
+        """
+        def timed(*args, **kwargs):
+            iterator = iter(func(*args, **kwargs))
+            while True:
+                self.enter(name)
+                try:
+                    item = next(iterator, StopIteration)
+                finally:
+                    self.exit()
+                if item is StopIteration:
+                    return
+                yield item
+        return timed
+
+    def wrap_page(self, func):
+        """
+            Returns a page generating function that records each page's timings
+            and allocations
+        """
+        def timed(from_path, template_path, dest_path, *args, **kwargs):
+            self.begin_page(str(dest_path))
+            try:
+                return func(from_path, template_path, dest_path, *args, **kwargs)
+            finally:
+                self.end_page()
+        return timed
+
+    def wrap_write_atomically(self, func):
+        """
+            Returns write_atomically with file operations and every write timed
+            as the write phase
+        """
+        def timed(dest_path, render):
+            return func(dest_path, lambda write: render(self.wrap_write(write)))
+        return self.wrap("write", timed)
+
+    def wrap_write(self, write):
+        """
+            Returns a write callable whose calls are charged to the write phase.
+            Writes are small and very frequent, so they are timed with the wall
+            clock alone and their CPU time is taken to equal their wall time.
+        """
+        def timed(chunk):
+            started = time.perf_counter()
+            write(chunk)
+            elapsed = time.perf_counter() - started
+            totals = self.phases.setdefault("write", [0.0, 0.0, 0])
+            totals[0] += elapsed
+            totals[1] += elapsed
+            totals[2] += 1
+            if self.page is not None:
+                self.page["phases"]["write"] = self.page["phases"].get("write", 0.0) + elapsed
+            self.mark = (self.mark[0] + elapsed, self.mark[1] + elapsed)
+        return timed
+
+    def begin_page(self, dest_path: str) -> None:
+        now = (time.perf_counter(), time.process_time())
+        self.charge(self.stack[-1][0] if self.stack else OTHER_PHASE, now)
+        self.page = {
+            "path": dest_path,
+            "started": now,
+            "phases": {},
+            "blocks": sys.getallocatedblocks(),
+        }
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            self.page["traced"] = tracemalloc.get_traced_memory()[0]
+
+    def end_page(self) -> None:
+        now = (time.perf_counter(), time.process_time())
+        self.charge(self.stack[-1][0] if self.stack else OTHER_PHASE, now)
+        page = self.page
+        self.page = None
+        record = {
+            "path": page["path"],
+            "wall": now[0] - page["started"][0],
+            "cpu": now[1] - page["started"][1],
+            "net_blocks": sys.getallocatedblocks() - page["blocks"],
+            "phases": page["phases"],
+        }
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            record["peak_bytes"] = peak - page["traced"]
+            record["net_bytes"] = current - page["traced"]
+        self.pages.append(record)
+        self.trace_event(record["path"], page["started"][0], now[0], {
+            name: round(seconds * 1000, 3) for name, seconds in page["phases"].items()
+        })
+
+    def trace_event(self, name: str, started: float, ended: float, args: None | dict = None) -> None:
+        """
+            Records a complete event for the Chrome trace
+        """
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": round((started - self.started) * 1e6, 1),
+            "dur": round((ended - started) * 1e6, 1),
+            "pid": 1,
+            "tid": 1,
+        }
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    @contextmanager
+    def instrument(self):
+        """
+            Wraps the build's phase functions for the duration of a with
+            statement, tracing allocations if trace_memory is set
+        """
+        patches = [
+            (incremental, "discover_pages", self.wrap("discovery", incremental.discover_pages)),
+            (generate_page, "generate_page", self.wrap_page(generate_page.generate_page)),
+            (generate_page, "render_cached_page", self.wrap_page(generate_page.render_cached_page)),
+            (generate_page, "extract_title", self.wrap("metadata", generate_page.extract_title)),
+            (generate_page, "extract_description", self.wrap("metadata", generate_page.extract_description)),
+            (generate_page, "iter_blocks", self.wrap_iterator("block split", generate_page.iter_blocks)),
+            (block_markdown, "iter_blocks", self.wrap_iterator("block split", block_markdown.iter_blocks)),
+            (generate_page, "text_to_textnodes", self.wrap("inline parse", generate_page.text_to_textnodes)),
+            (block_markdown, "text_to_textnodes", self.wrap("inline parse", block_markdown.text_to_textnodes)),
+            (generate_page, "render_markdown_to", self.wrap("HTML render", generate_page.render_markdown_to)),
+            (template.Template, "render_to", self.wrap("template", template.Template.render_to)),
+            (generate_page, "write_atomically", self.wrap_write_atomically(generate_page.write_atomically)),
+        ]
+        originals = [(owner, name, owner.__dict__[name]) for owner, name, _ in patches]
+        for owner, name, wrapped in patches:
+            setattr(owner, name, wrapped)
+        tracing = not self.trace_memory or tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        try:
+            yield self
+        finally:
+            if not tracing:
+                tracemalloc.stop()
+            for owner, name, original in originals:
+                setattr(owner, name, original)
+
+    def report(self, top: int = DEFAULT_TOP_PAGES) -> dict:
+        """
+            Returns the profile as a JSON-serialisable dict
+        """
+        now = (time.perf_counter(), time.process_time())
+        self.charge(OTHER_PHASE, now)
+        pages = sorted(self.pages, key=lambda page: page["wall"], reverse=True)
+        return {
+            "wall_seconds": now[0] - self.started,
+            "cpu_seconds": now[1] - self.started_cpu,
+            "phases": {
+                name: {"wall_seconds": wall, "cpu_seconds": cpu, "calls": calls}
+                for name, (wall, cpu, calls) in sorted(self.phases.items(), key=lambda item: -item[1][0])
+            },
+            "page_count": len(pages),
+            "slowest_pages": [page["path"] for page in pages[:top]],
+            "pages": pages,
+        }
+
+    def write_trace(self, path: str) -> None:
+        """
+            Writes the build's phases and pages as a Chrome trace-event file,
+            viewable in chrome://tracing or Perfetto
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+
+def log_profile(report: dict, top: int = DEFAULT_TOP_PAGES) -> None:
+    """
+        Logs the time spent in each phase and the slowest pages
+    """
+    logging.info("Profile: %.3f s wall, %.3f s CPU", report["wall_seconds"], report["cpu_seconds"])
+    for name, phase in report["phases"].items():
+        logging.info(
+            "  %-14s %9.3f s wall %9.3f s CPU %9d calls",
+            name, phase["wall_seconds"], phase["cpu_seconds"], phase["calls"]
+        )
+    logging.info("Slowest %d of %d pages:", min(top, report["page_count"]), report["page_count"])
+    for page in report["pages"][:top]:
+        peak = f"{page['peak_bytes']:>10d} peak bytes" if "peak_bytes" in page else ""
+        logging.info("  %8.2f ms %8d blocks %s  %s", page["wall"] * 1000, page["net_blocks"], peak, page["path"])
+
+
+def write_report(path: str, report: dict) -> None:
+    """
+        Writes a profile report to a JSON file
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
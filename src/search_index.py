@@ -0,0 +1,195 @@
+import os
+import json
+import zlib
+import logging
+
+from generate_page import page_url
+
+SEARCH_INDEX_VERSION = 2
+SHARD_COUNT = 64
+STALE_REASON = "not in search index"
+
+
+def shard_name(term: str) -> str:
+    """
+        Returns the name of the shard file holding a term's postings: the CRC-32
+        of its UTF-8 encoding modulo SHARD_COUNT, in hex
+    """
+    return f"{zlib.crc32(term.encode('utf-8')) % SHARD_COUNT:02x}.json"
+
+
+class SearchIndex:
+    """
+        Inverted index of the site's pages, written to the output directory as
+        pages.json, which lists each page id's URL and title, and SHARD_COUNT
+        JSON shards (see shard_name) mapping each term to its postings, [page
+        id, position, ...] lists ordered by page id.
+
+        Pages are not parsed for the index: the positions of their terms are
+        collected while they are rendered (see use_search_terms) and taken from
+        their records. The terms each page contributed are kept in a state file,
+        so an update only rewrites the shards holding the old or new terms of
+        the pages whose markdown or URL changed. Page ids stay the same across
+        updates; ids of deleted pages are not reused.
+    """
+    def __init__(self, state_path: str, dir_path: str) -> None:
+        self.state_path = state_path
+        self.dir_path = dir_path
+        self.pages = {}
+        self.next_id = 0
+        self.loaded = False
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != SEARCH_INDEX_VERSION:
+            return
+        if not os.path.exists(os.path.join(dir_path, "pages.json")):
+            # The output directory was rebuilt, so the index starts over
+            return
+        self.pages = data["pages"]
+        self.next_id = data["next_id"]
+        self.loaded = True
+
+    def stale_pages(self, pages: dict) -> dict[str, str]:
+        """
+            Returns the manifest's pages that are not indexed as they were last
+            built, such as every page when the index starts over, mapped to the
+            reason generate_pages_incremental gives for rendering them again
+        """
+        return {
+            from_path: STALE_REASON for from_path, entry in pages.items()
+            if self.pages.get(from_path, {}).get("hash") != entry.get("hash")
+        }
+
+    def update(self, pages: dict, records: dict, dest_dir_path: str) -> dict:
+        """
+            Brings the index up to date with the manifest's page entries, given
+            the records of the pages generated since the last update, and
+            returns a report of the pages indexed and removed and the shards
+            written
+        """
+        removed = [from_path for from_path in self.pages if from_path not in pages]
+        deletions = {}
+        additions = {}
+        for from_path in removed:
+            entry = self.pages.pop(from_path)
+            for term in entry["terms"]:
+                deletions.setdefault(shard_name(term), {}).setdefault(term, set()).add(entry["id"])
+        indexed = 0
+        for from_path, record in records.items():
+            page = pages.get(from_path)
+            if page is None or record is None or "terms" not in record:
+                continue
+            url = page_url(page["dest"], dest_dir_path)
+            entry = self.pages.get(from_path)
+            if entry is not None and entry["hash"] == page["hash"] and entry["url"] == url:
+                continue
+            indexed += 1
+            if entry is None:
+                entry = self.pages[from_path] = {"id": self.next_id}
+                self.next_id += 1
+            for term in entry.get("terms", ()):
+                deletions.setdefault(shard_name(term), {}).setdefault(term, set()).add(entry["id"])
+            positions = record["terms"]
+            for term, term_positions in positions.items():
+                additions.setdefault(shard_name(term), {}).setdefault(term, []).append([entry["id"], *term_positions])
+            entry.update({
+                "hash": page["hash"],
+                "url": url,
+                "title": record["title"],
+                "terms": sorted(positions),
+            })
+
+        if not self.loaded:
+            # Shards left by an index whose state was lost would hold stale postings
+            self.remove_shards()
+            self.loaded = True
+        os.makedirs(self.dir_path, exist_ok=True)
+        shards = deletions.keys() | additions.keys()
+        for name in shards:
+            self.update_shard(name, deletions.get(name, {}), additions.get(name, {}))
+        if indexed or removed or not os.path.exists(os.path.join(self.dir_path, "pages.json")):
+            self.write_pages()
+        return {"pages": len(self.pages), "indexed": indexed, "removed": len(removed), "shards": len(shards)}
+
+    def update_shard(self, name: str, deletions: dict[str, set], additions: dict[str, list]) -> None:
+        """
+            Removes the postings of the given page ids from a shard's terms and
+            adds new postings, deleting the shard once it holds no terms
+        """
+        path = os.path.join(self.dir_path, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                shard = json.load(f)
+        except FileNotFoundError:
+            shard = {}
+        for term, ids in deletions.items():
+            postings = [posting for posting in shard.get(term, ()) if posting[0] not in ids]
+            if postings:
+                shard[term] = postings
+            else:
+                shard.pop(term, None)
+        for term, postings in additions.items():
+            merged = shard.get(term, []) + postings
+            # A page has one posting per term, so postings sort by page id
+            merged.sort()
+            shard[term] = merged
+        if not shard:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        _write_json(path, shard)
+
+    def remove_shards(self) -> None:
+        """
+            Deletes every file in the index directory
+        """
+        if not os.path.isdir(self.dir_path):
+            return
+        with os.scandir(self.dir_path) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    os.remove(entry.path)
+
+    def write_pages(self) -> None:
+        """
+            Writes the URL and title of every page id, null for deleted pages
+        """
+        pages = [None] * self.next_id
+        for entry in self.pages.values():
+            pages[entry["id"]] = [entry["url"], entry["title"]]
+        _write_json(os.path.join(self.dir_path, "pages.json"), {
+            "version": SEARCH_INDEX_VERSION,
+            "shards": SHARD_COUNT,
+            "pages": pages,
+        })
+
+    def save(self) -> None:
+        """
+            Atomically writes the state that later updates start from
+        """
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        _write_json(self.state_path, {"version": SEARCH_INDEX_VERSION, "next_id": self.next_id, "pages": self.pages})
+
+
+def _write_json(path: str, data) -> None:
+    """
+        Atomically writes compact JSON to a file
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        # json.dumps uses the C encoder, which json.dump does not
+        f.write(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+    os.replace(tmp_path, path)
+
+
+def log_search_report(report: dict) -> None:
+    """
+        Logs how many pages the search index update indexed and removed
+    """
+    logging.info(
+        "Search index: %d of %d page(s) indexed, %d removed, %d shard(s) written",
+        report["indexed"], report["pages"], report["removed"], report["shards"]
+    )
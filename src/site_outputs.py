@@ -0,0 +1,169 @@
+import os
+import json
+import html
+import time
+import heapq
+import logging
+import email.utils
+
+from generate_page import page_url, write_atomically
+from incremental import resolve_asset
+
+SITEMAP_NAME = "sitemap.xml"
+FEED_NAME = "feed.xml"
+FEED_ITEMS = 20
+LINK_GRAPH_VERSION = 1
+MAX_LOGGED_BROKEN_LINKS = 20
+
+
+def site_pages(pages: dict, dest_dir_path: str) -> list[tuple[str, float, dict]]:
+    """
+        Returns the URL, source modification time and entry of each recorded
+        page that has been rendered, sorted by URL
+    """
+    return sorted(
+        (page_url(entry["dest"], dest_dir_path), entry["signature"][0] / 1e9, entry)
+        for entry in pages.values() if "title" in entry
+    )
+
+
+def w3c_date(timestamp: float) -> str:
+    """
+        Returns a timestamp in the W3C datetime format used by sitemaps
+    """
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+def write_sitemap(path: str, site_url: str, pages: list[tuple[str, float, dict]]) -> None:
+    """
+        Writes a sitemap listing every page with its last modification time
+    """
+    def render(write) -> None:
+        write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for url, modified, _ in pages:
+            write(f"<url><loc>{html.escape(site_url + url)}</loc><lastmod>{w3c_date(modified)}</lastmod></url>\n")
+        write("</urlset>\n")
+    write_atomically(path, render)
+
+
+def write_feed(path: str, site_url: str, pages: list[tuple[str, float, dict]]) -> None:
+    """
+        Writes an RSS feed of the FEED_ITEMS most recently modified pages. The
+        channel takes its title and description from the home page.
+    """
+    home = next((entry for url, _, entry in pages if url == "/"), {})
+    recent = heapq.nlargest(FEED_ITEMS, pages, key=lambda page: page[1])
+
+    def render(write) -> None:
+        write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        write('<rss version="2.0"><channel>\n')
+        write(f"<title>{html.escape(home.get('title', site_url))}</title>\n")
+        write(f"<link>{html.escape(site_url)}/</link>\n")
+        # Descriptions are recorded already escaped for HTML attributes
+        write(f"<description>{home.get('description', '')}</description>\n")
+        if recent:
+            write(f"<lastBuildDate>{email.utils.formatdate(recent[0][1], usegmt=True)}</lastBuildDate>\n")
+        for url, modified, entry in recent:
+            link = html.escape(site_url + url)
+            write(
+                f"<item><title>{html.escape(entry['title'])}</title><link>{link}</link>"
+                f"<guid>{link}</guid><description>{entry.get('description', '')}</description>"
+                f"<pubDate>{email.utils.formatdate(modified, usegmt=True)}</pubDate></item>\n"
+            )
+        write("</channel></rss>\n")
+    write_atomically(path, render)
+
+
+def link_target_page(target: str, urls: set) -> None | str:
+    """
+        Returns the URL of the page a site path links to, accepting links to a
+        directory without its trailing slash or with its index.html, or None
+        if no page has that URL
+    """
+    if target in urls:
+        return target
+    if target.endswith("/index.html"):
+        target = target[:-len("index.html")]
+    elif not target.endswith("/"):
+        target += "/"
+    return target if target in urls else None
+
+
+def link_graph(pages: list[tuple[str, float, dict]], dir_path_static: None | str) -> tuple[dict, dict]:
+    """
+        Returns the internal link graph, mapping each page's URL to the URLs of
+        the pages it links to, and the links of each page that point to
+        neither a page nor a static file. Each distinct target is looked up
+        once, so checking takes time proportional to the pages and links.
+    """
+    urls = {url for url, _, _ in pages}
+    generated = {"/" + SITEMAP_NAME, "/" + FEED_NAME}
+    resolved = {}
+    graph = {}
+    broken = {}
+    for url, _, entry in pages:
+        linked = set()
+        for target in entry.get("links", ()):
+            if target not in resolved:
+                page = link_target_page(target, urls)
+                if page is None and (target in generated or resolve_asset(target, "/", dir_path_static)):
+                    page = ""
+                resolved[target] = page
+            page = resolved[target]
+            if page is None:
+                broken.setdefault(url, []).append(target)
+            elif page:
+                linked.add(page)
+        graph[url] = sorted(linked)
+    return graph, broken
+
+
+def write_site_outputs(
+        pages: dict,
+        dest_dir_path: str,
+        dir_path_static: None | str = None,
+        site_url: None | str = None,
+        graph_path: None | str = None
+    ) -> dict:
+    """
+        Writes the outputs derived from the pages' recorded titles, descriptions
+        and links, given entries shaped like the manifest's: with a site URL, a
+        sitemap and feed in the output directory, and with a graph path, the
+        internal link graph and the broken links found. Nothing is read back
+        from the output directory, so incremental builds only need the entries
+        of their changed pages updated. Returns a report of what was written.
+    """
+    entries = site_pages(pages, dest_dir_path)
+    report = {"pages": len(entries), "links": None, "broken": None}
+    if site_url is not None:
+        site_url = site_url.rstrip("/")
+        write_sitemap(os.path.join(dest_dir_path, SITEMAP_NAME), site_url, entries)
+        write_feed(os.path.join(dest_dir_path, FEED_NAME), site_url, entries)
+    if graph_path is not None:
+        graph, broken = link_graph(entries, dir_path_static)
+        backlinks = {}
+        for url, linked in graph.items():
+            for target in linked:
+                backlinks.setdefault(target, []).append(url)
+        data = {"version": LINK_GRAPH_VERSION, "links": graph, "backlinks": backlinks, "broken": broken}
+        # json.dumps uses the C encoder, which json.dump does not
+        write_atomically(graph_path, lambda write: write(json.dumps(data, separators=(",", ":"))))
+        report["links"] = sum(len(linked) for linked in graph.values())
+        report["broken"] = broken
+    return report
+
+
+def log_site_report(report: dict) -> None:
+    """
+        Logs the pages in the sitemap and the broken links found
+    """
+    logging.info("Site outputs: %d page(s)", report["pages"])
+    if report["broken"] is None:
+        return
+    broken = [(url, target) for url, targets in sorted(report["broken"].items()) for target in targets]
+    logging.info("Link graph: %d internal link(s), %d broken", report["links"], len(broken))
+    for url, target in broken[:MAX_LOGGED_BROKEN_LINKS]:
+        logging.warning("Broken link on %s: %s", url, target)
+    if len(broken) > MAX_LOGGED_BROKEN_LINKS:
+        logging.warning("... and %d more broken link(s)", len(broken) - MAX_LOGGED_BROKEN_LINKS)
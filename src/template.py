@@ -0,0 +1,78 @@
+import os
+import re
+
+SLOT_PATTERN = re.compile(r"{{\s*(\w+)\s*}}")
+ASSET_URL_PATTERN = re.compile(r"<(?:link|script|img)\b[^>]*?\b(?:href|src)=[\"']([^\"']+)[\"']")
+
+_template_cache = {}
+
+
+class Template:
+    """
+        A page template compiled into literal segments and named slots.
+
+        `{{ Name }}` placeholders become slots; rendering joins the literals with
+        the slot values without rescanning the template text. URLs referenced by
+        link, script and img tags are recorded in asset_urls.
+    """
+    def __init__(self, source: str) -> None:
+        self.literals = []
+        self.slots = []
+        position = 0
+        for match in SLOT_PATTERN.finditer(source):
+            self.literals.append(source[position:match.start()])
+            self.slots.append((match.group(1), match.group(0)))
+            position = match.end()
+        self.literals.append(source[position:])
+        self.asset_urls = [
+            url for literal in self.literals for url in ASSET_URL_PATTERN.findall(literal)
+        ]
+
+    @property
+    def slot_names(self) -> set:
+        """
+            Returns the names of all slots in the template
+        """
+        return {name for name, _ in self.slots}
+
+    def render(self, values: dict) -> str:
+        """
+            Renders the template, leaving slots without a value untouched
+        """
+        parts = []
+        self.render_to(parts.append, values)
+        return "".join(parts)
+
+    def render_to(self, write, values: dict) -> None:
+        """
+            Streams the rendered template to a write callable. A slot value may be
+            a string or a callable that streams its own output to write.
+        """
+        literals = self.literals
+        write(literals[0])
+        for i, (name, placeholder) in enumerate(self.slots):
+            value = values.get(name, placeholder)
+            if callable(value):
+                value(write)
+            else:
+                write(value)
+            write(literals[i + 1])
+
+    def __repr__(self) -> str:
+        return f"Template({[name for name, _ in self.slots]})"
+
+
+def load_template(template_path: str) -> Template:
+    """
+        Loads and compiles a template, reusing the compiled template until the
+        file's mtime or size changes
+    """
+    stat = os.stat(template_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _template_cache.get(template_path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    with open(template_path, "r", encoding="utf-8") as f:
+        template = Template(f.read())
+    _template_cache[template_path] = (signature, template)
+    return template
@@ -1,6 +1,12 @@
+import io
 import unittest
 
+from page_cache import BlockCache
+
 from block_markdown import (
+    iter_blocks,
+    iter_lines,
+    render_markdown_to,
     markdown_to_blocks,
     block_to_block_type,
     markdown_to_html_node,
@@ -10,6 +16,8 @@ from block_markdown import (
     block_type_quote,
     block_type_unordered_list,
     block_type_ordered_list,
+    term_positions,
+    tokenize,
 )
 
 class TestBlockMarkdown(unittest.TestCase):
@@ -103,6 +111,16 @@ This is the same paragraph on a new line
             actual = test_case["block"]
             self.assertEqual(actual, test_case["expected"])
 
+    def test_long_ordered_list(self):
+        """
+            Test that ordered lists longer than the prefix table are still numbered in order
+        """
+        lines = [f"{n}. item" for n in range(1, 1201)]
+        self.assertEqual(block_to_block_type("\n".join(lines)), block_type_ordered_list)
+        for broken in (500, 1100):
+            wrong = lines[:broken] + ["0. item"] + lines[broken + 1:]
+            self.assertEqual(block_to_block_type("\n".join(wrong)), block_type_paragraph)
+
 
     def test_markdown_to_html_node(self):
         """
@@ -138,5 +156,62 @@ This is another paragraph
             actual = markdown_to_html_node(test_case["document"])
             self.assertEqual(actual.to_html(), test_case["expected"])
 
+    def test_iter_blocks(self):
+        """
+            Test iter_blocks reading from a file object
+        """
+        document = io.StringIO("  # Heading  \n\n\n* one\n- two\n\n```\ncode\n```\n")
+        self.assertEqual(
+            list(iter_blocks(iter_lines(document))),
+            [
+                (block_type_heading, ["# Heading"]),
+                (block_type_unordered_list, ["* one", "- two"]),
+                (block_type_code, ["```", "code", "```"]),
+            ],
+        )
+
+    def test_render_markdown_to(self):
+        """
+            Test render_markdown_to matches markdown_to_html_node
+        """
+        document = "# Title\n\nSome **bold** text\n\n> a quote\n> continued\n"
+        chunks = []
+        render_markdown_to(iter_lines(io.StringIO(document)), chunks.append)
+        self.assertEqual("".join(chunks), markdown_to_html_node(document).to_html())
+
+    def test_render_markdown_to_block_cache(self):
+        """
+            Test that rendering through a block cache gives the same html, images and links
+        """
+        document = "# Title\n\n![logo](/logo.png)\n\n* [one](/one/)\n* two\n\n![logo](/logo.png)\n"
+        chunks = []
+        images = []
+        links = []
+        cache = BlockCache()
+        texts = []
+        render_markdown_to(iter_lines(io.StringIO(document)), chunks.append, images, cache, links, texts)
+        self.assertEqual("".join(chunks), markdown_to_html_node(document).to_html())
+        self.assertEqual(images, ["/logo.png", "/logo.png"])
+        self.assertEqual(links, ["/one/"])
+        self.assertEqual(texts, ["Title", "logo", "one\ntwo", "logo"])
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        uncached = []
+        render_markdown_to(iter_lines(io.StringIO(document)), [].append, texts=uncached)
+        self.assertEqual(uncached, texts)
+
+    def test_term_positions(self):
+        """
+            Test that terms come from the rendered text, with image alt text and without URLs
+        """
+        document = "# Blog\n\nA post about home cooking\n\n![Cooking pot](/pot.png)"
+        texts = []
+        render_markdown_to(iter_lines(io.StringIO(document)), [].append, texts=texts)
+        positions = term_positions(texts)
+        self.assertEqual(positions["home"], [4])
+        self.assertEqual(positions["cooking"], [5, 6])
+        self.assertNotIn("png", positions)
+        self.assertEqual(tokenize("Hello, World! it's 2024"), ["hello", "world", "it", "s", "2024"])
+
+
 if __name__ == "__main__":
     unittest.main()
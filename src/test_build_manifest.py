@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from build_manifest import BuildManifest
+
+
+class TestBuildManifest(unittest.TestCase):
+    """
+        Test Build Manifest Case
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "index.md")
+        self.dest = os.path.join(self.tmp.name, "index.html")
+        self.manifest_path = os.path.join(self.tmp.name, "manifest.json")
+        with open(self.source, "w", encoding="utf-8") as f:
+            f.write("# Title")
+        with open(self.dest, "w", encoding="utf-8") as f:
+            f.write("<h1>Title</h1>")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_page_changed(self):
+        """
+            Test that a page is only reported as changed when its content changes
+        """
+        manifest = BuildManifest(self.manifest_path)
+        self.assertEqual(manifest.page_changed(self.source, self.dest), ["new page"])
+        manifest.save()
+
+        manifest = BuildManifest.load(self.manifest_path)
+        self.assertFalse(manifest.page_changed(self.source, self.dest))
+
+        os.utime(self.source, ns=(0, 0))
+        self.assertFalse(manifest.page_changed(self.source, self.dest))
+
+        with open(self.source, "w", encoding="utf-8") as f:
+            f.write("# Other")
+        self.assertEqual(manifest.page_changed(self.source, self.dest), ["markdown changed"])
+
+        os.remove(self.dest)
+        self.assertEqual(manifest.page_changed(self.source, self.dest), ["output missing"])
+
+    def test_remove_stale_assets(self):
+        """
+            Test that copies of deleted assets are removed
+        """
+        manifest = BuildManifest(self.manifest_path)
+        manifest.record_asset("index.md", [0, 7])
+        self.assertEqual(manifest.remove_stale_assets({"index.md"}, self.tmp.name), [])
+        self.assertEqual(manifest.remove_stale_assets(set(), self.tmp.name), [self.source])
+        self.assertFalse(os.path.exists(self.source))
+        self.assertEqual(manifest.assets, {})
+
+    def test_remove_stale_pages(self):
+        """
+            Test that outputs of deleted sources are removed
+        """
+        manifest = BuildManifest(self.manifest_path)
+        manifest.page_changed(self.source, self.dest)
+        self.assertEqual(manifest.remove_stale_pages({self.source}), [])
+        self.assertEqual(manifest.remove_stale_pages(set()), [self.dest])
+        self.assertFalse(os.path.exists(self.dest))
+        self.assertEqual(manifest.pages, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
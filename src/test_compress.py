@@ -0,0 +1,58 @@
+import os
+import gzip
+import tempfile
+import unittest
+
+from compress import compress_tree
+
+
+class TestCompress(unittest.TestCase):
+    """
+        Test Compress Case
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.public = self.tmp.name
+        os.makedirs(os.path.join(self.public, "blog"))
+        self.write("index.html", "<p>hello</p>" * 100)
+        self.write("blog/index.html", "<p>post</p>" * 100)
+        self.write("tiny.css", "body {}")
+        self.write("image.png", "png" * 200)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        with open(os.path.join(self.public, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def test_compress_tree(self):
+        """
+            Test that text files get gzip siblings and the savings are reported
+        """
+        report = compress_tree(self.public)
+        self.assertEqual((report["files"], report["compressed"]), (2, 2))
+        self.assertLess(report["encoded_bytes"]["gzip"], report["bytes"])
+        with gzip.open(os.path.join(self.public, "index.html.gz"), "rt", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "<p>hello</p>" * 100)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "tiny.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "image.png.gz")))
+
+    def test_compress_tree_only_changed_files(self):
+        """
+            Test that only changed files are recompressed and stale siblings are removed
+        """
+        compress_tree(self.public)
+        self.write("index.html", "<p>edited</p>" * 100)
+        report = compress_tree(self.public)
+        self.assertEqual((report["files"], report["compressed"]), (2, 1))
+        with gzip.open(os.path.join(self.public, "index.html.gz"), "rt", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "<p>edited</p>" * 100)
+
+        os.remove(os.path.join(self.public, "blog", "index.html"))
+        self.assertEqual(compress_tree(self.public)["compressed"], 0)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog", "index.html.gz")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import json
+import tempfile
+import unittest
+
+from config import ConfigError, SitePaths, check_config, load_config
+
+
+class TestConfig(unittest.TestCase):
+    """
+        Test Config Case
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "site.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, data):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    def test_load_config(self):
+        """
+            Test that option names are normalised and paths resolved against the file
+        """
+        self.write({"io-workers": 4, "output": "shard-1", "cache-dir": "/var/cache/site", "compress": True})
+        self.assertEqual(load_config(self.path), {
+            "io_workers": 4,
+            "output": os.path.join(self.tmp.name, "shard-1"),
+            "cache_dir": "/var/cache/site",
+            "compress": True,
+        })
+
+    def test_load_config_invalid(self):
+        """
+            Test that unreadable files and non-object JSON are rejected
+        """
+        with self.assertRaises(ConfigError):
+            load_config(os.path.join(self.tmp.name, "missing.json"))
+        self.write([1, 2])
+        with self.assertRaises(ConfigError):
+            load_config(self.path)
+
+    def test_check_config(self):
+        """
+            Test that unknown settings and values of the wrong type are rejected
+        """
+        defaults = {"jobs": 1, "compress": False, "profile": None}
+        check_config({"jobs": 4, "compress": True, "profile": "report.json"}, defaults)
+        for config in ({"bogus": 1}, {"jobs": "4"}, {"jobs": True}, {"compress": 1}, {"profile": 3}):
+            with self.assertRaises(ConfigError):
+                check_config(config, defaults)
+
+    def test_site_paths(self):
+        """
+            Test that the manifest and page cache live in the cache directory
+        """
+        paths = SitePaths(public="out", cache="shard-cache")
+        self.assertEqual(paths.manifest, os.path.join("shard-cache", "manifest.json"))
+        self.assertEqual(paths.page_cache, os.path.join("shard-cache", "pages"))
+        self.assertEqual(paths.content, "./content")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import copy_static
+from build_manifest import BuildManifest
+from copy_static import SYNC_MODE_HARDLINK, SYNC_MODE_REFLINK, sync_files
+
+
+class TestCopyStatic(unittest.TestCase):
+    """
+        Test Copy Static Case
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, "manifest.json"))
+        os.makedirs(os.path.join(self.static, "images"))
+        self.write("index.css", "body {}")
+        self.write("images/a.png", "png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        with open(os.path.join(self.static, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def read(self, name):
+        with open(os.path.join(self.public, name), encoding="utf-8") as f:
+            return f.read()
+
+    def test_sync_files(self):
+        """
+            Test that only changed files are copied and deleted files are removed
+        """
+        self.assertEqual(sync_files(self.static, self.public, self.manifest), 2)
+        self.assertEqual(self.read("images/a.png"), "png")
+        with mock.patch.object(copy_static, "sync_file") as sync_file:
+            self.assertEqual(sync_files(self.static, self.public, self.manifest), 0)
+        sync_file.assert_not_called()
+
+        self.write("index.css", "body { color: red; }")
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        self.assertEqual(sync_files(self.static, self.public, self.manifest), 1)
+        self.assertEqual(self.read("index.css"), "body { color: red; }")
+        self.assertFalse(os.path.exists(os.path.join(self.public, "images", "a.png")))
+
+    def test_sync_files_checksum(self):
+        """
+            Test that checksum mode ignores modification time changes
+        """
+        sync_files(self.static, self.public, self.manifest)
+        os.utime(os.path.join(self.static, "index.css"), ns=(0, 0))
+        self.assertEqual(sync_files(self.static, self.public, self.manifest, checksum=True), 0)
+        self.assertEqual(sync_files(self.static, self.public, self.manifest), 1)
+
+    def test_sync_files_link_modes(self):
+        """
+            Test hardlink and reflink modes
+        """
+        sync_files(self.static, self.public, self.manifest, SYNC_MODE_HARDLINK)
+        self.assertTrue(os.path.samefile(
+            os.path.join(self.static, "index.css"), os.path.join(self.public, "index.css")
+        ))
+        self.write("images/a.png", "new png")
+        sync_files(self.static, self.public, self.manifest, SYNC_MODE_REFLINK)
+        self.assertEqual(self.read("images/a.png"), "new png")
+
+
+if __name__ == "__main__":
+    unittest.main()
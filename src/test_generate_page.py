@@ -0,0 +1,166 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from generate_page import (
+    discover_pages,
+    extract_description,
+    generate_pages,
+    generate_pages_recursive,
+    page_url,
+    use_block_cache,
+    use_memory_budget
+)
+from io_pool import IOPool
+from page_cache import BlockCache, PageCache
+
+
+class TestGeneratePage(unittest.TestCase):
+    """
+        Test Generate Page Case
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        with open(self.template, "w", encoding="utf-8") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+        self.write("index.md", "# Home\n\nWelcome")
+        self.write("blog/post.md", "# Post\n\nSome **bold** text")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, markdown):
+        with open(os.path.join(self.content, name), "w", encoding="utf-8") as f:
+            f.write(markdown)
+
+    def test_discover_pages(self):
+        """
+            Test discover_pages
+        """
+        pages = discover_pages(self.content, self.public)
+        self.assertEqual(
+            pages,
+            [
+                (os.path.join(self.content, "blog", "post.md"), os.path.join(self.public, "blog", "post.html")),
+                (os.path.join(self.content, "index.md"), os.path.join(self.public, "index.html")),
+            ],
+        )
+
+    def test_generate_pages_reports_failures(self):
+        """
+            Test that a failing page is reported without stopping the others
+        """
+        self.write("broken.md", "no title here")
+        pages = discover_pages(self.content, self.public)
+        for jobs in (1, 2):
+            failures = generate_pages(pages, self.template, jobs)
+            self.assertEqual([from_path for from_path, _ in failures], [os.path.join(self.content, "broken.md")])
+            with open(os.path.join(self.public, "blog", "post.html"), encoding="utf-8") as f:
+                self.assertEqual(
+                    f.read(),
+                    "<title>Post</title><div><h1>Post</h1><p>Some <b>bold</b> text</p></div>",
+                )
+
+    def test_identical_pages_share_cached_body(self):
+        """
+            Test that pages with identical markdown can render their shared cached body at once
+        """
+        for i in range(40):
+            self.write(f"copy{i}.md", "# Copy\n\nSame text")
+        pages = discover_pages(self.content, self.public)
+        for jobs, workers in ((2, 1), (1, 4)):
+            cache = PageCache(os.path.join(self.tmp.name, f"cache-{jobs}-{workers}"))
+            with IOPool(workers) as io_pool:
+                self.assertEqual(generate_pages(pages, self.template, jobs, cache=cache, io_pool=io_pool), [])
+            with open(os.path.join(self.public, "copy39.html"), encoding="utf-8") as f:
+                self.assertEqual(f.read(), "<title>Copy</title><div><h1>Copy</h1><p>Same text</p></div>")
+
+    def test_worker_block_cache_merged(self):
+        """
+            Test that blocks rendered and counted by worker processes reach the build's block cache
+        """
+        for i in range(4):
+            self.write(f"page{i}.md", f"# Page {i}\n\nShared footer")
+        block_cache = BlockCache()
+        use_block_cache(block_cache)
+        try:
+            self.assertEqual(generate_pages(discover_pages(self.content, self.public), self.template, 2), [])
+        finally:
+            use_block_cache(None)
+        self.assertIn("Shared footer", block_cache.entries)
+        self.assertIn("# Page 3", block_cache.entries)
+        self.assertEqual(block_cache.hits + block_cache.misses, 12)
+        self.assertGreaterEqual(block_cache.misses, len(block_cache.entries))
+
+    def test_memory_budget(self):
+        """
+            Test that pages too large for the memory budget are still generated, in order
+        """
+        self.write("broken.md", "no title here")
+        pages = discover_pages(self.content, self.public)
+        use_memory_budget(1)
+        try:
+            failures = generate_pages(pages, self.template, 2)
+        finally:
+            use_memory_budget(0)
+        self.assertEqual([from_path for from_path, _ in failures], [os.path.join(self.content, "broken.md")])
+        with open(os.path.join(self.public, "blog", "post.html"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "<title>Post</title><div><h1>Post</h1><p>Some <b>bold</b> text</p></div>")
+        with open(os.path.join(self.public, "index.html"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "<title>Home</title><div><h1>Home</h1><p>Welcome</p></div>")
+
+    def test_memory_budget_missing_source(self):
+        """
+            Test that a page deleted before it is generated under a memory budget fails on its own
+        """
+        pages = discover_pages(self.content, self.public)
+        os.remove(os.path.join(self.content, "index.md"))
+        use_memory_budget(1)
+        try:
+            failures = generate_pages(pages, self.template, 2)
+        finally:
+            use_memory_budget(0)
+        self.assertEqual([from_path for from_path, _ in failures], [os.path.join(self.content, "index.md")])
+        self.assertIn("FileNotFoundError", failures[0][1])
+        self.assertTrue(os.path.exists(os.path.join(self.public, "blog", "post.html")))
+
+    def test_generate_pages_recursive_deep_tree(self):
+        """
+            Test that a tree nested deeper than the recursion limit is generated
+        """
+        depth = 60
+        nested = os.path.join(self.content, *["d"] * depth)
+        os.makedirs(nested)
+        self.write(os.path.join(nested, "deep.md"), "# Deep")
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(depth)
+        try:
+            generate_pages_recursive(self.content, self.template, self.public)
+        finally:
+            sys.setrecursionlimit(limit)
+        self.assertTrue(os.path.exists(os.path.join(self.public, *["d"] * depth, "deep.html")))
+
+    def test_extract_description(self):
+        """
+            Test extract_description
+        """
+        markdown = "# Title\n\n> quote\n\nFirst *para* with \"quotes\"\nand a [link](/x)\n\nSecond"
+        self.assertEqual(extract_description(markdown), "First para with &quot;quotes&quot; and a link")
+        self.assertEqual(extract_description("# Only a title"), "")
+
+    def test_page_url(self):
+        """
+            Test page_url
+        """
+        self.assertEqual(page_url(os.path.join("public", "index.html"), "public"), "/")
+        self.assertEqual(page_url(os.path.join("public", "blog", "index.html"), "public"), "/blog/")
+        self.assertEqual(page_url(os.path.join("public", "blog", "post.html"), "public"), "/blog/post.html")
+
+
+if __name__ == "__main__":
+    unittest.main()
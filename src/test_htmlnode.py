@@ -82,6 +82,13 @@ class TestParentNode(unittest.TestCase):
         actual_html = nested_node.to_html()
         self.assertEqual(expected_html, actual_html)
 
+    def test_render_to(self):
+        node = ParentNode([LeafNode("Bold text", "b"), LeafNode("Normal text")], "p", {"class": "x"})
+        chunks = []
+        node.render_to(chunks.append)
+        self.assertEqual(chunks, ['<p class="x">', "<b>Bold text</b>", "Normal text", "</p>"])
+        self.assertEqual("".join(chunks), node.to_html())
+
 
 if __name__ == "__main__":
     unittest.main()
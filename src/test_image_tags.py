@@ -0,0 +1,45 @@
+import unittest
+
+from image_tags import ImageTagWriter
+
+ATTRIBUTES = {"/images/a.png": ' width="2" height="1"'}
+
+
+class TestImageTags(unittest.TestCase):
+    """
+        Test Image Tags Case
+    """
+    def render(self, chunks, base_url="/"):
+        written = []
+        tags = ImageTagWriter(written.append, ATTRIBUTES, base_url)
+        for chunk in chunks:
+            tags.write(chunk)
+        tags.flush()
+        return "".join(written)
+
+    def test_attributes(self):
+        """
+            Test that known images get their attributes, resolved from the page's URL
+        """
+        self.assertEqual(
+            self.render(['<p><img src="../images/a.png" alt="a"></img><img src="/b.png"></p>'], "/blog/"),
+            '<p><img width="2" height="1" src="../images/a.png" alt="a"></img><img src="/b.png"></p>',
+        )
+        self.assertEqual(self.render(['<img width="5" src="/images/a.png">']), '<img width="5" src="/images/a.png">')
+        self.assertEqual(
+            self.render(['<img src="https://example.com/images/a.png">']),
+            '<img src="https://example.com/images/a.png">',
+        )
+
+    def test_split_tag(self):
+        """
+            Test that a tag split across writes is rewritten once it is complete
+        """
+        self.assertEqual(
+            self.render(["<p>1 < 2 <im", 'g src="/images/', 'a.png"></p>', "<"]),
+            '<p>1 < 2 <img width="2" height="1" src="/images/a.png"></p><',
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+
+from images import VARIANTS_DIR, Image, ImageCatalog, image_size
+
+
+def png(width, height):
+    """
+        Returns a valid black RGB PNG image
+    """
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    rows = b"".join(b"\x00" + b"\x00\x00\x00" * width for _ in range(height))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+
+class TestImages(unittest.TestCase):
+    """
+        Test Images Case
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.cache = os.path.join(self.tmp.name, ".cache")
+        os.makedirs(os.path.join(self.static, "images"))
+        self.write("images/a.png", png(1000, 500))
+        self.write("images/icon.png", png(16, 16))
+        self.write("index.css", b"body {}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.static, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def catalog(self):
+        return ImageCatalog(
+            os.path.join(self.cache, "images.json"), os.path.join(self.cache, "images"), self.static, self.public
+        )
+
+    def update(self, referenced=("images/a.png", "images/icon.png", "index.css")):
+        catalog = self.catalog()
+        report = catalog.update(set(referenced))
+        catalog.save()
+        return catalog, report
+
+    def test_image_size(self):
+        """
+            Test that sizes are read from PNG, GIF, JPEG and WebP headers
+        """
+        headers = {
+            "a.png": png(3, 2),
+            "a.gif": b"GIF89a" + struct.pack("<HH", 640, 480) + b"\x00" * 8,
+            "a.jpg": (
+                b"\xff\xd8\xff\xe0" + struct.pack(">H", 6) + b"JFIF"
+                + b"\xff\xc2" + struct.pack(">HBHH", 11, 8, 300, 400) + b"\x03\x00"
+            ),
+            "a.webp": b"RIFF\x00\x00\x00\x00WEBPVP8L\x00\x00\x00\x00\x2f" + ((800 - 1) | (600 - 1) << 14).to_bytes(4, "little"),
+            "b.webp": b"RIFF\x00\x00\x00\x00WEBPVP8X" + b"\x00" * 8 + (99).to_bytes(3, "little") + (49).to_bytes(3, "little"),
+            "a.txt": b"not an image",
+        }
+        expected = {"a.png": (3, 2), "a.gif": (640, 480), "a.jpg": (400, 300), "a.webp": (800, 600), "b.webp": (100, 50)}
+        for name, data in headers.items():
+            self.assertEqual(image_size(self.write(name, data)), expected.get(name), name)
+
+    def test_truncated_headers(self):
+        """
+            Test that truncated or malformed headers are not images rather than errors
+        """
+        headers = [
+            png(3, 2)[:20],
+            b"GIF89a\x01",
+            b"\xff\xd8",
+            b"\xff\xd8\xff\xe0",
+            b"\xff\xd8\xff\xe0\x00",
+            b"\xff\xd8\xff\xe0\x00\x00",
+            b"\xff\xd8\xff\xff",
+            b"\xff\xd8\xff\xc0\x00\x11\x08",
+            b"RIFF\x00\x00\x00\x00WEBPVP8L",
+            b"RIFF\x00\x00\x00\x00WEBPVP8X\x00\x00",
+            b"RIFF\x00\x00\x00\x00WEBPVP8 " + bytes(7) + b"\x9d\x01\x2a",
+        ]
+        for i, data in enumerate(headers):
+            self.assertIsNone(image_size(self.write(f"bad{i}.img", data)), data)
+
+    def test_update(self):
+        """
+            Test that images are processed once and their attributes include their size
+        """
+        catalog, report = self.update()
+        self.assertEqual((report["processed"], report["changed"]), (2, {"images/a.png", "images/icon.png"}))
+        attributes = catalog.attributes()
+        self.assertEqual(set(attributes), {"/images/a.png", "/images/icon.png"})
+        self.assertTrue(attributes["/images/icon.png"].startswith(' width="16" height="16" loading="lazy" decoding="async"'))
+
+        catalog, report = self.update()
+        self.assertEqual((report["processed"], report["changed"]), (0, set()))
+        self.write("images/icon.png", png(32, 32))
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        catalog, report = self.update()
+        self.assertEqual((report["processed"], report["removed"]), (1, 1))
+        self.assertEqual(report["changed"], {"images/a.png", "images/icon.png"})
+        self.assertIn(' width="32" height="32"', catalog.attributes()["/images/icon.png"])
+
+    def test_unreferenced_images(self):
+        """
+            Test that only referenced images are processed and images no longer referenced are dropped
+        """
+        catalog, report = self.update(["images/icon.png", "images/missing.png"])
+        self.assertEqual((report["processed"], report["changed"]), (1, {"images/icon.png"}))
+        self.assertEqual(set(catalog.images), {"images/icon.png"})
+        catalog, report = self.update([])
+        self.assertEqual((report["removed"], report["changed"]), (1, {"images/icon.png"}))
+        self.assertEqual(catalog.attributes(), {})
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_variants(self):
+        """
+            Test that narrower variants are generated once and copied to the output
+        """
+        catalog, report = self.update()
+        self.assertEqual(catalog.images["images/a.png"]["variants"], [480, 960])
+        self.assertEqual(catalog.images["images/icon.png"]["variants"], [])
+        self.assertEqual(report["variants"], 2)
+        content_hash = catalog.images["images/a.png"]["hash"]
+        variant = os.path.join(self.public, VARIANTS_DIR, f"{content_hash}-480.png")
+        self.assertEqual(image_size(variant), (480, 240))
+        self.assertIn(
+            f'srcset="/{VARIANTS_DIR}/{content_hash}-480.png 480w, /{VARIANTS_DIR}/{content_hash}-960.png 960w, '
+            '/images/a.png 1000w"',
+            catalog.attributes()["/images/a.png"]
+        )
+        os.remove(variant)
+        catalog, report = self.update()
+        self.assertEqual((report["processed"], report["variants"]), (0, 1))
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        self.update()
+        self.assertFalse(os.path.exists(variant))
+        self.assertEqual(os.listdir(os.path.join(self.cache, "images")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
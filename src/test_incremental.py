@@ -0,0 +1,156 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import generate_page
+from build_manifest import BuildManifest
+from incremental import generate_pages_incremental, resolve_asset, resolve_link
+from page_cache import PageCache
+
+
+class TestIncremental(unittest.TestCase):
+    """
+        Test Incremental Build Case
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        self.manifest_path = os.path.join(self.tmp.name, ".cache", "manifest.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(os.path.join(self.static, "images"))
+        with open(os.path.join(self.static, "images", "a.png"), "wb") as f:
+            f.write(b"png")
+        with open(os.path.join(self.static, "index.css"), "w", encoding="utf-8") as f:
+            f.write("body {}")
+        self.write(self.template, '<link href="/index.css">{{ Title }}|{{ Content }}')
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog\n\n![a](../images/a.png)")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.utime(path, ns=(os.stat(path).st_mtime_ns + 10**9,) * 2)
+
+    def build(self, changed_paths=None, changed_assets=None):
+        manifest = BuildManifest.load(self.manifest_path)
+        cache = PageCache(os.path.join(self.tmp.name, ".cache", "pages"))
+        generate_pages_incremental(
+            self.content,
+            self.template,
+            self.public,
+            manifest,
+            dir_path_static=self.static,
+            cache=cache,
+            changed_paths=changed_paths,
+            changed_assets=changed_assets
+        )
+        return manifest
+
+    def read(self, *parts):
+        with open(os.path.join(self.public, *parts), encoding="utf-8") as f:
+            return f.read()
+
+    def test_dependency_graph(self):
+        """
+            Test that page and template asset references are recorded
+        """
+        manifest = self.build()
+        blog = os.path.join(self.content, "blog", "index.md")
+        self.assertEqual(manifest.pages[blog]["assets"], ["images/a.png"])
+        self.assertEqual(manifest.dependents("images/a.png"), [blog])
+        self.assertEqual(manifest.dependents("index.css"), ["template"])
+
+    def test_template_change_reuses_cached_bodies(self):
+        """
+            Test that a template change re-renders pages without parsing markdown
+        """
+        self.build()
+        self.write(self.template, "<main>{{ Title }}{{ Content }}</main>")
+        with mock.patch.object(generate_page, "render_markdown_to") as render:
+            self.build()
+        render.assert_not_called()
+        self.assertEqual(self.read("index.html"), "<main>Home<div><h1>Home</h1></div></main>")
+
+    def test_markdown_change_rebuilds_only_that_page(self):
+        """
+            Test that only the edited page is regenerated
+        """
+        self.build()
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nEdited")
+        with mock.patch.object(generate_page, "generate_page", wraps=generate_page.generate_page) as generate:
+            self.build()
+        self.assertEqual([call.args[0] for call in generate.call_args_list], [os.path.join(self.content, "index.md")])
+        self.assertIn("<p>Edited</p>", self.read("index.html"))
+
+    def test_changed_paths_checks_only_those_pages(self):
+        """
+            Test that only the given content files are checked and deleted ones are removed
+        """
+        self.build()
+        index = os.path.join(self.content, "index.md")
+        blog = os.path.join(self.content, "blog", "index.md")
+        self.write(index, "# Home\n\nEdited")
+        os.remove(blog)
+        with mock.patch.object(generate_page, "generate_page", wraps=generate_page.generate_page) as generate:
+            manifest = self.build({blog})
+        generate.assert_not_called()
+        self.assertNotIn(blog, manifest.pages)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog", "index.html")))
+
+        with mock.patch.object(generate_page, "generate_page", wraps=generate_page.generate_page) as generate:
+            self.build({index})
+        self.assertEqual([call.args[0] for call in generate.call_args_list], [index])
+        self.assertIn("<p>Edited</p>", self.read("index.html"))
+
+    def test_changed_assets_rewrite_their_pages(self):
+        """
+            Test that pages referencing a changed asset are re-rendered from their cached bodies
+        """
+        self.build()
+        generate_page.use_image_attributes({"/images/a.png": ' width="1" height="1"'})
+        try:
+            for changed_paths in (None, set()):
+                wrapped = generate_page.render_cached_page
+                with mock.patch.object(generate_page, "render_cached_page", wraps=wrapped) as render:
+                    self.build(changed_paths, {"images/a.png"})
+                self.assertEqual(
+                    [call.args[2] for call in render.call_args_list],
+                    [os.path.join(self.public, "blog", "index.html")]
+                )
+        finally:
+            generate_page.use_image_attributes(None)
+        self.assertIn('<img width="1" height="1" src="../images/a.png"', self.read("blog", "index.html"))
+        with mock.patch.object(generate_page, "render_cached_page") as render:
+            self.build(changed_assets={"index.css"})
+        self.assertEqual(render.call_count, 2)
+
+    def test_resolve_asset(self):
+        """
+            Test resolve_asset
+        """
+        self.assertEqual(resolve_asset("/images/a.png", "/blog/", self.static), "images/a.png")
+        self.assertEqual(resolve_asset("../images/a.png", "/blog/", self.static), "images/a.png")
+        self.assertEqual(resolve_asset("https://example.com/a.png", "/", self.static), None)
+        self.assertEqual(resolve_asset("/images/missing.png", "/", self.static), None)
+
+    def test_resolve_link(self):
+        """
+            Test resolve_link
+        """
+        self.assertEqual(resolve_link("../about/#team", "/blog/"), "/about/")
+        self.assertEqual(resolve_link("post.html?page=2", "/blog/"), "/blog/post.html")
+        self.assertEqual(resolve_link("#top", "/blog/"), "/blog/")
+        self.assertEqual(resolve_link("/a%20b", "/"), "/a b")
+        self.assertEqual(resolve_link("https://example.com/", "/"), None)
+        self.assertEqual(resolve_link("mailto:me@example.com", "/"), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -168,5 +168,29 @@ class TestInlineMarkdown(unittest.TestCase):
             actual_nodes = text_to_textnodes(test_case["text"])
             self.assertEqual(actual_nodes, test_case["expected_nodes"])
 
+    def test_text_to_textnodes_matches_split_nodes(self):
+        texts = [
+            "",
+            "plain text",
+            "**bold with *star* and `tick`** after",
+            "*italic with `tick`* and a****gap",
+            "![a](x.png)![b](y.png)[c](z)",
+            "[a ![b](c) d](e)",
+            "`code with [link](url)` then [link](url)",
+        ]
+        for text in texts:
+            nodes = [TextNode(text, text_type_text)]
+            nodes = split_nodes_delimiter(nodes, "**", text_type_bold)
+            nodes = split_nodes_delimiter(nodes, "*", text_type_italic)
+            nodes = split_nodes_delimiter(nodes, "`", text_type_code)
+            nodes = split_nodes_image(nodes)
+            nodes = split_nodes_link(nodes)
+            self.assertEqual(text_to_textnodes(text), nodes)
+
+    def test_text_to_textnodes_unclosed(self):
+        for text in ["**bold", "*italic **bold** more*", "`code * star`"]:
+            with self.assertRaises(ValueError):
+                text_to_textnodes(text)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from io_pool import IOPool, make_dirs, scan_tree
+
+
+class TestIOPool(unittest.TestCase):
+    """
+        Test IO Pool Case
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for name in ("b.md", "a/z.md", "a/b/c.md", "c.md"):
+            path = os.path.join(self.tmp.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_scan_tree(self):
+        """
+            Test that files are listed depth first in sorted order
+        """
+        self.assertEqual(
+            [relative for relative, _ in scan_tree(self.tmp.name)],
+            ["a/b/c.md", "a/z.md", "b.md", "c.md"],
+        )
+        self.assertEqual(list(scan_tree(os.path.join(self.tmp.name, "missing"))), [])
+
+    def test_make_dirs(self):
+        """
+            Test that missing parents are created and existing directories accepted
+        """
+        path = os.path.join(self.tmp.name, "a", "new", "nested")
+        make_dirs(path)
+        make_dirs(path)
+        self.assertTrue(os.path.isdir(path))
+        with self.assertRaises(FileExistsError):
+            make_dirs(os.path.join(self.tmp.name, "b.md"))
+
+    def test_map_preserves_order(self):
+        """
+            Test that results come back in order with or without threads
+        """
+        for workers in (1, 4):
+            with IOPool(workers, max_in_flight=2) as pool:
+                self.assertEqual(list(pool.map(lambda n: n * n, range(20))), [n * n for n in range(20)])
+
+    def test_map_bounds_in_flight(self):
+        """
+            Test that no more than max_in_flight operations are outstanding
+        """
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def operation(n):
+            with lock:
+                running[0] += 1
+                running[1] = max(running[1], running[0])
+            threading.Event().wait(0.001)
+            with lock:
+                running[0] -= 1
+            return n
+
+        with IOPool(8, max_in_flight=3) as pool:
+            self.assertEqual(list(pool.map(operation, range(50))), list(range(50)))
+        self.assertLessEqual(running[1], 3)
+
+    def test_map_raises(self):
+        """
+            Test that an exception in an operation is re-raised
+        """
+        def operation(n):
+            if n == 3:
+                raise OSError("disk full")
+            return n
+
+        with IOPool(4) as pool:
+            with self.assertRaises(OSError):
+                list(pool.map(operation, range(10)))
+
+
+if __name__ == "__main__":
+    unittest.main()
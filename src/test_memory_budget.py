@@ -0,0 +1,60 @@
+import unittest
+from unittest import mock
+
+import memory_budget
+from memory_budget import PAGE_MEMORY_FACTOR, peak_rss, plan_pages
+
+MIB = 1024 * 1024
+
+
+class TestMemoryBudget(unittest.TestCase):
+    """
+        Test Memory Budget Case
+    """
+    def plan(self, sizes, max_memory, jobs, threads=1, worker_bytes=100 * MIB):
+        with mock.patch.object(memory_budget, "current_rss", return_value=100 * MIB):
+            return plan_pages(sizes, max_memory, jobs, threads, worker_bytes)
+
+    def test_worker_count(self):
+        """
+            Test that the budget left after this process limits the worker processes
+        """
+        self.assertEqual(self.plan([], 1000 * MIB, 16)[0], 4)
+        self.assertEqual(self.plan([], 1000 * MIB, 2)[0], 2)
+        self.assertEqual(self.plan([], 250 * MIB, 4)[0], 1)
+
+    def test_oversized_pages(self):
+        """
+            Test that pages too large for a worker's or thread's share are streamed alone
+        """
+        page = MIB // PAGE_MEMORY_FACTOR
+        jobs, oversized = self.plan([10 * page, 200 * page], 700 * MIB, 3)
+        self.assertEqual((jobs, oversized), (3, [False, True]))
+        jobs, oversized = self.plan([10 * page, 200 * page], 500 * MIB, 1, threads=4)
+        self.assertEqual((jobs, oversized), (1, [False, True]))
+        with self.assertLogs(level="WARNING"):
+            self.plan([500 * page], 500 * MIB, 1)
+
+    def test_peak_rss(self):
+        """
+            Test that the peak resident set size of this process is reported
+        """
+        build, workers = peak_rss()
+        self.assertGreater(build, MIB)
+        self.assertGreaterEqual(workers, 0)
+
+    def test_log_peak_memory(self):
+        """
+            Test that the largest worker is only reported when worker processes ran
+        """
+        with mock.patch.object(memory_budget, "peak_rss", return_value=(10 * MIB, 3 * MIB)):
+            with self.assertLogs(level="INFO") as logs:
+                memory_budget.log_peak_memory()
+            self.assertEqual(logs.output, ["INFO:root:Peak memory: 10.0 MiB"])
+            with self.assertLogs(level="INFO") as logs:
+                memory_budget.log_peak_memory(used_workers=True)
+            self.assertIn("3.0 MiB in the largest worker", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+from block_markdown import block_type_paragraph
+from page_cache import BlockCache, PageCache, parser_version
+
+
+class TestPageCache(unittest.TestCase):
+    """
+        Test Page Cache Case
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir_path = os.path.join(self.tmp.name, "pages")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def put(self, cache, content_hash, body):
+        key = cache.key(content_hash)
+        os.makedirs(os.path.dirname(cache.body_path(key)), exist_ok=True)
+        with open(cache.body_path(key), "w", encoding="utf-8") as f:
+            f.write(body)
+        cache.put(key, {"title": content_hash, "description": "", "images": []})
+        return key
+
+    def test_persistence(self):
+        """
+            Test that entries survive reloading and are keyed by parser version
+        """
+        cache = PageCache(self.dir_path)
+        key = self.put(cache, "abc", "<div></div>")
+        self.assertTrue(key.startswith(parser_version()))
+        cache.save()
+
+        cache = PageCache(self.dir_path)
+        self.assertEqual(cache.get(key)["title"], "abc")
+        self.assertIsNone(cache.get(cache.key("other")))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        """
+            Test that the least recently used entries are evicted first
+        """
+        cache = PageCache(self.dir_path, max_bytes=20)
+        first = self.put(cache, "first", "x" * 10)
+        second = self.put(cache, "second", "x" * 10)
+        cache.get(first)
+        third = self.put(cache, "third", "x" * 10)
+        self.assertEqual(cache.evict(), [second])
+        self.assertFalse(os.path.exists(cache.body_path(second)))
+        self.assertEqual(set(cache.entries), {first, third})
+
+    def test_clear(self):
+        """
+            Test clear
+        """
+        cache = PageCache(self.dir_path)
+        key = self.put(cache, "abc", "body")
+        cache.save()
+        cache.clear()
+        self.assertIsNone(cache.get(key))
+        self.assertFalse(os.path.exists(self.dir_path))
+
+
+
+class TestBlockCache(unittest.TestCase):
+    """
+        Test Block Cache Case
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "blocks.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_render(self):
+        """
+            Test that a block is rendered once and then served from the cache
+        """
+        cache = BlockCache()
+        lines = ["Some **bold** text with ![a](/a.png) and [b](/b/)"]
+        html = '<p>Some <b>bold</b> text with <img src="/a.png" alt="a"></img> and <a href="/b/">b</a></p>'
+        text = "Some \nbold\n text with \na\n and \nb"
+        self.assertEqual(cache.render(block_type_paragraph, lines), (html, ["/a.png"], ["/b/"], text))
+        self.assertEqual(cache.render(block_type_paragraph, list(lines)), (html, ["/a.png"], ["/b/"], text))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_eviction(self):
+        """
+            Test that the least recently used blocks are evicted past max_bytes
+        """
+        cache = BlockCache(max_bytes=40)
+        cache.render(block_type_paragraph, ["one"])
+        cache.render(block_type_paragraph, ["two"])
+        cache.render(block_type_paragraph, ["one"])
+        cache.render(block_type_paragraph, ["three"])
+        self.assertEqual(list(cache.entries), ["one", "three"])
+        self.assertLessEqual(cache.size, 40)
+
+    def test_persistence(self):
+        """
+            Test that saved blocks are loaded by a new cache and survive pickling
+        """
+        cache = BlockCache(path=self.path)
+        cache.render(block_type_paragraph, ["footer"])
+        cache.save()
+        loaded = BlockCache(path=self.path)
+        self.assertEqual(loaded.render(block_type_paragraph, ["footer"]), ("<p>footer</p>", [], [], "footer"))
+        self.assertEqual(loaded.hits, 1)
+        copy = pickle.loads(pickle.dumps(loaded))
+        self.assertEqual(list(copy.entries), ["footer"])
+        loaded.clear()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(BlockCache(path=self.path).entries, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import generate_page
+from generate_page import discover_pages, generate_pages
+from profiler import Profiler
+
+
+class TestProfiler(unittest.TestCase):
+    """
+        Test Profiler Case
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(self.content)
+        with open(self.template, "w", encoding="utf-8") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+        for name in ("a", "b", "c"):
+            with open(os.path.join(self.content, f"{name}.md"), "w", encoding="utf-8") as f:
+                f.write(f"# {name}\n\nSome **bold** text and a [link](/{name})\n\n* item")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def profile_build(self, trace_memory=False):
+        profiler = Profiler(trace_memory)
+        with profiler.instrument(), redirect_stdout(io.StringIO()):
+            with profiler.phase("discovery"):
+                pages = discover_pages(self.content, self.public)
+            self.assertEqual(generate_pages(pages, self.template), [])
+        return profiler
+
+    def test_report(self):
+        """
+            Test that every phase and page is timed and the slowest pages are listed
+        """
+        report = self.profile_build().report(top=2)
+        self.assertTrue(
+            {"discovery", "block split", "inline parse", "HTML render", "template", "write"} <= set(report["phases"])
+        )
+        self.assertEqual(report["phases"]["HTML render"]["calls"], 3)
+        self.assertEqual(report["page_count"], 3)
+        self.assertEqual(len(report["slowest_pages"]), 2)
+        self.assertEqual(report["slowest_pages"], [page["path"] for page in report["pages"][:2]])
+        page = report["pages"][0]
+        self.assertIn("net_blocks", page)
+        self.assertNotIn("peak_bytes", page)
+        self.assertLessEqual(sum(page["phases"].values()), page["wall"] + 1e-6)
+        phase_wall = sum(phase["wall_seconds"] for phase in report["phases"].values())
+        self.assertAlmostEqual(phase_wall, report["wall_seconds"], places=4)
+
+    def test_trace_memory(self):
+        """
+            Test that tracing memory records each page's peak allocation
+        """
+        report = self.profile_build(trace_memory=True).report()
+        self.assertTrue(all(page["peak_bytes"] > 0 for page in report["pages"]))
+
+    def test_instrument_restores_functions(self):
+        """
+            Test that instrumented functions are restored afterwards
+        """
+        original = generate_page.generate_page
+        self.profile_build()
+        self.assertIs(generate_page.generate_page, original)
+
+    def test_trace_events(self):
+        """
+            Test that the trace has an event for the discovery phase and each page
+        """
+        events = self.profile_build().events
+        self.assertEqual([event["name"] for event in events][0], "discovery")
+        self.assertEqual(len(events), 4)
+        self.assertTrue(all(event["ph"] == "X" and event["dur"] >= 0 for event in events))
+
+
+if __name__ == "__main__":
+    unittest.main()
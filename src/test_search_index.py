@@ -0,0 +1,119 @@
+import os
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from build_manifest import BuildManifest
+from generate_page import use_search_terms
+from incremental import generate_pages_incremental
+from page_cache import PageCache
+from search_index import SHARD_COUNT, SearchIndex, shard_name
+
+
+class TestSearchIndex(unittest.TestCase):
+    """
+        Test Search Index Case
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        self.index_dir = os.path.join(self.public, "search")
+        self.state = os.path.join(self.tmp.name, ".cache", "search.json")
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, ".cache", "manifest.json"))
+        self.cache = PageCache(os.path.join(self.tmp.name, ".cache", "pages"))
+        os.makedirs(os.path.join(self.content, "blog"))
+        with open(self.template, "w", encoding="utf-8") as f:
+            f.write("{{ Title }}|{{ Content }}")
+        self.write("index.md", "# Home\n\nWelcome **home** to the [blog](/blog/)")
+        self.write("blog/index.md", "# Blog\n\nA post about home cooking\n\n![Cooking pot](/pot.png)")
+        use_search_terms(True)
+
+    def tearDown(self):
+        use_search_terms(False)
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        with open(os.path.join(self.content, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def update(self):
+        index = SearchIndex(self.state, self.index_dir)
+        records = {}
+        with redirect_stdout(StringIO()):
+            generate_pages_incremental(
+                self.content,
+                self.template,
+                self.public,
+                self.manifest,
+                cache=self.cache,
+                rebuild=index.stale_pages(self.manifest.pages),
+                records=records
+            )
+        report = index.update(self.manifest.pages, records, self.public)
+        index.save()
+        return report
+
+    def lookup(self, term):
+        path = os.path.join(self.index_dir, shard_name(term))
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get(term, [])
+
+    def pages(self):
+        with open(os.path.join(self.index_dir, "pages.json"), "r", encoding="utf-8") as f:
+            return json.load(f)["pages"]
+
+    def test_build(self):
+        """
+            Test that every page is indexed with its URL, title and term positions from rendering
+        """
+        report = self.update()
+        self.assertEqual((report["pages"], report["indexed"]), (2, 2))
+        pages = self.pages()
+        self.assertEqual(sorted(map(tuple, pages)), [("/", "Home"), ("/blog/", "Blog")])
+        blog_id = pages.index(["/blog/", "Blog"])
+        home_id = pages.index(["/", "Home"])
+        self.assertEqual(self.lookup("home"), sorted([[blog_id, 4], [home_id, 0, 2]]))
+        self.assertEqual(self.lookup("cooking"), [[blog_id, 5, 6]])
+        self.assertEqual(self.lookup("png"), [])
+        self.assertLessEqual(len(os.listdir(self.index_dir)), SHARD_COUNT + 1)
+
+    def test_incremental_update(self):
+        """
+            Test that only edited pages are indexed again and deleted pages are removed
+        """
+        self.update()
+        blog_id = self.pages().index(["/blog/", "Blog"])
+        self.assertEqual(self.update()["indexed"], 0)
+        self.write("blog/index.md", "# Blog\n\nA post about gardening")
+        report = self.update()
+        self.assertEqual((report["indexed"], report["removed"]), (1, 0))
+        self.assertEqual(self.lookup("gardening"), [[blog_id, 4]])
+        self.assertEqual(self.lookup("cooking"), [])
+        self.assertFalse(any(posting[0] == blog_id for posting in self.lookup("home")))
+        os.remove(os.path.join(self.content, "blog", "index.md"))
+        report = self.update()
+        self.assertEqual((report["pages"], report["removed"]), (1, 1))
+        self.assertIsNone(self.pages()[blog_id])
+        self.assertEqual(self.lookup("gardening"), [])
+
+    def test_rebuilt_output(self):
+        """
+            Test that pages unchanged since the last build are rendered again from the page cache when the index starts over
+        """
+        self.update()
+        os.remove(os.path.join(self.index_dir, "pages.json"))
+        hits = self.cache.hits
+        report = self.update()
+        self.assertEqual(report["indexed"], 2)
+        self.assertEqual(self.cache.hits - hits, 2)
+        self.assertEqual(len(self.lookup("home")), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import json
+import tempfile
+import unittest
+from xml.etree import ElementTree
+
+from build_manifest import BuildManifest
+from incremental import generate_pages_incremental
+from site_outputs import link_target_page, write_site_outputs
+
+
+class TestSiteOutputs(unittest.TestCase):
+    """
+        Test Site Outputs Case
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        self.graph = os.path.join(self.tmp.name, ".cache", "links.json")
+        self.manifest_path = os.path.join(self.tmp.name, ".cache", "manifest.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.static)
+        self.write(self.static, "style.css", "body {}")
+        self.write(self.tmp.name, "template.html", "{{ Title }}|{{ Content }}")
+        self.write(self.content, "index.md", "# Home & Away\n\nWelcome to the [blog](/blog) and [style](/style.css)")
+        self.write(self.content, "blog/index.md", "# Blog\n\n[Home](../index.html), [missing](/missing/#top)")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, dir_path, name, text):
+        with open(os.path.join(dir_path, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def outputs(self, pages):
+        return write_site_outputs(pages, self.public, self.static, "https://example.com/", self.graph)
+
+    def load_graph(self):
+        with open(self.graph, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_full_build(self):
+        """
+            Test that the sitemap, feed and link graph are written from the manifest of a full build
+        """
+        manifest = BuildManifest(self.manifest_path)
+        generate_pages_incremental(self.content, self.template, self.public, manifest, dir_path_static=self.static)
+        report = self.outputs(manifest.pages)
+        self.assertEqual(report["pages"], 2)
+        self.assertEqual(report["broken"], {"/blog/": ["/missing/"]})
+
+        namespace = {"s": "http://www.sitemaps.org/schemas/sitemap/0.9"}
+        sitemap = ElementTree.parse(os.path.join(self.public, "sitemap.xml"))
+        self.assertEqual(
+            [loc.text for loc in sitemap.findall("s:url/s:loc", namespace)],
+            ["https://example.com/", "https://example.com/blog/"]
+        )
+        feed = ElementTree.parse(os.path.join(self.public, "feed.xml"))
+        self.assertEqual(feed.findtext("channel/title"), "Home & Away")
+        self.assertEqual(
+            sorted(item.findtext("link") for item in feed.findall("channel/item")),
+            ["https://example.com/", "https://example.com/blog/"]
+        )
+        graph = self.load_graph()
+        self.assertEqual(graph["links"], {"/": ["/blog/"], "/blog/": ["/"]})
+        self.assertEqual(graph["backlinks"], {"/": ["/blog/"], "/blog/": ["/"]})
+
+    def test_incremental_merge(self):
+        """
+            Test that link records of unchanged pages are kept from the manifest
+        """
+        manifest = BuildManifest(self.manifest_path)
+        generate_pages_incremental(self.content, self.template, self.public, manifest, dir_path_static=self.static)
+        self.write(self.content, "blog/index.md", "# Blog\n\nNo links left")
+        generate_pages_incremental(
+            self.content,
+            self.template,
+            self.public,
+            manifest,
+            dir_path_static=self.static,
+            changed_paths={os.path.join(self.content, "blog", "index.md")}
+        )
+        report = self.outputs(manifest.pages)
+        self.assertEqual(report["broken"], {})
+        self.assertEqual(self.load_graph()["links"], {"/": ["/blog/"], "/blog/": []})
+
+    def test_link_target_page(self):
+        """
+            Test that directory links without a slash or with index.html resolve to the page
+        """
+        urls = {"/", "/blog/", "/about.html"}
+        self.assertEqual(link_target_page("/blog", urls), "/blog/")
+        self.assertEqual(link_target_page("/blog/index.html", urls), "/blog/")
+        self.assertEqual(link_target_page("/about.html", urls), "/about.html")
+        self.assertIsNone(link_target_page("/about", urls))
+
+
+if __name__ == "__main__":
+    unittest.main()
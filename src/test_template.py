@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+from template import Template, load_template
+
+
+class TestTemplate(unittest.TestCase):
+    """
+        Test Template Case
+    """
+    def test_render(self):
+        """
+            Test rendering slots, including repeated and missing ones
+        """
+        template = Template("<title>{{ Title }}</title><h1>{{Title}}</h1>{{ Content }}{{ Footer }}")
+        self.assertEqual(template.slot_names, {"Title", "Content", "Footer"})
+        self.assertEqual(
+            template.render({"Title": "Home", "Content": "<p>hi</p>"}),
+            "<title>Home</title><h1>Home</h1><p>hi</p>{{ Footer }}",
+        )
+
+    def test_render_does_not_substitute_values(self):
+        """
+            Test that slot syntax inside a value is left alone
+        """
+        template = Template("{{ Title }}|{{ Content }}")
+        self.assertEqual(
+            template.render({"Title": "{{ Content }}", "Content": "body"}),
+            "{{ Content }}|body",
+        )
+
+    def test_render_to(self):
+        """
+            Test streaming a template with a callable slot value
+        """
+        template = Template("<main>{{ Content }}</main>")
+        chunks = []
+        template.render_to(chunks.append, {"Content": lambda write: (write("<p>"), write("</p>"))})
+        self.assertEqual(chunks, ["<main>", "<p>", "</p>", "</main>"])
+
+    def test_load_template_cache(self):
+        """
+            Test that templates are reused until the file changes
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "template.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("{{ Title }}")
+            first = load_template(path)
+            self.assertIs(load_template(path), first)
+
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("<b>{{ Title }}</b>")
+            os.utime(path, ns=(0, 0))
+            second = load_template(path)
+            self.assertIsNot(second, first)
+            self.assertEqual(second.render({"Title": "x"}), "<b>x</b>")
+
+
+if __name__ == "__main__":
+    unittest.main()
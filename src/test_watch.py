@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import watch
+from watch import InotifyWatcher, PollingWatcher, classify_changes
+
+try:
+    InotifyWatcher([], []).close()
+    HAS_INOTIFY = True
+except (OSError, AttributeError):
+    HAS_INOTIFY = False
+
+
+class TestWatch(unittest.TestCase):
+    """
+        Test Watch Case
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post")
+        self.write(self.template, "{{ Content }}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def test_polling_watcher(self):
+        """
+            Test that created, modified and deleted files are reported
+        """
+        watcher = PollingWatcher([self.content], [self.template], interval=0.01)
+        self.assertEqual(watcher.wait(timeout=0), set())
+        index = os.path.join(self.content, "index.md")
+        post = os.path.join(self.content, "blog", "post.md")
+        new = os.path.join(self.content, "new.md")
+        self.write(index, "# Home\n\nEdited")
+        os.remove(post)
+        self.write(new, "# New")
+        self.assertEqual(watcher.wait(timeout=1), {index, post, new})
+        self.write(self.template, "<main>{{ Content }}</main>")
+        self.assertEqual(watcher.wait(timeout=1), {self.template})
+
+    def test_polling_watcher_deleted_during_scan(self):
+        """
+            Test that a file deleted between being listed and stat'd is left out of the scan
+        """
+        post = os.path.join(self.content, "blog", "post.md")
+        scan_tree = watch.scan_tree
+
+        def scan_and_delete(dir_path):
+            entries = list(scan_tree(dir_path))
+            os.remove(post)
+            return entries
+        with mock.patch.object(watch, "scan_tree", scan_and_delete):
+            watcher = PollingWatcher([self.content], [self.template], interval=0.01)
+        self.assertEqual(set(watcher.snapshot), {os.path.join(self.content, "index.md"), self.template})
+
+    @unittest.skipUnless(HAS_INOTIFY, "inotify is not available")
+    def test_inotify_watcher(self):
+        """
+            Test that file changes are reported and directory changes report the tree's root
+        """
+        watcher = InotifyWatcher([self.content], [self.template])
+        try:
+            self.assertEqual(watcher.wait(timeout=0), set())
+            post = os.path.join(self.content, "blog", "post.md")
+            self.write(post, "# Post\n\nEdited")
+            self.write(os.path.join(self.tmp.name, "unrelated.txt"), "")
+            self.assertEqual(watcher.wait(timeout=1), {post})
+            tmp_path = self.template + ".tmp"
+            self.write(tmp_path, "<main>{{ Content }}</main>")
+            os.replace(tmp_path, self.template)
+            self.assertEqual(watcher.wait(timeout=1), {self.template})
+            os.makedirs(os.path.join(self.content, "docs"))
+            self.assertEqual(watcher.wait(timeout=1), {self.content})
+            page = os.path.join(self.content, "docs", "page.md")
+            self.write(page, "# Page")
+            self.assertEqual(watcher.wait(timeout=1), {page})
+        finally:
+            watcher.close()
+
+    def test_classify_changes(self):
+        """
+            Test that changes are split into content, template and static changes
+        """
+        static = os.path.join(self.tmp.name, "static")
+        index = os.path.join(self.content, "index.md")
+        self.assertEqual(
+            classify_changes({index, self.template}, self.content, self.template, static),
+            ({index}, True, False),
+        )
+        self.assertEqual(
+            classify_changes({index, self.content, os.path.join(static, "a.css")}, self.content, self.template, static),
+            (None, False, True),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,35 @@
+from enum import IntEnum
+
 from htmlnode import LeafNode
 
-text_type_text = "text"
-text_type_bold = "bold"
-text_type_italic = "italic"
-text_type_code = "code"
-text_type_link = "link"
-text_type_image = "image"
+
+class TextType(IntEnum):
+    """
+        The inline formatting of a TextNode
+    """
+    TEXT = 0
+    BOLD = 1
+    ITALIC = 2
+    CODE = 3
+    LINK = 4
+    IMAGE = 5
+
+    def __str__(self) -> str:
+        return self.name.lower()
+
+
+text_type_text = TextType.TEXT
+text_type_bold = TextType.BOLD
+text_type_italic = TextType.ITALIC
+text_type_code = TextType.CODE
+text_type_link = TextType.LINK
+text_type_image = TextType.IMAGE
+
+
 class TextNode:
-    def __init__(self, text: str, text_type: str, url: None | str = None) -> None:
+    __slots__ = ("text", "text_type", "url")
+
+    def __init__(self, text: str, text_type: TextType, url: None | str = None) -> None:
         self.text = text
         self.text_type = text_type
         self.url = url
@@ -17,7 +39,7 @@ class TextNode:
             return self.text == other.text and self.text_type == other.text_type and self.url == other.url
     
     def __repr__(self):
-        return f"TextNode({self.text}, {self.text_type}, {self.url})"
+        return f"TextNode({self.text}, {self.text_type!s}, {self.url})"
     
 
 def text_node_to_html_node(text_node):
@@ -33,17 +55,17 @@ def text_node_to_html_node(text_node):
     Raises:
         ValueError: If the text type of the text node is invalid.
     """
-    if text_node.text_type == text_type_text:
-        return LeafNode(text_node.text, None)
-    if text_node.text_type == text_type_bold:
-        return LeafNode(text_node.text, "b")
-    if text_node.text_type == text_type_italic:
-        return LeafNode(text_node.text, "i")
-    if text_node.text_type == text_type_code:
-        return LeafNode(text_node.text, "code")
-    if text_node.text_type == text_type_link:
-        return LeafNode(text_node.text, "a", {"href": text_node.url})
-    if text_node.text_type == text_type_image:
-        return LeafNode("", "img", {"src": text_node.url, "alt": text_node.text})
-    raise ValueError(f"Invalid text type: {text_node.text_type}")
+    handler = TEXT_TYPE_HANDLERS.get(text_node.text_type)
+    if handler is None:
+        raise ValueError(f"Invalid text type: {text_node.text_type}")
+    return handler(text_node)
+
 
+TEXT_TYPE_HANDLERS = {
+    text_type_text: lambda text_node: LeafNode(text_node.text, None),
+    text_type_bold: lambda text_node: LeafNode(text_node.text, "b"),
+    text_type_italic: lambda text_node: LeafNode(text_node.text, "i"),
+    text_type_code: lambda text_node: LeafNode(text_node.text, "code"),
+    text_type_link: lambda text_node: LeafNode(text_node.text, "a", {"href": text_node.url}),
+    text_type_image: lambda text_node: LeafNode("", "img", {"src": text_node.url, "alt": text_node.text}),
+}
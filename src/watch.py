@@ -0,0 +1,355 @@
+import os
+import time
+import select
+import struct
+import logging
+
+from build_manifest import BuildManifest
+from config import DEFAULT_RELOAD_URL
+from copy_static import SYNC_MODE_COPY, sync_files
+from generate_page import PageGenerationError
+from incremental import generate_pages_incremental
+from io_pool import IOPool, scan_tree
+from page_cache import PageCache
+
+POLL_INTERVAL = 0.1
+DEBOUNCE_SECONDS = 0.02
+INOTIFY_READ_SIZE = 64 * 1024
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+INOTIFY_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """
+        Detects changed files by comparing stat signatures between scans of the
+        watched directory trees and files
+    """
+    def __init__(self, dir_paths: list[str], file_paths: list[str], interval: float = POLL_INTERVAL) -> None:
+        self.dir_paths = dir_paths
+        self.file_paths = file_paths
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self) -> dict:
+        """
+            Returns the (mtime, size) signature of every watched file
+        """
+        snapshot = {}
+        for dir_path in self.dir_paths:
+            for _, entry in scan_tree(dir_path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        for file_path in self.file_paths:
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            snapshot[file_path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout: None | float = None) -> set:
+        """
+            Blocks until files change or the timeout expires and returns the
+            paths of the created, modified and deleted files
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self.scan()
+            changed = {
+                path for path in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+            time.sleep(self.interval)
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """
+        Detects changed files with Linux inotify, watching every directory of the
+        watched trees and the parent directories of the watched files.
+
+        Events that arrive within DEBOUNCE_SECONDS of each other are reported
+        together, so an editor's write-and-rename save is a single change. When
+        a directory is created, removed or renamed, or the kernel's event queue
+        overflows, the root of the affected tree is reported instead of
+        individual files so the caller rescans it.
+    """
+    def __init__(self, dir_paths: list[str], file_paths: list[str]) -> None:
+        self.libc = _load_libc()
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise _inotify_error()
+        self.watches = {}
+        self.roots = {}
+        self.files = {}
+        try:
+            for dir_path in dir_paths:
+                if os.path.isdir(dir_path):
+                    self.add_tree(dir_path, dir_path)
+            for file_path in file_paths:
+                parent = os.path.dirname(file_path) or "."
+                self.files[(parent, os.path.basename(file_path))] = file_path
+                self.add_watch(parent, None)
+        except OSError:
+            self.close()
+            raise
+
+    def add_watch(self, dir_path: str, root: None | str) -> None:
+        """
+            Watches a single directory, belonging to the tree at root if given
+        """
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dir_path), INOTIFY_MASK)
+        if wd < 0:
+            raise _inotify_error(dir_path)
+        self.watches[wd] = dir_path
+        if root is not None:
+            self.roots[wd] = root
+
+    def add_tree(self, dir_path: str, root: str) -> None:
+        """
+            Watches a directory and all of its subdirectories
+        """
+        stack = [dir_path]
+        while stack:
+            path = stack.pop()
+            self.add_watch(path, root)
+            with os.scandir(path) as entries:
+                stack.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+
+    def wait(self, timeout: None | float = None) -> set:
+        """
+            Blocks until files change or the timeout expires and returns the
+            paths of the changed files
+        """
+        changed = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        while ready:
+            self.read_events(changed)
+            ready, _, _ = select.select([self.fd], [], [], DEBOUNCE_SECONDS)
+        return changed
+
+    def read_events(self, changed: set) -> None:
+        """
+            Reads pending events and adds the paths they affect to changed
+        """
+        data = os.read(self.fd, INOTIFY_READ_SIZE)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                changed.update(set(self.roots.values()) | set(self.files.values()))
+                continue
+            dir_path = self.watches.get(wd)
+            if dir_path is None:
+                continue
+            root = self.roots.get(wd)
+            if (dir_path, name) in self.files:
+                changed.add(self.files[(dir_path, name)])
+            if root is None:
+                continue
+            path = os.path.join(dir_path, name)
+            if mask & IN_ISDIR:
+                changed.add(root)
+                if mask & (IN_CREATE | IN_MOVED_TO) and os.path.isdir(path):
+                    self.add_tree(path, root)
+            else:
+                changed.add(path)
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def _load_libc():
+    """
+        Returns libc with the inotify functions, raising OSError where they are
+        not available. ctypes is imported here, and urllib.request in
+        notify_reload, to keep them off the import path of ordinary builds.
+    """
+    import ctypes
+    import ctypes.util
+
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        raise OSError("inotify is not available")
+    libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    return libc
+
+
+def _inotify_error(*args) -> OSError:
+    """
+        Returns an OSError for the errno left by the last failed libc call
+    """
+    import ctypes
+
+    errno = ctypes.get_errno()
+    return OSError(errno, os.strerror(errno), *args)
+
+
+def create_watcher(dir_paths: list[str], file_paths: list[str]):
+    """
+        Returns an inotify watcher where the platform supports it, otherwise a
+        polling watcher
+    """
+    try:
+        return InotifyWatcher(dir_paths, file_paths)
+    except (OSError, AttributeError, ImportError) as e:
+        logging.info("Falling back to polling for changes: %s", e)
+        return PollingWatcher(dir_paths, file_paths)
+
+
+def classify_changes(
+        changed: set,
+        dir_path_content: str,
+        template_path: str,
+        dir_path_static: str
+    ) -> tuple[None | set, bool, bool]:
+    """
+        Splits changed paths into the changed content files (None when the whole
+        content tree must be rescanned), whether the template changed and
+        whether any static file changed
+    """
+    content_prefix = os.path.join(dir_path_content, "")
+    static_prefix = os.path.join(dir_path_static, "")
+    content_paths = set()
+    template_changed = False
+    static_changed = False
+    for path in changed:
+        if path == template_path:
+            template_changed = True
+        elif path == dir_path_content:
+            content_paths = None
+        elif path == dir_path_static or path.startswith(static_prefix):
+            static_changed = True
+        elif path.startswith(content_prefix) and content_paths is not None:
+            content_paths.add(path)
+    return content_paths, template_changed, static_changed
+
+
+def notify_reload(reload_url: None | str) -> None:
+    """
+        Tells the development server to reload connected browsers
+    """
+    if reload_url is None:
+        return
+    import urllib.request
+
+    try:
+        urllib.request.urlopen(urllib.request.Request(reload_url, method="POST"), timeout=1).close()
+    except OSError as e:
+        logging.debug("Could not notify %s: %s", reload_url, e)
+
+
+def watch_site(
+        dir_path_content: str,
+        template_path: str,
+        dir_path_static: str,
+        dest_dir_path: str,
+        manifest: BuildManifest,
+        jobs: int = 1,
+        explain: bool = False,
+        cache: None | PageCache = None,
+        io_pool: None | IOPool = None,
+        sync_mode: str = SYNC_MODE_COPY,
+        checksum: bool = False,
+        reload_url: None | str = DEFAULT_RELOAD_URL,
+        watcher=None,
+        on_rebuild=None,
+        after_rebuild=None,
+        update_assets=None,
+        records: None | dict = None
+    ) -> None:
+    """
+        Rebuilds the site whenever its sources change until interrupted.
+
+        The manifest, page cache and compiled template stay in memory between
+        rebuilds, and only the content files reported by the watcher are
+        checked, so editing one page re-renders just that page. After each
+        rebuild the development server is told to reload connected browsers,
+        by calling on_rebuild if given or else by posting to reload_url.
+        If given, after_rebuild is called first to update derived outputs.
+        When static files change, update_assets, if given, is called after
+        they are synced and returns the assets whose pages must be written
+        again. If records is given, the records of the pages generated are
+        stored in it for after_rebuild.
+        The manifest and cache are saved when watching stops.
+    """
+    if watcher is None:
+        watcher = create_watcher([dir_path_content, dir_path_static], [template_path])
+    logging.info("Watching %s, %s and %s for changes...", dir_path_content, dir_path_static, template_path)
+    try:
+        while True:
+            changed = watcher.wait()
+            if not changed:
+                continue
+            started = time.perf_counter()
+            content_paths, template_changed, static_changed = classify_changes(
+                changed, dir_path_content, template_path, dir_path_static
+            )
+            try:
+                changed_assets = set()
+                if static_changed:
+                    sync_files(
+                        dir_path_static, dest_dir_path, manifest, sync_mode, checksum, explain, io_pool
+                    )
+                    if update_assets is not None:
+                        changed_assets = update_assets()
+                if content_paths is None or content_paths or template_changed or changed_assets:
+                    generate_pages_incremental(
+                        dir_path_content,
+                        template_path,
+                        dest_dir_path,
+                        manifest,
+                        jobs,
+                        dir_path_static,
+                        explain,
+                        cache,
+                        io_pool,
+                        content_paths,
+                        save=False,
+                        changed_assets=changed_assets,
+                        records=records
+                    )
+            except PageGenerationError as e:
+                logging.error("%s", e)
+            except (OSError, ValueError) as e:
+                logging.error("Rebuild failed: %s", e)
+                continue
+            if after_rebuild is not None:
+                try:
+                    after_rebuild()
+                except (OSError, ValueError) as e:
+                    logging.error("Rebuild failed: %s", e)
+            logging.info("Rebuilt in %.0f ms", (time.perf_counter() - started) * 1000)
+            if on_rebuild is not None:
+                on_rebuild()
+            else:
+                notify_reload(reload_url)
+    except KeyboardInterrupt:
+        logging.info("Stopped watching")
+    finally:
+        watcher.close()
+        if cache is not None:
+            cache.save()
+        manifest.save()